@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Customer, InventoryItem, Order, Requirement, Payment, Supplier, Purchase, Notification, CustomerUser
+from .models import Customer, InventoryItem, Order, Requirement, Payment, Supplier, Purchase, Notification, CustomerUser, Job, DashboardSnapshot
 from simple_history.admin import SimpleHistoryAdmin
 
 # Unregister only if already registered
@@ -18,3 +18,5 @@ admin.site.register(Supplier, SimpleHistoryAdmin)
 admin.site.register(Purchase, SimpleHistoryAdmin)
 admin.site.register(Notification)
 admin.site.register(CustomerUser)
+admin.site.register(Job)
+admin.site.register(DashboardSnapshot)
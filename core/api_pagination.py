@@ -0,0 +1,12 @@
+from rest_framework.pagination import CursorPagination
+
+from .pagination import PAGE_SIZE
+
+
+# Apart from core.pagination, which the HTML views import, so that only the API loads DRF
+class IdCursorPagination(CursorPagination):
+    """Default API pagination: opaque cursors over the primary key, newest first."""
+    ordering = '-id'
+    page_size = PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 500
@@ -0,0 +1,152 @@
+import datetime
+import heapq
+import itertools
+
+from django.contrib.auth.models import User
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .calendars import parse_day
+from .models import Customer, InventoryItem, Order, Payment, Purchase, Requirement, Supplier
+from .pagination import PAGE_SIZE, KeysetPage, decode_cursor, encode_cursor
+
+# Models in the audit feed, with the field that names an object (None: shown by id). Entries
+# recorded at the same moment are listed in this order.
+AUDIT_MODELS = {
+    Customer: 'name',
+    InventoryItem: 'item_name',
+    Order: None,
+    Requirement: None,
+    Payment: None,
+    Supplier: 'name',
+    Purchase: None,
+}
+HISTORY_TYPES = {'+': 'Created', '~': 'Changed', '-': 'Deleted'}
+FEED_ORDERING = ['history_date', 'rank', 'history_id']
+
+
+def feed_models(names=None):
+    """AUDIT_MODELS by model_name (e.g. 'inventoryitem'), limited to `names` if any are given."""
+    models = {model._meta.model_name: model for model in AUDIT_MODELS}
+    return {name: model for name, model in models.items() if not names or name in names}
+
+
+def after_cursor(rank, cursor, backwards=False):
+    """
+    Condition on one table for entries past `cursor` = [history_date, rank, history_id] in
+    feed order (history_date, rank, history_id, all descending). The plain bound on
+    history_date lets the history_date index start the scan at the cursor.
+    """
+    date, cursor_rank, history_id = cursor
+    older = 'gt' if backwards else 'lt'
+    bound = Q(**{f'history_date__{older}e': date})
+    if rank == cursor_rank:
+        return bound & (Q(**{f'history_date__{older}': date}) | Q(history_date=date, **{f'history_id__{older}': history_id}))
+    # Later-listed tables come after the cursor at the same moment, earlier ones before it
+    return bound if (rank < cursor_rank) != backwards else Q(**{f'history_date__{older}': date})
+
+
+def table_entries(rank, model, filters, cursor, backwards, limit):
+    history = model.history.model
+    fields = ['history_id', 'id', 'history_date', 'history_type', 'history_user__username', 'history_changes']
+    if AUDIT_MODELS[model]:
+        fields.append(AUDIT_MODELS[model])
+    records = history.objects.filter(filters)
+    if cursor:
+        records = records.filter(after_cursor(rank, cursor, backwards))
+    ordering = ('history_date', 'history_id') if backwards else ('-history_date', '-history_id')
+    entries = list(records.order_by(*ordering).values(*fields)[:limit])
+    for entry in entries:
+        entry['rank'] = rank
+        entry['model'] = model
+    return entries
+
+
+class AuditPage(KeysetPage):
+    def cursor_for(self, entry):
+        return encode_cursor([entry['history_date'], entry['rank'], entry['history_id']])
+
+
+def audit_page(request, per_page=PAGE_SIZE):
+    """
+    One page of the audit feed: the history entries of every AUDIT_MODELS table, newest first,
+    filtered by ?model= (repeatable), ?user= (username), ?start= and ?end= (dates, inclusive).
+    Each table gives its next per_page + 1 entries past the cursor from an indexed range scan,
+    and the sorted lists are merged, so a page costs the same however far back it is.
+    """
+    names = request.GET.getlist('model')
+    models = list(feed_models(names).values())
+    filters = Q()
+    username = request.GET.get('user')
+    if username:
+        user_id = User.objects.filter(username=username).values_list('id', flat=True).first()
+        if user_id is None:
+            models = []
+        filters &= Q(history_user_id=user_id)
+    for param, lookup, days in (('start', 'gte', 0), ('end', 'lt', 1)):
+        day = parse_day(request.GET.get(param))
+        if day:
+            moment = datetime.datetime.combine(day + datetime.timedelta(days=days), datetime.time())
+            filters &= Q(**{f'history_date__{lookup}': timezone.make_aware(moment)})
+    after = feed_cursor(request.GET.get('after'))
+    before = feed_cursor(request.GET.get('before'))
+    if before:
+        entries = merged_entries(models, filters, before, True, per_page + 1)
+        if len(entries) > per_page:
+            page = AuditPage(request, entries[:per_page][::-1], FEED_ORDERING, has_next=True, has_previous=True)
+            return describe_page(page)
+        # Walked back to the start: show a full first page
+        after = None
+    entries = merged_entries(models, filters, after, False, per_page + 1)
+    page = AuditPage(request, entries[:per_page], FEED_ORDERING, has_next=len(entries) > per_page, has_previous=after is not None)
+    return describe_page(page)
+
+
+def merged_entries(models, filters, cursor, backwards, limit):
+    """The first `limit` entries past `cursor` across the tables of `models`, in feed order (or reversed)."""
+    ranks = {model: rank for rank, model in enumerate(AUDIT_MODELS)}
+    tables = [table_entries(ranks[model], model, filters, cursor, backwards, limit) for model in models]
+    key = lambda entry: (entry['history_date'], entry['rank'], entry['history_id'])
+    return list(itertools.islice(heapq.merge(*tables, key=key, reverse=not backwards), limit))
+
+
+def describe_page(page):
+    for entry in page.object_list:
+        describe(entry)
+    return page
+
+
+def feed_cursor(value):
+    cursor = decode_cursor(value)
+    if cursor is None or len(cursor) != 3 or not all(isinstance(part, int) for part in cursor[1:]):
+        return None
+    return cursor if isinstance(cursor[0], str) and parse_datetime(cursor[0]) else None
+
+
+def describe(entry):
+    model = entry['model']
+    name = entry.get(AUDIT_MODELS[model]) if AUDIT_MODELS[model] else None
+    entry.update(
+        model_name=model._meta.model_name,
+        verbose_name=model._meta.verbose_name,
+        label=f"{name} (#{entry['id']})" if name else f"#{entry['id']}",
+        action=HISTORY_TYPES.get(entry['history_type'], entry['history_type']),
+        url=reverse('model_history', args=[model.__name__, entry['id']]),
+        changed_fields=[change[0] for change in entry['history_changes'] or []],
+    )
+    return entry
+
+
+def entry_json(entry):
+    return {
+        'date': entry['history_date'].isoformat(),
+        'model': entry['model_name'],
+        'object_id': entry['id'],
+        'label': entry['label'],
+        'action': entry['action'],
+        'user': entry['history_user__username'],
+        'changed_fields': entry['changed_fields'],
+        'url': entry['url'],
+    }
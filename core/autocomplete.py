@@ -0,0 +1,74 @@
+from django.db.models.functions import Lower
+from django.urls import reverse
+
+from .models import Customer, InventoryItem, Order
+from .pagination import cursor_values, encode_cursor, keyset_filter
+
+AUTOCOMPLETE_PAGE_SIZE = 20
+
+
+def prefix_range(prefix):
+    """
+    (low, high) bounds of every string starting with `prefix`. A range on LOWER(column) is
+    answered from the expression index on it, which LIKE 'x%' generally is not.
+    """
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def name_prefix(queryset, path, query):
+    queryset = queryset.annotate(search_key=Lower(path))
+    if query:
+        low, high = prefix_range(query.lower())
+        queryset = queryset.filter(search_key__gte=low, search_key__lt=high)
+    return queryset
+
+
+def customer_results(query):
+    queryset = name_prefix(Customer.objects.all(), 'name', query)
+    return queryset.only('id', 'name'), ('search_key', 'id'), lambda c: c.name
+
+
+def inventory_results(query):
+    queryset = name_prefix(InventoryItem.objects.all(), 'item_name', query)
+    return queryset.only('id', 'item_name', 'item_type'), ('search_key', 'id'), str
+
+
+def order_results(query):
+    # "#12" / "12" finds order 12; anything else is a customer name prefix
+    queryset = Order.objects.select_related('customer').only('id', 'customer', 'customer__name')
+    number = query.lstrip('#')
+    if number.isdigit():
+        return queryset.filter(pk=int(number)), ('-id',), str
+    if not query:
+        return queryset, ('-id',), str
+    # By customer name, newest first within each: the name index gives the order, so only
+    # each name's orders are sorted
+    return name_prefix(queryset, 'customer__name', query), ('search_key', '-id'), str
+
+
+# Autocomplete name -> function(query) returning (queryset, keyset ordering, label function)
+AUTOCOMPLETES = {
+    'customers': customer_results,
+    'inventory': inventory_results,
+    'orders': order_results,
+}
+
+
+def autocomplete_page(name, query, after=None, per_page=AUTOCOMPLETE_PAGE_SIZE):
+    queryset, ordering, label = AUTOCOMPLETES[name](query.strip())
+    cursor = cursor_values(queryset, ordering, after)
+    if cursor is not None:
+        queryset = queryset.filter(keyset_filter(ordering, cursor))
+    rows = list(queryset.order_by(*ordering)[:per_page + 1])
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    next_cursor = encode_cursor([getattr(rows[-1], field.lstrip('-')) for field in ordering]) if more else None
+    return {
+        'results': [{'id': row.pk, 'text': label(row)} for row in rows],
+        'more': more,
+        'next': next_cursor,
+    }
+
+
+def autocomplete_url(name):
+    return reverse('autocomplete', args=[name])
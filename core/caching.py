@@ -0,0 +1,70 @@
+import hashlib
+import time
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import transaction
+
+# Cached page data lives this long at most; writes invalidate it long before that
+CACHE_TIMEOUT = 60 * 60
+VERSION_TIMEOUT = None  # version keys never expire on their own
+_MISSING = object()
+
+
+def version_key(model):
+    return f'version:{model._meta.label_lower}'
+
+
+def new_version():
+    return time.time_ns()
+
+
+def model_versions(models):
+    """
+    Current version token of each model, read in one round trip. A missing token (never set,
+    or evicted) is replaced by a fresh one, so it can never match an older cached entry.
+    """
+    keys = [version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, new_version(), VERSION_TIMEOUT)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_version(model):
+    cache.set(version_key(model), new_version(), VERSION_TIMEOUT)
+
+
+def invalidate(model):
+    """
+    Give `model` a new version once the current transaction commits. Bumping any earlier
+    would let a concurrent request cache pre-commit data under the new version.
+    """
+    transaction.on_commit(lambda: bump_version(model))
+
+
+def versioned_key(name, models, *parts):
+    versions = '.'.join(str(version) for version in model_versions(models))
+    digest = hashlib.md5(repr(parts).encode()).hexdigest()
+    return f'{name}:{digest}:{versions}'
+
+
+def cached(name, models, compute, *parts, timeout=CACHE_TIMEOUT):
+    """
+    Return compute() from the cache, keyed on `name`, `parts` and the versions of `models`
+    (the models the value is read from). Any write to one of them makes the key unreachable.
+    """
+    key = versioned_key(name, models, *parts)
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        value = compute()
+        cache.set(key, value, timeout)
+    return value
+
+
+def core_models():
+    # Historical tables are never read through the cache, and leaving them out lets history
+    # compaction delete their rows without per-row signals
+    return [model for model in apps.get_app_config('core').get_models() if not hasattr(model, 'instance_type')]
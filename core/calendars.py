@@ -0,0 +1,131 @@
+import datetime
+import hashlib
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Customer, Order
+
+# Longest window the JSON events endpoint serves in one response
+MAX_WINDOW_DAYS = 400
+ICAL_CHUNK_SIZE = 500
+
+
+def parse_day(value):
+    # FullCalendar sends ISO datetimes (2025-06-29T00:00:00+05:00); only the date matters
+    try:
+        return parse_date((value or '')[:10])
+    except ValueError:
+        return None
+
+
+def month_bounds(day):
+    """First day of the month of `day` and of the month after it."""
+    start = day.replace(day=1)
+    return start, (start + datetime.timedelta(days=32)).replace(day=1)
+
+
+def window_orders(start=None, end=None):
+    """
+    Orders whose order_date..delivery_date span overlaps [start, end): those placed in the
+    window, plus those placed before it and delivered in or after it. Each half of the OR is
+    answered from the order_date or the delivery_date index; an ORDER BY would make SQLite scan
+    the order_date index instead, so callers sort in Python if they need to.
+    """
+    if not start:
+        return Order.objects.filter(order_date__lt=end) if end else Order.objects.all()
+    placed = Q(order_date__gte=start, order_date__lt=end) if end else Q(order_date__gte=start)
+    return Order.objects.filter(placed | Q(order_date__lt=start, delivery_date__gte=start))
+
+
+def event_rows(start, end):
+    orders = window_orders(start, end).values('id', 'order_date', 'delivery_date', 'status', 'customer__name')
+    return [
+        {
+            "title": f"Order #{o['id']} - {o['customer__name']}",
+            "start": str(o['order_date']),
+            "end": str(o['delivery_date']) if o['delivery_date'] else str(o['order_date']),
+            "status": o['status'],
+        }
+        for o in sorted(orders, key=lambda o: (o['order_date'], o['id']))
+    ]
+
+
+def latest_change():
+    """
+    (tag, time) of the newest order or customer history entry, i.e. of the last save or delete
+    that could change a feed (events show the customer's name). None before any history.
+    """
+    changes = [
+        model.history.model.objects.order_by('-history_id').values_list('history_id', 'history_date').first()
+        for model in (Order, Customer)
+    ]
+    if not any(changes):
+        return None
+    return '.'.join(str(change[0]) if change else '-' for change in changes), max(change[1] for change in changes if change)
+
+
+def feed_etag(change, start, end):
+    digest = hashlib.md5(f'{change and change[0]}:{start}:{end}'.encode()).hexdigest()
+    return f'"{digest}"'
+
+
+# iCalendar text (RFC 5545), written line by line so the feed streams
+
+def ical_text(value):
+    return str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def ical_line(line):
+    # Lines longer than 75 octets are folded onto continuation lines starting with a space
+    data = line.encode()
+    parts = []
+    while len(data) > 75:
+        cut = 75 if not parts else 74
+        while cut and (data[cut] & 0xC0) == 0x80:  # don't split a UTF-8 sequence
+            cut -= 1
+        parts.append(data[:cut])
+        data = data[cut:]
+    parts.append(data)
+    return b'\r\n '.join(parts) + b'\r\n'
+
+
+def ical_event(order, stamp, host):
+    lines = [
+        'BEGIN:VEVENT',
+        f"UID:order-{order['id']}@{host}",
+        f'DTSTAMP:{stamp}',
+        f"DTSTART;VALUE=DATE:{order['order_date']:%Y%m%d}",
+    ]
+    if order['delivery_date'] and order['delivery_date'] > order['order_date']:
+        lines.append(f"DTEND;VALUE=DATE:{order['delivery_date']:%Y%m%d}")
+    description = f"Customer: {order['customer__name']}\nStatus: {order['status']}"
+    lines += [f"SUMMARY:Order #{order['id']}", f'DESCRIPTION:{ical_text(description)}', 'END:VEVENT']
+    return b''.join(ical_line(line) for line in lines)
+
+
+def ical_stream(start, end, host):
+    stamp = timezone.now().strftime('%Y%m%dT%H%M%SZ')
+    yield b''.join(ical_line(line) for line in [
+        'BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//StockStitch//Orders//EN', 'CALSCALE:GREGORIAN',
+    ])
+    rows = (window_orders(start, end).values('id', 'order_date', 'delivery_date', 'status', 'customer__name')
+            .iterator(chunk_size=ICAL_CHUNK_SIZE))
+    chunk = []
+    for order in rows:
+        chunk.append(ical_event(order, stamp, host))
+        if len(chunk) == ICAL_CHUNK_SIZE:
+            yield b''.join(chunk)
+            chunk = []
+    chunk.append(ical_line('END:VCALENDAR'))
+    yield b''.join(chunk)
+
+
+def rolling_start(days):
+    """Start of a window of the last `days` days (the feed's ?days=), or None for no window."""
+    try:
+        days = int(days or 0)
+    except ValueError:
+        return None
+    return timezone.localdate() - datetime.timedelta(days=days) if days > 0 else None
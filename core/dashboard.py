@@ -0,0 +1,111 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from .models import Customer, DashboardSnapshot, InventoryItem, Order, Payment, Purchase, Supplier
+
+SNAPSHOT_ID = 1
+LOW_STOCK_THRESHOLD = 5
+
+
+def is_pending(status):
+    return (status or '').lower() == 'pending'
+
+
+def pending(queryset):
+    """The orders or payments of `queryset` that is_pending(), found by the LOWER(status) indexes."""
+    return queryset.alias(status_key=Lower('status')).filter(status_key='pending')
+
+
+def is_low_stock(quantity):
+    return quantity is not None and int(quantity) <= LOW_STOCK_THRESHOLD
+
+
+def counters(model, values, sign=1):
+    """The counters one row of `model` with `values` contributes, times `sign`."""
+    if model is Customer:
+        return {'total_customers': sign}
+    if model is Order:
+        return {'total_orders': sign, 'pending_orders': sign * is_pending(values['status'])}
+    if model is InventoryItem:
+        return {'total_inventory': sign, 'low_stock_items': sign * is_low_stock(values['stock_quantity'])}
+    if model is Payment:
+        amount = Decimal(values['amount'] or 0)
+        return {
+            'total_payments': sign * amount,
+            'outstanding_payments': sign * amount if is_pending(values['status']) else Decimal(0),
+        }
+    if model is Supplier:
+        return {'total_suppliers': sign}
+    if model is Purchase:
+        return {'total_purchases': sign}
+    return {}
+
+
+def change_delta(model, old, new):
+    if old is None:
+        return {}
+    return merge(counters(model, new), counters(model, old, sign=-1))
+
+
+def merge(*deltas):
+    total = {}
+    for delta in deltas:
+        for key, value in delta.items():
+            total[key] = total.get(key, 0) + value
+    return total
+
+
+def apply_delta(delta):
+    """
+    Move the counters with one UPDATE ... SET x = x + n, so concurrent writers never lose
+    each other's changes. Without a snapshot row nothing happens: the next read builds one.
+    """
+    delta = {key: value for key, value in delta.items() if value}
+    if delta:
+        DashboardSnapshot.objects.filter(pk=SNAPSHOT_ID).update(
+            updated_at=timezone.now(), **{key: F(key) + value for key, value in delta.items()})
+
+
+def cents(value):
+    # SQLite sums decimals as floats; round back to the column's two places
+    return Decimal(value or 0).quantize(Decimal('0.01'))
+
+
+def compute_counts():
+    inventory = InventoryItem.objects.aggregate(
+        total=Count('id'), low=Count('id', filter=Q(stock_quantity__lte=LOW_STOCK_THRESHOLD)))
+    return {
+        'total_customers': Customer.objects.count(),
+        'total_orders': Order.objects.count(),
+        'pending_orders': pending(Order.objects.all()).count(),
+        'total_inventory': inventory['total'],
+        'low_stock_items': inventory['low'],
+        'total_payments': cents(Payment.objects.aggregate(total=Sum('amount'))['total']),
+        'outstanding_payments': cents(pending(Payment.objects.all()).aggregate(total=Sum('amount'))['total']),
+        'total_suppliers': Supplier.objects.count(),
+        'total_purchases': Purchase.objects.count(),
+    }
+
+
+def reconcile():
+    """Recount everything and overwrite the snapshot. Returns {counter: (stored, actual)} for drifted counters."""
+    with transaction.atomic():
+        snapshot = DashboardSnapshot.objects.select_for_update().filter(pk=SNAPSHOT_ID).first()
+        counts = compute_counts()
+        drift = {}
+        if snapshot is not None:
+            drift = {key: (getattr(snapshot, key), value) for key, value in counts.items() if getattr(snapshot, key) != value}
+        DashboardSnapshot.objects.update_or_create(pk=SNAPSHOT_ID, defaults={**counts, 'updated_at': timezone.now()})
+    return drift
+
+
+def get_snapshot():
+    snapshot = DashboardSnapshot.objects.filter(pk=SNAPSHOT_ID).first()
+    if snapshot is None:
+        reconcile()
+        snapshot = DashboardSnapshot.objects.get(pk=SNAPSHOT_ID)
+    return snapshot
@@ -0,0 +1,252 @@
+import csv
+import datetime
+import tempfile
+from itertools import islice
+
+from django.db.models import Q
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Customer, InventoryItem, Order, Requirement, Payment
+from .search import SEARCH_INDEXES, filter_search
+
+# Rows fetched per database round trip while streaming an export
+EXPORT_CHUNK_SIZE = 2000
+# Flush the CSV buffer to the client once it grows past this many characters
+EXPORT_FLUSH_SIZE = 64 * 1024
+# Rows looked at to size XLSX columns (write-only sheets need widths before the first row)
+XLSX_WIDTH_SAMPLE = 1000
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+class Echo:
+    """Pseudo-buffer for csv.writer: write() hands the formatted line back instead of storing it."""
+    def write(self, value):
+        return value
+
+
+# Shared value formatters for export columns
+def yes_no(value):
+    return 'Yes' if value else 'No'
+
+
+def join_steps(value):
+    return '; '.join(value or [])
+
+
+def choice_display(choices):
+    labels = dict(choices)
+    return lambda value: labels.get(value, value)
+
+
+# Export definitions: the columns offered on each list page, the fields the `q` search
+# matches (models in the full-text index, core.search, are searched there instead),
+# ORM paths for columns that are not plain fields, and value formatters
+EXPORTS = {
+    'customers': {
+        'model': Customer,
+        'columns': [
+            ('name', 'Name'),
+            ('contact', 'Contact'),
+            ('address', 'Address'),
+            ('created_at', 'Created At'),
+        ],
+    },
+    'inventory': {
+        'model': InventoryItem,
+        'columns': [
+            ('item_name', 'Item Name'),
+            ('item_type', 'Type'),
+            ('fabric_type', 'Fabric'),
+            ('cost_per_meter', 'Cost/m'),
+            ('total_meters', 'Total m'),
+            ('taxes', 'Taxes'),
+            ('size', 'Size'),
+            ('color', 'Color'),
+            ('is_printed', 'Printed'),
+            ('stock_quantity', 'Stock'),
+            ('supplier', 'Supplier'),
+        ],
+        'formatters': {
+            'item_type': choice_display(InventoryItem.ITEM_TYPE_CHOICES),
+            'is_printed': yes_no,
+        },
+    },
+    'orders': {
+        'model': Order,
+        'columns': [
+            ('id', 'Order ID'),
+            ('customer', 'Customer'),
+            ('product_type', 'Product Type'),
+            ('status', 'Status'),
+            ('order_date', 'Order Date'),
+            ('delivery_date', 'Delivery Date'),
+            ('notes', 'Notes'),
+        ],
+        'lookups': {'customer': 'customer__name'},
+        'formatters': {'product_type': choice_display(InventoryItem.ITEM_TYPE_CHOICES)},
+    },
+    'requirements': {
+        'model': Requirement,
+        'columns': [
+            ('order', 'Order'),
+            ('description', 'Description'),
+            ('is_fulfilled', 'Fulfilled'),
+            ('steps_done', 'Steps Done'),
+            ('steps_not_done', 'Steps Not Done'),
+            ('notes', 'Notes'),
+        ],
+        'search': ['description', 'order__id', 'notes', 'is_fulfilled'],
+        'lookups': {'order': 'order_id'},
+        'formatters': {'is_fulfilled': yes_no, 'steps_done': join_steps, 'steps_not_done': join_steps},
+    },
+    'payments': {
+        'model': Payment,
+        'columns': [
+            ('order', 'Order'),
+            ('amount', 'Amount'),
+            ('status', 'Status'),
+            ('payment_date', 'Payment Date'),
+            ('notes', 'Notes'),
+        ],
+        'search': ['order__id', 'status', 'notes', 'amount'],
+        'lookups': {'order': 'order_id'},
+    },
+}
+
+
+def selected_columns(all_columns, selected):
+    if not selected:
+        return list(all_columns)
+    return [(key, label) for key, label in all_columns if key in selected]
+
+
+def export_queryset(name, query):
+    spec = EXPORTS[name]
+    queryset = spec['model'].objects.all()
+    if query and queryset.model in SEARCH_INDEXES:
+        queryset = filter_search(queryset, query)
+    elif query:
+        condition = Q()
+        for field in spec['search']:
+            condition |= Q(**{f'{field}__icontains': query})
+        queryset = queryset.filter(condition)
+    return queryset
+
+
+def export_rows(queryset, columns, lookups=None, formatters=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield export rows for the given columns straight from values_list(), chunk by chunk.
+    `lookups` maps a column key to the ORM path to read (e.g. 'customer' -> 'customer__name'),
+    `formatters` maps a column key to a callable applied to the raw value.
+    """
+    lookups = lookups or {}
+    formatters = formatters or {}
+    paths = [lookups.get(key, key) for key, _ in columns]
+    fmts = [formatters.get(key) for key, _ in columns]
+    if not paths:
+        return
+    for values in queryset.values_list(*paths).iterator(chunk_size=chunk_size):
+        yield [fmt(value) if fmt else value for fmt, value in zip(fmts, values)]
+
+
+def stream_csv(header, rows):
+    writer = csv.writer(Echo())
+    buf = [writer.writerow(header)]
+    size = len(buf[0])
+    for row in rows:
+        line = writer.writerow(row)
+        buf.append(line)
+        size += len(line)
+        if size >= EXPORT_FLUSH_SIZE:
+            yield ''.join(buf)
+            buf = []
+            size = 0
+    if buf:
+        yield ''.join(buf)
+
+
+def xlsx_value(value):
+    # Excel cannot store timezone-aware datetimes
+    if isinstance(value, datetime.datetime) and timezone.is_aware(value):
+        return timezone.make_naive(value)
+    return value
+
+
+def write_xlsx(header, rows, fileobj):
+    """
+    Build the sheet with openpyxl's write-only mode, so memory stays flat however many rows
+    are exported. Column widths come from the header plus the first XLSX_WIDTH_SAMPLE rows,
+    which are buffered once and then written like any other row.
+    """
+    # Imported here: openpyxl is slow to load and only XLSX exports need it
+    from openpyxl import Workbook
+    from openpyxl.utils import get_column_letter
+
+    sample = [[xlsx_value(value) for value in row] for row in islice(rows, XLSX_WIDTH_SAMPLE)]
+    widths = [len(label) for label in header]
+    for row in sample:
+        for i, value in enumerate(row):
+            if value is not None:
+                widths[i] = max(widths[i], len(str(value)))
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    for i, width in enumerate(widths, start=1):
+        ws.column_dimensions[get_column_letter(i)].width = width + 2
+    ws.append(header)
+    for row in sample:
+        ws.append(row)
+    del sample
+    for row in rows:
+        ws.append([xlsx_value(value) for value in row])
+    wb.save(fileobj)
+
+
+def build_export(name, query, selected):
+    # Header and lazily-read rows for one export
+    spec = EXPORTS[name]
+    columns = selected_columns(spec['columns'], selected)
+    rows = export_rows(
+        export_queryset(name, query), columns,
+        lookups=spec.get('lookups'), formatters=spec.get('formatters'),
+    )
+    return [label for _, label in columns], rows
+
+
+def export_filename(name, fmt):
+    return f'{name}.xlsx' if fmt == 'xlsx' else f'{name}.csv'
+
+
+def export_response(request, name, fmt):
+    header, rows = build_export(name, request.GET.get('q', ''), request.GET.getlist('columns'))
+    filename = export_filename(name, fmt)
+    if fmt == 'xlsx':
+        tmp = tempfile.TemporaryFile()
+        write_xlsx(header, rows, tmp)
+        tmp.seek(0)
+        return FileResponse(tmp, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+    response = StreamingHttpResponse(stream_csv(header, rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def write_export(name, fmt, query, selected, fileobj, progress=None):
+    """Write an export to a binary file object; used by background export jobs."""
+    header, rows = build_export(name, query, selected)
+    if progress:
+        rows = report_progress(rows, progress)
+    if fmt == 'xlsx':
+        write_xlsx(header, rows, fileobj)
+    else:
+        for chunk in stream_csv(header, rows):
+            fileobj.write(chunk.encode('utf-8'))
+
+
+def report_progress(rows, progress, every=EXPORT_CHUNK_SIZE):
+    count = 0
+    for row in rows:
+        yield row
+        count += 1
+        if count % every == 0:
+            progress(count)
+    progress(count)
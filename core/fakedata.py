@@ -0,0 +1,262 @@
+import csv
+import datetime
+import io
+import random
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import dashboard, rollups
+from .caching import core_models, invalidate
+from .models import Customer, InventoryItem, Order, Payment, Purchase, Requirement, Supplier
+from .search import SEARCH_INDEXES, rebuild_index
+
+# Rows per bulk INSERT
+FAKE_BATCH_SIZE = 1000
+# Orders are spread over this many days back from today
+FAKE_DAYS = 3 * 365
+
+FIRST_NAMES = [
+    'Ayesha', 'Fatima', 'Zainab', 'Maryam', 'Hira', 'Sana', 'Amna', 'Iqra', 'Mahnoor', 'Noor',
+    'Sadia', 'Rabia', 'Saba', 'Kiran', 'Mehwish', 'Farah', 'Nida', 'Huma', 'Samina', 'Uzma',
+    'Ali', 'Ahmed', 'Bilal', 'Hamza', 'Usman', 'Imran', 'Kashif', 'Faisal', 'Tariq', 'Adeel',
+]
+LAST_NAMES = [
+    'Khan', 'Ahmed', 'Malik', 'Hussain', 'Butt', 'Chaudhry', 'Sheikh', 'Qureshi', 'Siddiqui', 'Mirza',
+    'Raza', 'Javed', 'Iqbal', 'Aslam', 'Anwar', 'Baig', 'Rana', 'Abbasi', 'Rehman', 'Saleem',
+]
+CITIES = ['Lahore', 'Karachi', 'Islamabad', 'Faisalabad', 'Multan', 'Peshawar', 'Sialkot', 'Quetta']
+FABRICS = ['Lawn', 'Cotton', 'Chiffon', 'Silk', 'Khaddar', 'Linen', 'Velvet', 'Organza', 'Cambric', 'Karandi']
+COLORS = ['White', 'Black', 'Navy', 'Maroon', 'Mustard', 'Teal', 'Peach', 'Olive', 'Pink', 'Grey', 'Beige', 'Emerald']
+SIZES = ['XS', 'S', 'M', 'L', 'XL', '']
+ORDER_STATUSES = ['Pending', 'Completed', 'Shipped']
+PAYMENT_STATUSES = ['Pending', 'Paid']
+STEPS = ['Cutting', 'Stitching', 'Embroidery', 'Hemming', 'Pressing', 'Packing']
+
+
+def default_counts(customers=1000):
+    """Cardinalities of every model for a dataset of `customers` customers, in a shop-like ratio."""
+    return {
+        'customers': customers,
+        'inventory': max(customers // 5, 1),
+        'orders': customers * 3,
+        'requirements': customers * 2,
+        'payments': customers * 3,
+        'suppliers': max(customers // 20, 1),
+        'purchases': customers,
+    }
+
+
+def person_name(index):
+    # Unique for every index, so the importers (which match customers by name) see no duplicates
+    name = f'{FIRST_NAMES[index % len(FIRST_NAMES)]} {LAST_NAMES[index // len(FIRST_NAMES) % len(LAST_NAMES)]}'
+    rounds = index // (len(FIRST_NAMES) * len(LAST_NAMES))
+    return f'{name} {rounds + 1}' if rounds else name
+
+
+def item_name(index):
+    name = f'{COLORS[index % len(COLORS)]} {FABRICS[index // len(COLORS) % len(FABRICS)]}'
+    rounds = index // (len(COLORS) * len(FABRICS))
+    return f'{name} {rounds + 1}' if rounds else name
+
+
+def phone(rng):
+    return f'03{rng.randint(0, 49):02d}{rng.randint(0, 9999999):07d}'
+
+
+def money(rng, low, high):
+    return Decimal(rng.randint(low * 100, high * 100)) / 100
+
+
+def day(rng, days=FAKE_DAYS):
+    return datetime.date.today() - datetime.timedelta(days=rng.randint(0, days))
+
+
+def moment(rng, days=FAKE_DAYS):
+    return timezone.now() - datetime.timedelta(days=rng.randint(0, days), seconds=rng.randint(0, 86399))
+
+
+def measurements(rng):
+    return {'length': rng.randint(36, 46), 'chest': rng.randint(30, 46), 'sleeve': rng.randint(18, 25)}
+
+
+def steps(rng):
+    done = rng.randint(0, len(STEPS))
+    return STEPS[:done], STEPS[done:]
+
+
+# Row builders: one unsaved instance per call
+
+def fake_customer(rng, index):
+    return Customer(name=person_name(index), contact=phone(rng), address=f'{rng.randint(1, 400)} Street {rng.randint(1, 60)}, {rng.choice(CITIES)}',
+                    created_at=moment(rng))
+
+
+def fake_inventory_item(rng, index):
+    fabric = FABRICS[index // len(COLORS) % len(FABRICS)]
+    return InventoryItem(
+        item_name=item_name(index), item_type=rng.choice(['stitched', 'unstitched']), fabric_type=fabric,
+        cost_per_meter=money(rng, 150, 2500), total_meters=money(rng, 5, 200), taxes=money(rng, 0, 50),
+        size=rng.choice(SIZES), color=COLORS[index % len(COLORS)], is_printed=rng.random() < 0.4,
+        stock_quantity=rng.randint(0, 120), supplier=f'{rng.choice(LAST_NAMES)} Textiles',
+    )
+
+
+def fake_order(rng, customer_ids, item_ids):
+    order_date = day(rng)
+    return Order(
+        customer_id=rng.choice(customer_ids),
+        inventory_item_id=rng.choice(item_ids) if item_ids and rng.random() < 0.9 else None,
+        product_type=rng.choice(['stitched', 'unstitched']), measurements=measurements(rng),
+        status=rng.choices(ORDER_STATUSES, weights=[3, 5, 2])[0], notes=rng.choice(['', '', 'Urgent', 'Gift wrap', 'Call before delivery']),
+        order_date=order_date, delivery_date=order_date + datetime.timedelta(days=rng.randint(3, 30)) if rng.random() < 0.8 else None,
+    )
+
+
+def fake_requirement(rng, order_ids):
+    done, not_done = steps(rng)
+    return Requirement(order_id=rng.choice(order_ids), description=f'{rng.choice(STEPS)} as per measurements',
+                       is_fulfilled=not not_done, steps_done=done, steps_not_done=not_done)
+
+
+def fake_payment(rng, orders):
+    order_id, order_date = rng.choice(orders)
+    return Payment(order_id=order_id, amount=money(rng, 500, 25000), status=rng.choices(PAYMENT_STATUSES, weights=[1, 3])[0],
+                   payment_date=order_date + datetime.timedelta(days=rng.randint(0, 20)) if rng.random() < 0.95 else None)
+
+
+def fake_supplier(rng, index):
+    name = f'{LAST_NAMES[index % len(LAST_NAMES)]} {rng.choice(FABRICS)} House'
+    return Supplier(name=name if index < len(LAST_NAMES) else f'{name} {index // len(LAST_NAMES) + 1}', contact=phone(rng),
+                    address=rng.choice(CITIES), email=f'supplier{index}@example.com', phone=phone(rng), created_at=moment(rng))
+
+
+def fake_purchase(rng, supplier_ids, item_ids):
+    return Purchase(supplier_id=rng.choice(supplier_ids), item_id=rng.choice(item_ids), quantity=rng.randint(1, 200),
+                    price=money(rng, 1000, 90000), date=day(rng))
+
+
+def insert(model, objects, dates=(), batch_size=FAKE_BATCH_SIZE):
+    """
+    bulk_create `objects` in batches. auto_now_add fields are overwritten with today's date on
+    insert, so the generated values for `dates` are put back with a bulk_update.
+    """
+    created = []
+    for start in range(0, len(objects), batch_size):
+        batch = objects[start:start + batch_size]
+        values = [[getattr(obj, field) for field in dates] for obj in batch]
+        batch = model.objects.bulk_create(batch)
+        if dates:
+            for obj, row in zip(batch, values):
+                for field, value in zip(dates, row):
+                    setattr(obj, field, value)
+            model.objects.bulk_update(batch, dates)
+        created += batch
+    return created
+
+
+def generate(counts, seed=0, batch_size=FAKE_BATCH_SIZE, log=None):
+    """
+    Add counts[<name>] fake rows of each model (names as in default_counts()), linked to each
+    other and to any rows already there. The same seed and existing data give the same rows.
+    Writes go through bulk_create, which skips signals, so the search index, rollups and
+    dashboard counters are rebuilt afterwards. Returns the number of rows created per model.
+    """
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    created = {}
+    with transaction.atomic():
+        offset = Customer.objects.count()
+        customers = [fake_customer(rng, offset + i) for i in range(counts.get('customers', 0))]
+        created['customers'] = len(insert(Customer, customers, ['created_at'], batch_size))
+        log(f"{created['customers']} customers")
+
+        offset = InventoryItem.objects.count()
+        items = [fake_inventory_item(rng, offset + i) for i in range(counts.get('inventory', 0))]
+        created['inventory'] = len(insert(InventoryItem, items, batch_size=batch_size))
+        log(f"{created['inventory']} inventory items")
+
+        customer_ids = list(Customer.objects.values_list('id', flat=True))
+        item_ids = list(InventoryItem.objects.values_list('id', flat=True))
+        created['orders'] = 0
+        if customer_ids:
+            orders = [fake_order(rng, customer_ids, item_ids) for _ in range(counts.get('orders', 0))]
+            created['orders'] = len(insert(Order, orders, ['order_date'], batch_size))
+        log(f"{created['orders']} orders")
+
+        orders = list(Order.objects.values_list('id', 'order_date'))
+        order_ids = [order_id for order_id, _ in orders]
+        created['requirements'] = created['payments'] = 0
+        if orders:
+            requirements = [fake_requirement(rng, order_ids) for _ in range(counts.get('requirements', 0))]
+            created['requirements'] = len(insert(Requirement, requirements, batch_size=batch_size))
+            payments = [fake_payment(rng, orders) for _ in range(counts.get('payments', 0))]
+            created['payments'] = len(insert(Payment, payments, batch_size=batch_size))
+        log(f"{created['requirements']} requirements, {created['payments']} payments")
+
+        offset = Supplier.objects.count()
+        suppliers = [fake_supplier(rng, offset + i) for i in range(counts.get('suppliers', 0))]
+        created['suppliers'] = len(insert(Supplier, suppliers, ['created_at'], batch_size))
+        supplier_ids = list(Supplier.objects.values_list('id', flat=True))
+        created['purchases'] = 0
+        if supplier_ids and item_ids:
+            purchases = [fake_purchase(rng, supplier_ids, item_ids) for _ in range(counts.get('purchases', 0))]
+            created['purchases'] = len(insert(Purchase, purchases, ['date'], batch_size))
+        log(f"{created['suppliers']} suppliers, {created['purchases']} purchases")
+
+        for model in SEARCH_INDEXES:
+            rebuild_index(model)
+        rollups.backfill()
+        dashboard.reconcile()
+        for model in core_models():
+            invalidate(model)
+        log('search index, rollups and dashboard counters rebuilt')
+    return created
+
+
+# CSV files in the format of the sample_*.csv downloads, for exercising the importers.
+# Every row creates a new object; orders, requirements and payments point at existing rows.
+
+def import_csv(name, count, seed=0):
+    rng = random.Random(seed)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if name == 'customers':
+        offset = Customer.objects.count() + 1000000
+        writer.writerow(['id', 'name', 'contact', 'address'])
+        for i in range(count):
+            customer = fake_customer(rng, offset + i)
+            writer.writerow(['', customer.name, customer.contact, customer.address])
+    elif name == 'inventory':
+        offset = InventoryItem.objects.count() + 1000000
+        writer.writerow(['id', 'item_name', 'item_type', 'fabric_type', 'cost_per_meter', 'total_meters', 'taxes', 'size',
+                         'color', 'is_printed', 'stock_quantity', 'supplier'])
+        for i in range(count):
+            item = fake_inventory_item(rng, offset + i)
+            writer.writerow(['', item.item_name, item.item_type, item.fabric_type, item.cost_per_meter, item.total_meters,
+                             item.taxes, item.size, item.color, 'Yes' if item.is_printed else 'No', item.stock_quantity, item.supplier])
+    elif name == 'orders':
+        # New orders are read positionally: customer, product type, status, order date, delivery date, notes
+        names = list(Customer.objects.order_by('id').values_list('name', flat=True)[:1000])
+        writer.writerow(['id', 'customer', 'product_type', 'status', 'order_date', 'delivery_date', 'notes'])
+        for _ in range(count):
+            order = fake_order(rng, [0], [])
+            writer.writerow(['', rng.choice(names), order.product_type, order.status, order.order_date,
+                             order.delivery_date or '', order.notes])
+    elif name == 'requirements':
+        order_ids = list(Order.objects.order_by('id').values_list('id', flat=True)[:1000])
+        writer.writerow(['id', 'order', 'description', 'is_fulfilled', 'steps_done', 'steps_not_done', 'notes'])
+        for _ in range(count):
+            requirement = fake_requirement(rng, order_ids)
+            writer.writerow(['', requirement.order_id, requirement.description, requirement.is_fulfilled,
+                             '; '.join(requirement.steps_done), '; '.join(requirement.steps_not_done), ''])
+    elif name == 'payments':
+        orders = list(Order.objects.order_by('id').values_list('id', 'order_date')[:1000])
+        writer.writerow(['id', 'order', 'amount', 'status', 'payment_date', 'notes'])
+        for _ in range(count):
+            payment = fake_payment(rng, orders)
+            writer.writerow(['', payment.order_id, payment.amount, payment.status, payment.payment_date or '', ''])
+    else:
+        raise ValueError(f'No importer for {name!r}')
+    return buffer.getvalue().encode('utf-8')
@@ -3,6 +3,7 @@ from .models import Customer, InventoryItem, Order, Requirement, Payment, Suppli
 from django.contrib.auth.forms import UserCreationForm
 from .models import CustomerUser
 from django.contrib.auth.models import User
+from .widgets import AutocompleteSelect
 
 class CustomerForm(forms.ModelForm):
     class Meta:
@@ -21,8 +22,8 @@ class OrderForm(forms.ModelForm):
         widget=forms.Select(attrs={'class': 'form-select'})
     )
     status = forms.CharField(widget=forms.Select(choices=[('Pending', 'Pending'), ('Completed', 'Completed'), ('Shipped', 'Shipped')], attrs={'class': 'form-select'}))
-    customer = forms.ModelChoiceField(queryset=Customer.objects.all(), widget=forms.Select(attrs={'class': 'form-select'}))
-    inventory_item = forms.ModelChoiceField(queryset=InventoryItem.objects.all(), required=False, widget=forms.Select(attrs={'class': 'form-select'}))
+    customer = forms.ModelChoiceField(queryset=Customer.objects.all(), widget=AutocompleteSelect('customers', attrs={'class': 'form-select'}))
+    inventory_item = forms.ModelChoiceField(queryset=InventoryItem.objects.all(), required=False, widget=AutocompleteSelect('inventory', attrs={'class': 'form-select'}))
     measurements = forms.CharField(widget=forms.Textarea(attrs={'class': 'form-control', 'placeholder': 'Enter measurements as JSON'}), required=False)
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -48,7 +49,7 @@ class RequirementForm(forms.ModelForm):
         required=False,
         help_text='Enter each remaining step on a new line. This is a checklist of what still needs to be done for this requirement.'
     )
-    order = forms.ModelChoiceField(queryset=Order.objects.all(), widget=forms.Select(attrs={'class': 'form-select'}))
+    order = forms.ModelChoiceField(queryset=Order.objects.all(), widget=AutocompleteSelect('orders', attrs={'class': 'form-select'}, select_related=['customer']))
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         if self.instance and self.instance.steps_done:
@@ -67,7 +68,7 @@ class RequirementForm(forms.ModelForm):
         return [s.strip() for s in data.splitlines() if s.strip()]
 
 class PaymentForm(forms.ModelForm):
-    order = forms.ModelChoiceField(queryset=Order.objects.all(), widget=forms.Select(attrs={'class': 'form-select'}))
+    order = forms.ModelChoiceField(queryset=Order.objects.all(), widget=AutocompleteSelect('orders', attrs={'class': 'form-select'}, select_related=['customer']))
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['order'].empty_label = 'Select Order'
@@ -84,6 +85,7 @@ class PurchaseForm(forms.ModelForm):
     class Meta:
         model = Purchase
         fields = ['supplier', 'item', 'quantity', 'price', 'notes']
+        widgets = {'item': AutocompleteSelect('inventory')}
 
 class CustomerUserRegistrationForm(UserCreationForm):
     class Meta:
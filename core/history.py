@@ -0,0 +1,263 @@
+"""
+History of core models (simple_history), with three additions:
+
+- Batched recording. Inside `with history.batch():`, historical records are collected as they
+  are made (same date, user, type and change reason as simple_history gives them) and written
+  with one bulk_create per model when the block ends, instead of one INSERT per save or delete.
+  The block opens no transaction: a record is kept once the change it describes commits (at
+  once under autocommit), dropped if that change rolls back, and written after the
+  transaction the block runs in, if any, has committed.
+- Retention. HistoricalRecords(keep_versions=N) keeps the newest N records per object;
+  keep_days=D keeps D days of records plus the newest one before that, so each object's state
+  D days ago is still known. The compact_history command applies them, a range of objects
+  at a time.
+- Stored diffs. The changed fields of each record, against the previous one, are worked out
+  the first time they are shown and saved in its history_changes column.
+"""
+import datetime
+import threading
+from contextlib import contextmanager
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, models, transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from simple_history import models as history_models
+from simple_history.signals import post_create_historical_record, pre_create_historical_record
+
+_local = threading.local()
+# Model -> (keep_versions, keep_days), for models with a retention policy
+RETENTION = {}
+
+
+class Batch:
+    def __init__(self, using):
+        self.using = using
+        self.records = []  # (history instance, instance) of changes that have committed
+
+    def add(self, history_instance, instance):
+        # Runs when the change's transaction commits, at once outside one; Django drops the
+        # callback if the change rolls back
+        transaction.on_commit(lambda: self.records.append((history_instance, instance)), using=self.using)
+
+    def flush(self):
+        records, self.records = self.records, []
+        by_model = {}
+        for history_instance, instance in records:
+            by_model.setdefault(type(history_instance), []).append(history_instance)
+        with transaction.atomic(using=self.using):
+            for model, rows in by_model.items():
+                model._default_manager.using(self.using).bulk_create(rows)
+        for history_instance, instance in records:
+            post_create_historical_record.send(
+                sender=type(history_instance),
+                instance=instance,
+                history_instance=history_instance,
+                history_date=history_instance.history_date,
+                history_user=history_instance.history_user,
+                history_change_reason=history_instance.history_change_reason,
+                using=self.using,
+            )
+        return len(records)
+
+
+def current_batch(using=DEFAULT_DB_ALIAS):
+    batch = getattr(_local, 'batch', None)
+    return batch if batch is not None and batch.using == using else None
+
+
+@contextmanager
+def batch(using=DEFAULT_DB_ALIAS):
+    """Collect the block's historical records and write them in bulk once its changes have committed."""
+    if getattr(_local, 'batch', None) is not None:
+        # Nested: the outermost batch writes everything
+        yield
+        return
+    pending = _local.batch = Batch(using)
+    try:
+        yield
+    finally:
+        _local.batch = None
+        # Queued after the records' own callbacks, so it runs once they have all been kept;
+        # immediately unless the block ran inside a transaction
+        transaction.on_commit(pending.flush, using=using)
+
+
+def flush(using=DEFAULT_DB_ALIAS):
+    """Write the committed records collected so far now, e.g. before reading history back in a batch."""
+    batch = current_batch(using)
+    return batch.flush() if batch is not None else 0
+
+
+class HistoryChanges(models.Model):
+    """Extra column of every historical table: [[field, old, new], ...], or null until computed."""
+    history_changes = models.JSONField(null=True, blank=True, editable=False)
+
+    class Meta:
+        abstract = True
+        app_label = 'core'
+
+
+class HistoricalRecords(history_models.HistoricalRecords):
+    """
+    simple_history's HistoricalRecords. batch=False writes records immediately even inside
+    history.batch(); keep_versions or keep_days set the model's retention policy.
+    """
+
+    def __init__(self, *args, batch=True, keep_versions=None, keep_days=None, **kwargs):
+        if keep_versions and keep_days:
+            raise ImproperlyConfigured('Give a history retention policy of keep_versions or keep_days, not both.')
+        self.batch = batch
+        self.retention = (keep_versions, keep_days)
+        kwargs.setdefault('bases', (HistoryChanges,))
+        super().__init__(*args, **kwargs)
+
+    def contribute_to_class(self, cls, name):
+        super().contribute_to_class(cls, name)
+        if any(self.retention):
+            RETENTION[cls] = self.retention
+
+    def get_meta_options(self, model):
+        options = super().get_meta_options(model)
+        name = model._meta.model_name
+        options['indexes'] = [
+            *options.get('indexes', ()),
+            # One object's history in date order, for the history page and for compaction
+            models.Index(fields=['id', 'history_date'], name=f'core_h{name}_id_date'),
+            # One user's changes in date order, for the audit feed
+            models.Index(fields=['history_user', 'history_date'], name=f'core_h{name}_user_date'),
+        ]
+        return options
+
+    def create_historical_record(self, instance, history_type, using=None):
+        using = using if self.use_base_model_db else None
+        pending = current_batch(using or DEFAULT_DB_ALIAS) if self.batch else None
+        if pending is None or self.m2m_fields:
+            return super().create_historical_record(instance, history_type, using=using)
+        history_date = getattr(instance, '_history_date', timezone.now())
+        history_user = self.get_history_user(instance)
+        history_change_reason = self.get_change_reason_for_object(instance, history_type, using)
+        manager = getattr(instance, self.manager_name)
+        attrs = {field.attname: getattr(instance, field.attname) for field in self.fields_included(instance)}
+        if getattr(manager.model, 'history_relation', None) is not None:
+            attrs['history_relation'] = instance
+        history_instance = manager.model(
+            history_date=history_date,
+            history_type=history_type,
+            history_user=history_user,
+            history_change_reason=history_change_reason,
+            **attrs,
+        )
+        pre_create_historical_record.send(
+            sender=manager.model,
+            instance=instance,
+            history_date=history_date,
+            history_user=history_user,
+            history_change_reason=history_change_reason,
+            history_instance=history_instance,
+            using=using,
+        )
+        pending.add(history_instance, instance)
+
+
+# Retention
+
+def expired_records(model, lower, upper, now=None):
+    """
+    QuerySet of `model`'s historical records that its retention policy no longer keeps, among
+    the objects with lower <= id < upper. Each object's records are numbered newest first in
+    one query, and the ones past what it keeps are selected, so a range of objects is compacted
+    with a single DELETE.
+    """
+    keep_versions, keep_days = RETENTION.get(model, (None, None))
+    history = model.history.model.objects
+    records = history.filter(id__gte=lower, id__lt=upper)
+    if keep_versions:
+        keep = keep_versions
+    elif keep_days:
+        # The newest record before the cutoff is kept as the object's state at the cutoff
+        keep = 1
+        records = records.filter(history_date__lt=(now or timezone.now()) - datetime.timedelta(days=keep_days))
+    else:
+        return history.none()
+    numbered = records.annotate(position=Window(
+        RowNumber(), partition_by=[F('id')], order_by=[F('history_date').desc(), F('history_id').desc()]))
+    return history.filter(history_id__in=numbered.filter(position__gt=keep).values('history_id'))
+
+
+def record_compaction(model, newest):
+    """Note that `model`'s history up to `newest` (the newest record deleted) has been compacted."""
+    from .models import HistoryCompaction  # core.models imports this module
+
+    if newest is None:
+        return
+    marker, created = HistoryCompaction.objects.get_or_create(
+        model=model._meta.label_lower, defaults={'compacted_through': newest},
+    )
+    if not created and newest > marker.compacted_through:
+        marker.compacted_through = newest
+        marker.save(update_fields=['compacted_through'])
+
+
+def compacted_through(model):
+    """Date of the newest historical record of `model` that compaction has deleted, or None."""
+    from .models import HistoryCompaction
+
+    return (HistoryCompaction.objects.filter(model=model._meta.label_lower)
+            .values_list('compacted_through', flat=True).first())
+
+
+# Stored diffs
+
+def change_value(value):
+    return '' if value is None else str(value)
+
+
+def record_changes(records, previous=None):
+    """
+    Fill in history_changes on `records`, one object's history newest first, each against the
+    record after it; `previous` is the one before the last (None if there is none). Changes are
+    worked out once and saved; a first record has none, and one whose predecessor was compacted
+    away is left null.
+    """
+    computed = []
+    for record, older in zip(records, [*records[1:], previous]):
+        if record.history_changes is not None:
+            continue
+        if record.history_type == '+':
+            record.history_changes = []
+        elif older is not None:
+            delta = record.diff_against(older)
+            record.history_changes = [[c.field, change_value(c.old), change_value(c.new)] for c in delta.changes]
+        else:
+            continue
+        computed.append(record)
+    if computed:
+        type(computed[0]).objects.bulk_update(computed, ['history_changes'])
+    return records
+
+
+def previous_record(record):
+    """The record of the same object just before `record`, or None."""
+    return (type(record).objects.filter(id=record.id)
+            .filter(Q(history_date__lt=record.history_date) | Q(history_date=record.history_date, history_id__lt=record.history_id))
+            .order_by('-history_date', '-history_id').first())
+
+
+class HistoryBatchMiddleware:
+    """
+    Runs each POST, PUT, PATCH and DELETE request in history.batch(), so its historical records
+    are written together when the response is ready. Transactions are left to the views (the
+    importers commit per batch); the records of changes that committed are written even if the
+    request then fails.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD', 'OPTIONS'):
+            return self.get_response(request)
+        with batch():
+            return self.get_response(request)
@@ -0,0 +1,559 @@
+import copy
+import csv
+import io
+from itertools import islice
+
+from django.db import DatabaseError, connection, transaction
+from simple_history.utils import bulk_create_with_history
+
+from .models import Customer, InventoryItem, Order, Requirement, Payment
+from .signals import bulk_pre_save, bulk_saved
+
+# Rows parsed, resolved and written per transaction
+IMPORT_BATCH_SIZE = 500
+# Same cap QuerySet.get() uses when reporting duplicate matches
+MAX_GET_RESULTS = 21
+
+
+def parse_steps(value):
+    return [s.strip() for s in value.split(';') if s.strip()]
+
+
+class BulkImporter:
+    """
+    Shared CSV import engine. Subclasses implement import_row() with the per-row rules of
+    their model; instead of querying and saving per row they look objects up in maps that
+    are prefetched once per batch and queue their writes with create()/update(). Each batch
+    is then written with bulk_create/bulk_update (plus bulk history) in one transaction.
+
+    Row reporting matches a plain save() loop: values are converted exactly as save() would
+    convert them before a row is queued, and if the database still rejects a batch it is
+    replayed row by row so the failure lands on the row that caused it. Rows of the legacy
+    header-less format abort the whole import on unexpected errors, as they always have.
+    """
+    model = None
+    noun = ''
+
+    def __init__(self, batch_size=IMPORT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.count_created = 0
+        self.count_updated = 0
+        self.skipped_rows = []
+
+    def run(self, csv_file, progress=None):
+        """
+        Import an uploaded (binary) CSV file and return the summary message. `progress`, if
+        given, is called after each batch with the number of rows read so far and the byte
+        offset reached in the file.
+        """
+        reader = csv.reader(io.TextIOWrapper(csv_file, encoding='utf-8', newline=''))
+        self.header = next(reader, None)
+        self.columns = [h.lower() for h in self.header] if self.header else []
+        self.has_id = 'id' in self.columns
+        self.id_idx = self.columns.index('id') if self.has_id else None
+        rows = enumerate(reader, start=2)
+        done = 0
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            self.process_batch(batch)
+            done += len(batch)
+            if progress:
+                progress(done, csv_file.tell())
+        return self.message()
+
+    def process_batch(self, batch):
+        self.to_create = []
+        self.to_update = {}
+        self.update_history = []
+        if self.has_id:
+            self.existing = self.prefetch(self.model, [row[self.id_idx].strip() for _, row in batch if self.id_idx < len(row)])
+        self.prefetch_related(batch)
+        try:
+            for idx, row in batch:
+                self.import_row(idx, row)
+        finally:
+            self.flush()
+
+    def prefetch_related(self, batch):
+        pass
+
+    def import_row(self, idx, row):
+        raise NotImplementedError
+
+    def skip(self, idx, reason):
+        self.skipped_rows.append((idx, str(reason)))
+
+    def message(self):
+        skipped = len(self.skipped_rows)
+        msg = f"Created {self.count_created} {self.noun}. Updated {self.count_updated}."
+        if skipped:
+            msg += f" Skipped {skipped} row(s)."
+            for idx, reason in sorted(self.skipped_rows)[:5]:
+                msg += f" Row {idx}: {reason}."
+            if skipped > 5:
+                msg += " ..."
+        return msg
+
+    # Lookups against the per-batch maps
+
+    def prefetch(self, model, values):
+        pks = set()
+        for value in values:
+            try:
+                pks.add(model._meta.pk.get_prep_value(value))
+            except (TypeError, ValueError):
+                pass
+        return model.objects.in_bulk(pks) if pks else {}
+
+    def lookup(self, model, objects, value):
+        # Raises the same ValueError/DoesNotExist as model.objects.get(id=value)
+        pk = model._meta.pk.get_prep_value(value)
+        try:
+            return objects[pk]
+        except KeyError:
+            raise model.DoesNotExist(f"{model._meta.object_name} matching query does not exist.")
+
+    def get_existing(self, value):
+        obj = self.lookup(self.model, self.existing, value)
+        # Later rows for the same id see the changes of earlier ones, as sequential saves would
+        if obj.pk in self.to_update:
+            obj = self.to_update[obj.pk][1]
+        return copy.copy(obj)
+
+    # Queued writes
+
+    def check_values(self, obj, add):
+        # Run the conversions save() runs, so bad values fail on their own row
+        for field in obj._meta.concrete_fields:
+            field.get_db_prep_save(field.pre_save(obj, add), connection)
+
+    def create(self, idx, obj):
+        self.check_values(obj, add=True)
+        self.to_create.append((idx, obj))
+
+    def update(self, idx, obj):
+        self.check_values(obj, add=False)
+        rows = self.to_update[obj.pk][0] if obj.pk in self.to_update else []
+        self.to_update[obj.pk] = (rows + [idx], obj)
+        # One history entry per updated row, as one save() per row would write
+        self.update_history.append(obj)
+
+    def flush(self):
+        creates = self.to_create
+        updates = list(self.to_update.values())
+        if not creates and not updates:
+            return
+        fields = [f.name for f in self.model._meta.concrete_fields if not f.primary_key]
+        try:
+            with transaction.atomic():
+                if creates:
+                    bulk_create_with_history([obj for _, obj in creates], self.model, batch_size=self.batch_size)
+                if updates:
+                    bulk_pre_save.send(sender=self.model, objects=[obj for _, obj in updates])
+                    self.model.objects.bulk_update([obj for _, obj in updates], fields, batch_size=self.batch_size)
+                    self.model.history.bulk_history_create(self.update_history, batch_size=self.batch_size, update=True)
+        except DatabaseError:
+            self.save_rows(creates, updates)
+        else:
+            if creates:
+                bulk_saved.send(sender=self.model, objects=[obj for _, obj in creates], created=True)
+            if updates:
+                bulk_saved.send(sender=self.model, objects=[obj for _, obj in updates], created=False)
+            self.count_created += len(creates)
+            self.count_updated += sum(len(rows) for rows, _ in updates)
+
+    def save_rows(self, creates, updates):
+        # The database rejected the batch: replay it one row at a time
+        queue = [(idx, [idx], obj, True) for idx, obj in creates]
+        queue += [(rows[0], rows, obj, False) for rows, obj in updates]
+        for _, rows, obj, add in sorted(queue, key=lambda entry: entry[0]):
+            if add:
+                obj.pk = None
+                obj._state.adding = True
+            try:
+                with transaction.atomic():
+                    obj.save()
+            except DatabaseError as e:
+                if not self.has_id:
+                    raise
+                for idx in rows:
+                    self.skip(idx, e)
+                continue
+            if add:
+                self.count_created += 1
+            else:
+                self.count_updated += len(rows)
+
+    def apply_header(self, obj, row):
+        # Update fields by header
+        for i, h in enumerate(self.header):
+            h = h.lower()
+            if h == 'id': continue
+            if hasattr(obj, h) and i < len(row):
+                setattr(obj, h, row[i].strip())
+
+
+class CustomerImporter(BulkImporter):
+    model = Customer
+    noun = 'customers'
+
+    def import_row(self, idx, row):
+        if self.has_id:
+            name_idx = self.columns.index('name') if 'name' in self.columns else 1
+            contact_idx = self.columns.index('contact') if 'contact' in self.columns else 2
+            address_idx = self.columns.index('address') if 'address' in self.columns else 3
+            try:
+                customer_id = row[self.id_idx].strip()
+                name = row[name_idx].strip()
+                contact = row[contact_idx].strip() if contact_idx < len(row) else ''
+                address = row[address_idx].strip() if address_idx < len(row) else ''
+                if customer_id:
+                    try:
+                        customer = self.get_existing(customer_id)
+                        customer.name = name
+                        customer.contact = contact
+                        customer.address = address
+                        self.update(idx, customer)
+                        return
+                    except Customer.DoesNotExist:
+                        pass
+                if not name:
+                    self.skip(idx, "Missing required name")
+                    return
+                self.create(idx, Customer(name=name, contact=contact, address=address))
+            except Exception as e:
+                self.skip(idx, e)
+        else:
+            if len(row) < 3:
+                self.skip(idx, "Not enough columns")
+                return
+            name = row[0].strip()
+            contact = row[1].strip()
+            address = row[2].strip()
+            if not name:
+                self.skip(idx, "Missing required name")
+                return
+            self.create(idx, Customer(name=name, contact=contact, address=address))
+
+
+class InventoryImporter(BulkImporter):
+    model = InventoryItem
+    noun = 'inventory items'
+
+    def import_row(self, idx, row):
+        if self.has_id:
+            try:
+                item_id = row[self.id_idx].strip()
+                if item_id:
+                    try:
+                        item = self.get_existing(item_id)
+                        self.apply_header(item, row)
+                        self.update(idx, item)
+                        return
+                    except InventoryItem.DoesNotExist:
+                        pass
+                # If not found, create new
+                fields = [row[i].strip() if i < len(row) else '' for i in range(len(self.header))]
+                self.create(idx, InventoryItem(
+                    item_name=fields[1],
+                    item_type=fields[2],
+                    fabric_type=fields[3],
+                    cost_per_meter=fields[4],
+                    total_meters=fields[5],
+                    taxes=fields[6],
+                    size=fields[7],
+                    color=fields[8],
+                    is_printed=(fields[9].lower() == 'yes'),
+                    stock_quantity=fields[10],
+                    supplier=fields[11]
+                ))
+            except Exception as e:
+                self.skip(idx, e)
+        else:
+            if len(row) < 11:
+                self.skip(idx, "Not enough columns for inventory item")
+                return
+            self.create(idx, InventoryItem(
+                item_name=row[0],
+                item_type='stitched' if row[1].lower().startswith('s') else 'unstitched',
+                fabric_type=row[2],
+                cost_per_meter=row[3],
+                total_meters=row[4],
+                taxes=row[5],
+                size=row[6],
+                color=row[7],
+                is_printed=(row[8].strip().lower() == 'yes'),
+                stock_quantity=row[9],
+                supplier=row[10]
+            ))
+
+
+class OrderImporter(BulkImporter):
+    model = Order
+    noun = 'orders'
+
+    def prefetch_related(self, batch):
+        # Customers are resolved by name, like get_or_create(name=...) per row
+        name_idx = 1 if self.has_id else 0
+        names = {row[name_idx].strip() for _, row in batch if name_idx < len(row)}
+        self.customers = {}
+        self.new_customers = {}
+        names = sorted(names)
+        for start in range(0, len(names), self.batch_size):
+            chunk = names[start:start + self.batch_size]
+            for customer in Customer.objects.filter(name__in=chunk).only('id', 'name').order_by('id'):
+                self.customers.setdefault(customer.name, []).append(customer)
+
+    def get_or_create_customer(self, name):
+        if name in self.new_customers:
+            return self.new_customers[name]
+        matches = self.customers.get(name, [])
+        if len(matches) > 1:
+            num = len(matches)
+            raise Customer.MultipleObjectsReturned(
+                "get() returned more than one Customer -- it returned %s!"
+                % (num if num < MAX_GET_RESULTS else "more than %s" % (MAX_GET_RESULTS - 1))
+            )
+        if matches:
+            return matches[0]
+        customer = self.new_customers[name] = Customer(name=name)
+        return customer
+
+    def flush(self):
+        if self.new_customers:
+            self.flush_customers()
+        super().flush()
+
+    def flush_customers(self):
+        customers = list(self.new_customers.values())
+        failed = {}
+        try:
+            with transaction.atomic():
+                bulk_create_with_history(customers, Customer, batch_size=self.batch_size)
+        except DatabaseError:
+            for customer in customers:
+                customer.pk = None
+                customer._state.adding = True
+                try:
+                    with transaction.atomic():
+                        customer.save()
+                except DatabaseError as e:
+                    failed[customer.name] = e
+        else:
+            bulk_saved.send(sender=Customer, objects=customers, created=True)
+        if customers and customers[0].pk is None:
+            # Backends that cannot return ids from a bulk insert
+            ids = dict(Customer.objects.filter(name__in=self.new_customers).order_by('id').values_list('name', 'id'))
+            for customer in customers:
+                customer.pk = ids.get(customer.name)
+        if failed:
+            pending = []
+            for idx, order in self.to_create:
+                if order.customer.name in failed:
+                    self.skip(idx, failed[order.customer.name])
+                else:
+                    pending.append((idx, order))
+            self.to_create = pending
+        self.new_customers = {}
+
+    def create_order(self, idx, customer_name, product_type, status, order_date, delivery_date, notes):
+        customer = self.get_or_create_customer(customer_name)
+        self.create(idx, Order(
+            customer=customer,
+            product_type=product_type,
+            status=status,
+            order_date=order_date,
+            delivery_date=delivery_date,
+            notes=notes
+        ))
+
+    def import_row(self, idx, row):
+        if self.has_id:
+            try:
+                order_id = row[self.id_idx].strip()
+                if order_id:
+                    try:
+                        order = self.get_existing(order_id)
+                        self.apply_header(order, row)
+                        self.update(idx, order)
+                        return
+                    except Order.DoesNotExist:
+                        pass
+                # If not found, create new
+                customer_name = row[1].strip() if len(row) > 1 else ''
+                product_type = row[2].strip().lower() if len(row) > 2 else ''
+                status = row[3].strip() if len(row) > 3 else ''
+                order_date = row[4].strip() if len(row) > 4 else ''
+                delivery_date = row[5].strip() if len(row) > 5 else ''
+                notes = row[6].strip() if len(row) > 6 else ''
+                if not customer_name or not product_type or not status or not order_date:
+                    self.skip(idx, "Missing required fields")
+                    return
+                self.create_order(idx, customer_name, product_type, status, order_date, delivery_date, notes)
+            except Exception as e:
+                self.skip(idx, e)
+        else:
+            if len(row) < 6:
+                self.skip(idx, "Not enough columns")
+                return
+            customer_name = row[0].strip()
+            product_type = row[1].strip().lower()
+            status = row[2].strip()
+            order_date = row[3].strip()
+            delivery_date = row[4].strip()
+            notes = row[5].strip()
+            if not customer_name or not product_type or not status or not order_date:
+                self.skip(idx, "Missing required fields")
+                return
+            self.create_order(idx, customer_name, product_type, status, order_date, delivery_date, notes)
+
+
+class OrderLinkedImporter(BulkImporter):
+    """Requirements and payments reference their order by id in the first data column."""
+
+    def prefetch_related(self, batch):
+        order_idx = 1 if self.has_id else 0
+        self.orders = self.prefetch(Order, [row[order_idx].strip() for _, row in batch if order_idx < len(row)])
+
+    def get_order(self, idx, order_id):
+        try:
+            return self.lookup(Order, self.orders, order_id)
+        except Order.DoesNotExist:
+            self.skip(idx, "Order not found")
+
+
+class RequirementImporter(OrderLinkedImporter):
+    model = Requirement
+    noun = 'requirements'
+
+    def import_row(self, idx, row):
+        if self.has_id:
+            try:
+                req_id = row[self.id_idx].strip()
+                if req_id:
+                    try:
+                        req = self.get_existing(req_id)
+                        self.apply_header(req, row)
+                        self.update(idx, req)
+                        return
+                    except Requirement.DoesNotExist:
+                        pass
+                # If not found, create new
+                order_id = row[1].strip() if len(row) > 1 else ''
+                description = row[2].strip() if len(row) > 2 else ''
+                is_fulfilled = row[3].strip().lower() in ['yes', 'true', '1'] if len(row) > 3 else False
+                steps_done = parse_steps(row[4]) if len(row) > 4 else []
+                steps_not_done = parse_steps(row[5]) if len(row) > 5 else []
+                notes = row[6].strip() if len(row) > 6 else ''
+                if not order_id or not description:
+                    self.skip(idx, "Missing required fields")
+                    return
+                order = self.get_order(idx, order_id)
+                if order is None:
+                    return
+                self.create(idx, Requirement(
+                    order=order,
+                    description=description,
+                    is_fulfilled=is_fulfilled,
+                    steps_done=steps_done,
+                    steps_not_done=steps_not_done,
+                    notes=notes
+                ))
+            except Exception as e:
+                self.skip(idx, e)
+        else:
+            if len(row) < 6:
+                self.skip(idx, "Not enough columns")
+                return
+            order_id = row[0].strip()
+            description = row[1].strip()
+            is_fulfilled = row[2].strip().lower() in ['yes', 'true', '1']
+            steps_done = parse_steps(row[3])
+            steps_not_done = parse_steps(row[4])
+            notes = row[5].strip()
+            if not order_id or not description:
+                self.skip(idx, "Missing required fields")
+                return
+            order = self.get_order(idx, order_id)
+            if order is None:
+                return
+            self.create(idx, Requirement(
+                order=order,
+                description=description,
+                is_fulfilled=is_fulfilled,
+                steps_done=steps_done,
+                steps_not_done=steps_not_done,
+                notes=notes
+            ))
+
+
+class PaymentImporter(OrderLinkedImporter):
+    model = Payment
+    noun = 'payments'
+
+    def import_row(self, idx, row):
+        if self.has_id:
+            try:
+                payment_id = row[self.id_idx].strip()
+                if payment_id:
+                    try:
+                        payment = self.get_existing(payment_id)
+                        self.apply_header(payment, row)
+                        self.update(idx, payment)
+                        return
+                    except Payment.DoesNotExist:
+                        pass
+                # If not found, create new
+                order_id = row[1].strip() if len(row) > 1 else ''
+                amount = row[2].strip() if len(row) > 2 else ''
+                status = row[3].strip() if len(row) > 3 else ''
+                payment_date = row[4].strip() if len(row) > 4 else ''
+                notes = row[5].strip() if len(row) > 5 else ''
+                if not order_id or not amount or not status:
+                    self.skip(idx, "Missing required fields")
+                    return
+                order = self.get_order(idx, order_id)
+                if order is None:
+                    return
+                self.create(idx, Payment(
+                    order=order,
+                    amount=amount,
+                    status=status,
+                    payment_date=payment_date if payment_date else None,
+                    notes=notes
+                ))
+            except Exception as e:
+                self.skip(idx, e)
+        else:
+            if len(row) < 5:
+                self.skip(idx, "Not enough columns")
+                return
+            order_id = row[0].strip()
+            amount = row[1].strip()
+            status = row[2].strip()
+            payment_date = row[3].strip()
+            notes = row[4].strip()
+            if not order_id or not amount or not status:
+                self.skip(idx, "Missing required fields")
+                return
+            order = self.get_order(idx, order_id)
+            if order is None:
+                return
+            self.create(idx, Payment(
+                order=order,
+                amount=amount,
+                status=status,
+                payment_date=payment_date if payment_date else None,
+                notes=notes
+            ))
+
+
+IMPORTERS = {
+    'customers': CustomerImporter,
+    'inventory': InventoryImporter,
+    'orders': OrderImporter,
+    'requirements': RequirementImporter,
+    'payments': PaymentImporter,
+}
@@ -0,0 +1,251 @@
+import io
+import zipfile
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery, Sum
+from django.utils.text import slugify
+
+from .calendars import month_bounds
+from .dashboard import is_pending, pending
+from .models import Customer, InventoryItem, Order, Payment
+from .workers import parallel_map
+
+# Bump when the layout below changes, so cached invoices are rendered again
+INVOICE_LAYOUT = 1
+INVOICE_CACHE_TIMEOUT = 30 * 24 * 60 * 60
+# Statements rendered and zipped per round trip to the worker pool
+STATEMENT_BATCH = 200
+
+
+# Invoices. An invoice's version is the latest history entry of its order, of every payment
+# that has ever been on it (deleting one, or moving it to another order, records a history
+# entry too), of its customer and of its inventory item (whose name it prints), so an invoice
+# is rendered once per version and every later download is served from the cache.
+
+def latest_history(model, **filters):
+    history = model.history.model.objects.filter(**filters).order_by('-history_id').values('history_id')[:1]
+    return Subquery(history)
+
+
+def invoice_orders():
+    payments = Payment.history.filter(order_id=OuterRef(OuterRef('pk'))).values('id')
+    return Order.objects.select_related('customer', 'inventory_item').annotate(
+        order_version=latest_history(Order, id=OuterRef('pk')),
+        payments_version=latest_history(Payment, id__in=payments),
+        customer_version=latest_history(Customer, id=OuterRef('customer_id')),
+        item_version=latest_history(InventoryItem, id=OuterRef('inventory_item_id')),
+    )
+
+
+def invoice_version(order):
+    """Version of an order from invoice_orders()."""
+    return f'{INVOICE_LAYOUT}.{order.order_version}.{order.payments_version}.{order.customer_version}.{order.item_version}'
+
+
+def invoice_key(order_id):
+    return f'invoice:{order_id}'
+
+
+def payment_totals(payments):
+    billed = sum((p['amount'] for p in payments), Decimal(0))
+    outstanding = sum((p['amount'] for p in payments if is_pending(p['status'])), Decimal(0))
+    return {'billed': billed, 'paid': billed - outstanding, 'outstanding': outstanding}
+
+
+def invoice_data(order):
+    payments = list(order.payments.order_by('payment_date', 'id').values('payment_date', 'amount', 'status'))
+    return {
+        'order_id': order.id,
+        'name': order.customer.name,
+        'contact': order.customer.contact,
+        'address': order.customer.address,
+        'status': order.status,
+        'product': order.get_product_type_display(),
+        'item': order.inventory_item.item_name if order.inventory_item else '',
+        'order_date': order.order_date,
+        'delivery_date': order.delivery_date,
+        'payments': payments,
+        'totals': payment_totals(payments),
+    }
+
+
+def invoice_pdf(order):
+    """
+    PDF bytes of the invoice for an order from invoice_orders(). The cache holds one entry per
+    order, tagged with its version: a stale entry is replaced, whether or not the signal that
+    drops it on writes has run yet.
+    """
+    version = invoice_version(order)
+    entry = cache.get(invoice_key(order.pk))
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    pdf = render_invoice(invoice_data(order))
+    cache.set(invoice_key(order.pk), (version, pdf), INVOICE_CACHE_TIMEOUT)
+    return pdf
+
+
+def forget_invoices(order_ids):
+    keys = [invoice_key(pk) for pk in set(order_ids) if pk is not None]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+# Month-end statements: the month's orders and payments per customer, and what the customer
+# still owes at month end. Data is read here; the PDFs are drawn in the worker pool.
+
+def statement_data(month):
+    """One dict per customer with orders, payments or a balance in `month`, by customer name."""
+    start, end = month_bounds(month)
+    orders, payments, owing = {}, {}, {}
+    for o in (Order.objects.filter(order_date__gte=start, order_date__lt=end)
+              .order_by('order_date', 'id').values('id', 'customer_id', 'status', 'product_type', 'delivery_date', 'order_date')):
+        orders.setdefault(o.pop('customer_id'), []).append(o)
+    for p in month_payments(start, end):
+        payments.setdefault(p.pop('order__customer_id'), []).append(p)
+    for row in outstanding_by_customer(end):
+        owing[row['order__customer_id']] = row['total']
+    customer_ids = sorted(set(orders) | set(payments) | set(owing))
+    customers = {}
+    for index in range(0, len(customer_ids), STATEMENT_BATCH):
+        batch = customer_ids[index:index + STATEMENT_BATCH]
+        customers.update((c['id'], c) for c in Customer.objects.filter(pk__in=batch).values('id', 'name', 'contact', 'address'))
+    statements = []
+    for pk in customer_ids:
+        statements.append(dict(
+            customers[pk], month=start, orders=orders.get(pk, []), payments=payments.get(pk, []),
+            totals=payment_totals(payments.get(pk, [])), owing=owing.get(pk, Decimal(0)),
+        ))
+    statements.sort(key=lambda s: (s['name'].lower(), s['id']))
+    return statements
+
+
+def month_payments(start, end):
+    return (Payment.objects.filter(payment_date__gte=start, payment_date__lt=end)
+            .order_by('payment_date', 'id').values('order_id', 'order__customer_id', 'amount', 'status', 'payment_date'))
+
+
+def outstanding_by_customer(end):
+    """What each customer owed before `end`: their pending payments dated before it or undated."""
+    return (pending(Payment.objects.all()).filter(Q(payment_date__lt=end) | Q(payment_date__isnull=True))
+            .values('order__customer_id').annotate(total=Sum('amount')).order_by())
+
+
+def statement_filename(statement):
+    return f"statement_{statement['month']:%Y-%m}_{statement['id']}_{slugify(statement['name']) or 'customer'}.pdf"
+
+
+def statements_filename(month):
+    return f'statements_{month:%Y-%m}.zip'
+
+
+def write_statements(month, fileobj, progress=None):
+    """Zip the month's statements into a binary file object; returns how many were written."""
+    statements = statement_data(month)
+    if progress:
+        progress(0, len(statements))
+    with zipfile.ZipFile(fileobj, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for index in range(0, len(statements), STATEMENT_BATCH):
+            batch = statements[index:index + STATEMENT_BATCH]
+            for statement, pdf in zip(batch, parallel_map(render_statement, batch)):
+                archive.writestr(statement_filename(statement), pdf)
+            if progress:
+                progress(index + len(batch), len(statements))
+    return len(statements)
+
+
+# Drawing. These run in worker processes for statements, so they only use the dicts above.
+
+class Page:
+    """A letter-size canvas written top to bottom, starting a new page when one fills up."""
+    top, bottom, left = 750, 60, 60
+
+    def __init__(self, buf):
+        from reportlab.lib.pagesizes import letter
+        from reportlab.pdfgen import canvas
+
+        self.pdf = canvas.Canvas(buf, pagesize=letter)
+        self.y = self.top
+
+    def advance(self, gap):
+        # Returns the baseline to draw at, starting a new page when this one is full
+        if self.y < self.bottom:
+            self.pdf.showPage()
+            self.y = self.top
+        y, self.y = self.y, self.y - gap
+        return y
+
+    def line(self, text, size=10, bold=False, gap=16):
+        y = self.advance(gap)
+        self.pdf.setFont('Helvetica-Bold' if bold else 'Helvetica', size)
+        self.pdf.drawString(self.left, y, str(text))
+
+    def row(self, *cells, bold=False):
+        # Cells at fixed column offsets
+        y = self.advance(14)
+        self.pdf.setFont('Helvetica-Bold' if bold else 'Helvetica', 10)
+        for x, text in zip((0, 120, 260, 400), cells):
+            self.pdf.drawString(self.left + x, y, str(text))
+
+    def space(self, gap=10):
+        self.y -= gap
+
+    def save(self):
+        self.pdf.showPage()
+        self.pdf.save()
+
+
+def customer_lines(page, data):
+    page.line(data['name'], bold=True)
+    for line in [data['contact'], *data['address'].splitlines()]:
+        if line.strip():
+            page.line(line.strip(), gap=13)
+    page.space()
+
+
+def payment_lines(page, payments, totals):
+    page.row('Date', 'Status', 'Amount', bold=True)
+    for p in payments:
+        page.row(p['payment_date'] or '-', p['status'], f"{p['amount']:,.2f}")
+    if not payments:
+        page.row('No payments.')
+    page.space()
+    page.row('', 'Total billed', f"{totals['billed']:,.2f}", bold=True)
+    page.row('', 'Paid', f"{totals['paid']:,.2f}")
+    page.row('', 'Outstanding', f"{totals['outstanding']:,.2f}", bold=True)
+
+
+def render_invoice(data):
+    buf = io.BytesIO()
+    page = Page(buf)
+    page.line(f"Invoice for Order #{data['order_id']}", size=16, bold=True, gap=28)
+    customer_lines(page, data)
+    page.line(f"Order date: {data['order_date']}")
+    page.line(f"Delivery date: {data['delivery_date'] or '-'}")
+    page.line(f"Product: {data['product']}{' - ' + data['item'] if data['item'] else ''}")
+    page.line(f"Status: {data['status']}")
+    page.space()
+    payment_lines(page, data['payments'], data['totals'])
+    page.save()
+    return buf.getvalue()
+
+
+def render_statement(data):
+    buf = io.BytesIO()
+    page = Page(buf)
+    page.line(f"Statement for {data['month']:%B %Y}", size=16, bold=True, gap=28)
+    customer_lines(page, data)
+    page.line('Orders placed', bold=True)
+    page.row('Order', 'Date', 'Status', 'Delivery', bold=True)
+    for o in data['orders']:
+        page.row(f"#{o['id']}", o['order_date'], o['status'], o['delivery_date'] or '-')
+    if not data['orders']:
+        page.row('No orders this month.')
+    page.space()
+    page.line('Payments', bold=True)
+    payment_lines(page, data['payments'], data['totals'])
+    page.space()
+    page.line(f"Balance outstanding at month end: {data['owing']:,.2f}", bold=True)
+    page.save()
+    return buf.getvalue()
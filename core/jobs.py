@@ -0,0 +1,187 @@
+import datetime
+import logging
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.mail import send_mail
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+
+from .exports import export_filename, export_queryset, write_export
+from .imports import IMPORTERS
+from .invoices import statements_filename, write_statements
+from .models import Job, Order
+from .querylog import recording
+
+logger = logging.getLogger(__name__)
+
+# Job kind -> handler(job). A handler returns the job's final message or raises to fail it.
+HANDLERS = {}
+# A running job whose worker has not reported progress for this long is taken to have lost its
+# worker (killed, crashed, or the machine restarted) and goes back on the queue, up to
+# JOB_MAX_ATTEMPTS runs in all. Handlers that run for longer must call set_progress more often.
+JOB_STALE_AFTER = datetime.timedelta(minutes=15)
+JOB_MAX_ATTEMPTS = 3
+# Finished jobs, and the files they uploaded or produced, are deleted after this many days
+JOB_KEEP_DAYS = 7
+
+
+def handler(kind):
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def enqueue(kind, user=None, params=None, input_file=None, run_at=None):
+    job = Job(kind=kind, user=user, params=params or {}, run_at=run_at or timezone.now())
+    if input_file is not None:
+        job.input_file.save(input_file.name, input_file, save=False)
+    job.save()
+    return job
+
+
+def requeue_stale_jobs():
+    """
+    Put running jobs whose worker has gone quiet back on the queue, or fail them once they have
+    used up their attempts. Returns the number of jobs changed.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(status='running', heartbeat_at__lt=now - JOB_STALE_AFTER)
+    failed = stale.filter(attempts__gte=JOB_MAX_ATTEMPTS).update(
+        status='failed', finished_at=now, message=f"Stopped responding {JOB_MAX_ATTEMPTS} times; not retried.")
+    requeued = stale.update(status='queued', heartbeat_at=None)
+    if failed or requeued:
+        logger.warning('Requeued %s and failed %s jobs whose worker stopped responding', requeued, failed)
+    return failed + requeued
+
+
+def claim_next_job():
+    """
+    Take the oldest due job off the queue. The queued -> running UPDATE only matches while the
+    job is still queued, so concurrent workers never run the same job twice.
+    """
+    requeue_stale_jobs()
+    now = timezone.now()
+    candidates = Job.objects.filter(status='queued', run_at__lte=now).order_by('run_at', 'id').values_list('pk', flat=True)[:10]
+    for pk in candidates:
+        if Job.objects.filter(pk=pk, status='queued').update(
+                status='running', started_at=now, heartbeat_at=now, attempts=F('attempts') + 1):
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def set_progress(job, progress, total=None, message=None):
+    # Also the job's heartbeat, which keeps it from being requeued as stale
+    job.progress = progress
+    fields = {'progress': progress, 'heartbeat_at': timezone.now()}
+    if total is not None:
+        job.total = fields['total'] = total
+    if message is not None:
+        job.message = fields['message'] = message
+    Job.objects.filter(pk=job.pk).update(**fields)
+
+
+def run_job(job):
+    try:
+        with recording(f'job:{job.kind}'):
+            message = HANDLERS[job.kind](job)
+    except Exception as e:
+        logger.exception('Job %s (%s) failed', job.pk, job.kind)
+        job.status = 'failed'
+        job.message = str(e)
+    else:
+        job.status = 'done'
+        job.message = message or ''
+        job.progress = job.total
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'message', 'progress', 'finished_at'])
+    # An upload is only read by the run that just ended
+    if job.input_file:
+        job.input_file.delete(save=False)
+        Job.objects.filter(pk=job.pk).update(input_file='')
+    return job
+
+
+def purge_jobs(days=JOB_KEEP_DAYS):
+    """Delete jobs that finished more than `days` days ago, with their files. Returns the count."""
+    finished = Job.objects.filter(status__in=['done', 'failed'], finished_at__lt=timezone.now() - datetime.timedelta(days=days))
+    count, pks = 0, []
+    for job in finished.only('pk', 'input_file', 'result_file').iterator(chunk_size=500):
+        for field in (job.input_file, job.result_file):
+            if field:
+                field.delete(save=False)
+        pks.append(job.pk)
+        if len(pks) == 500:
+            count += Job.objects.filter(pk__in=pks).delete()[0]
+            pks = []
+    return count + Job.objects.filter(pk__in=pks).delete()[0]
+
+
+def job_payload(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'total': job.total,
+        'percent': int(job.progress * 100 / job.total) if job.total else (100 if job.status == 'done' else 0),
+        'message': job.message,
+        'download_url': reverse('job_download', args=[job.id]) if job.result_file else None,
+        'status_url': reverse('job_status', args=[job.id]),
+    }
+
+
+# Handlers
+
+@handler('import')
+def run_import(job):
+    importer = IMPORTERS[job.params['name']]()
+    with job.input_file.open('rb') as csv_file:
+        set_progress(job, 0, total=job.input_file.size)
+        return importer.run(csv_file, progress=lambda rows, position: set_progress(
+            job, min(position, job.total), message=f"{rows} rows processed"))
+
+
+@handler('export')
+def run_export(job):
+    name, fmt = job.params['name'], job.params.get('format', 'csv')
+    query, selected = job.params.get('q', ''), job.params.get('columns', [])
+    set_progress(job, 0, total=export_queryset(name, query).count())
+    with tempfile.TemporaryFile() as tmp:
+        write_export(name, fmt, query, selected, tmp, progress=lambda rows: set_progress(job, rows))
+        tmp.seek(0)
+        job.result_file.save(export_filename(name, fmt), File(tmp), save=False)
+    Job.objects.filter(pk=job.pk).update(result_file=job.result_file.name)
+    return f"Exported {job.progress} rows."
+
+
+@handler('statements')
+def run_statements(job):
+    month = datetime.date.fromisoformat(job.params['month'])
+    with tempfile.TemporaryFile() as tmp:
+        count = write_statements(month, tmp, progress=lambda done, total: set_progress(job, done, total=total))
+        tmp.seek(0)
+        job.result_file.save(statements_filename(month), File(tmp), save=False)
+    Job.objects.filter(pk=job.pk).update(result_file=job.result_file.name)
+    return f"{count} statements for {month:%B %Y}."
+
+
+@handler('payment_reminder')
+def send_payment_reminder(job):
+    order = Order.objects.select_related('customer__customeruser__user').get(pk=job.params['order_id'])
+    # Customers only have an email address through their portal account
+    customer_user = getattr(order.customer, 'customeruser', None)
+    email = customer_user.user.email if customer_user else ''
+    if not email:
+        return f"No email address on file for {order.customer.name}; reminder not sent."
+    send_mail(
+        f"Payment Reminder for Order #{order.id}",
+        "Please complete your payment.",
+        settings.DEFAULT_FROM_EMAIL,
+        [email],
+        fail_silently=True,
+    )
+    return f"Reminder sent to {email}."
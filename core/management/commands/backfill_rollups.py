@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from core.rollups import backfill
+
+class Command(BaseCommand):
+    help = 'Rebuild the monthly analytics rollups (order counts, revenue, per-customer order counts) from scratch.'
+
+    def handle(self, *args, **options):
+        for name, count in backfill().items():
+            self.stdout.write(self.style.SUCCESS(f'{name}: {count} rows'))
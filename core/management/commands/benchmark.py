@@ -0,0 +1,294 @@
+import datetime
+import json
+import logging
+import math
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from django.urls import URLPattern, URLResolver, reverse
+from rest_framework.test import APIClient
+
+from core.fakedata import default_counts, generate, import_csv
+from core.models import (
+    Customer, CustomerUser, InventoryItem, Job, Notification, Order, Payment, Purchase, Requirement, Supplier,
+)
+from core.urls import urlpatterns
+from core.views.api import api_router
+
+# URL name -> model of the object whose pk the URL takes
+OBJECT_ARGS = {
+    'edit_customer': Customer, 'delete_customer': Customer,
+    'edit_inventory': InventoryItem, 'delete_inventory': InventoryItem, 'inventory_qrcode': InventoryItem,
+    'edit_order': Order, 'delete_order': Order, 'customer_invoice_pdf': Order, 'order_qrcode': Order,
+    'edit_requirement': Requirement, 'delete_requirement': Requirement,
+    'edit_payment': Payment, 'delete_payment': Payment,
+    'edit_supplier': Supplier, 'delete_supplier': Supplier,
+    'edit_purchase': Purchase, 'delete_purchase': Purchase,
+    'mark_notification_read': Notification, 'job_status': Job, 'job_download': Job,
+}
+OBJECT_ARGS.update({f'{basename}-detail': viewset.queryset.model for _, viewset, basename in api_router.registry})
+# Extra query strings benchmarked besides the plain URL
+VARIANTS = {
+    'customers': ['?q=khan'],
+    'inventory': ['?q=lawn'],
+    'orders': ['?q=khan'],
+    'purchases': ['?q=lawn'],
+}
+AUTOCOMPLETE_QUERIES = {'customers': 'ali', 'inventory': 'navy', 'orders': 'sana'}
+# POST-only URLs with no GET page to time
+SKIPPED = {'logout', 'api_token_auth'}
+ANONYMOUS = {'register', 'customer_login'}
+NOTIFICATIONS = 100
+
+
+def url_patterns(patterns, api=False):
+    """(name, URLPattern, is an API URL) for every named pattern, API router URLs included."""
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from url_patterns(pattern.url_patterns, api or pattern.urlconf_name is api_router.urls)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield pattern.name, pattern, api
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+
+class QueryCounter:
+    """connection.execute_wrapper() that counts queries (queries_log is reset at every request)."""
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Time every view, import and export at several generated dataset sizes in a throwaway database, '
+            'and write p50/p95 latency, query counts and peak memory to a JSON report.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100,1000',
+                            help='Comma-separated dataset sizes, as numbers of customers (default: 100,1000).')
+        parser.add_argument('--repeat', type=int, default=10, help='Timed requests per URL (default: 10).')
+        parser.add_argument('--import-rows', type=int, default=500, help='Rows in each generated import CSV (default: 500).')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the generated data.')
+        parser.add_argument('--filter', default='', help='Only benchmark URL names containing this text.')
+        parser.add_argument('--warm-cache', action='store_true',
+                            help='Keep the cache between requests (default: every request starts with an empty cache).')
+        parser.add_argument('--output', default='benchmark.json', help='Where to write the JSON report (default: benchmark.json).')
+        parser.add_argument('--compare', help='An earlier report to compare the results with.')
+        parser.add_argument('--threshold', type=float, default=20,
+                            help='With --compare, flag p50 slowdowns above this percentage (default: 20).')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted({int(size) for size in options['sizes'].split(',') if size.strip()})
+        except ValueError:
+            raise CommandError('--sizes must be comma-separated numbers, e.g. 100,1000,10000.')
+        if not sizes or sizes[0] <= 0 or options['repeat'] < 1:
+            raise CommandError('Sizes and --repeat must be positive.')
+        self.options = options
+        report = {
+            'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'commit': git_commit(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'repeat': options['repeat'],
+            'import_rows': options['import_rows'],
+            'seed': options['seed'],
+            'warm_cache': options['warm_cache'],
+            'sizes': [],
+        }
+        with tempfile.TemporaryDirectory() as tmpdir:
+            if connection.vendor == 'sqlite':
+                # An on-disk database, like production, rather than the in-memory test default
+                connection.settings_dict['TEST']['NAME'] = os.path.join(tmpdir, 'benchmark.sqlite3')
+            setup_test_environment()
+            # 404s and 500s are reported in the results rather than logged
+            request_logger = logging.getLogger('django.request')
+            log_level = request_logger.level
+            request_logger.setLevel(logging.CRITICAL)
+            databases = setup_databases(verbosity=0, interactive=False, aliases={'default'}, serialized_aliases=set())
+            try:
+                self.create_users()
+                previous = dict.fromkeys(default_counts(), 0)
+                for index, size in enumerate(sizes):
+                    counts = default_counts(size)
+                    self.stdout.write(self.style.MIGRATE_HEADING(f'Generating data for {size} customers'))
+                    generate({name: counts[name] - previous[name] for name in counts}, seed=options['seed'] + index,
+                             log=lambda message: self.stdout.write(f'  {message}'))
+                    previous = counts
+                    report['sizes'].append(self.run_size(size))
+            finally:
+                teardown_databases(databases, verbosity=0)
+                teardown_test_environment()
+                request_logger.setLevel(log_level)
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}."))
+        if options['compare']:
+            self.compare(options['compare'], report)
+
+    def create_users(self):
+        self.user = User.objects.create_superuser('benchmark', 'benchmark@example.com', 'benchmark')
+        self.portal_user = User.objects.create_user('benchmark-customer', 'customer@example.com', 'benchmark')
+        # Errors are recorded as 500s in the report instead of stopping the run
+        self.clients = {'staff': Client(raise_request_exception=False), 'portal': Client(raise_request_exception=False),
+                        'anonymous': Client(raise_request_exception=False), 'api': APIClient(raise_request_exception=False)}
+        self.clients['staff'].force_login(self.user)
+        self.clients['portal'].force_login(self.portal_user)
+        self.clients['api'].force_authenticate(self.user)
+
+    def fixtures(self):
+        # Rows the detail URLs point at: the newest of each model
+        if not Notification.objects.filter(user=self.user).exists():
+            Notification.objects.bulk_create([Notification(user=self.user, message=f'Notification {i}') for i in range(NOTIFICATIONS)])
+            Job.objects.create(kind='export', status='done', user=self.user)
+        if not CustomerUser.objects.filter(user=self.portal_user).exists():
+            CustomerUser.objects.create(user=self.portal_user, customer=Customer.objects.earliest('id'))
+        return {model: model.objects.latest('id').pk for model in set(OBJECT_ARGS.values())}
+
+    def cases(self):
+        """(name, kind, client, method, url, POST data factory) for everything to time."""
+        pks = self.fixtures()
+        seen = set()
+        for name, pattern, api in url_patterns(urlpatterns):
+            # The API's format-suffix routes reuse the plain routes' names
+            if name in seen:
+                continue
+            seen.add(name)
+            if name in SKIPPED or (self.options['filter'] and self.options['filter'] not in name):
+                continue
+            client = self.clients['api' if api else 'portal' if name == 'customer_dashboard' else
+                                   'anonymous' if name in ANONYMOUS else 'staff']
+            kind = 'api' if api else 'import' if name.endswith('_import') else 'export' if '_export' in name else 'view'
+            if name.endswith('_import'):
+                data = self.import_data(name[:-len('_import')])
+                yield name, kind, client, 'POST', reverse(name), data
+            elif name in OBJECT_ARGS:
+                yield name, kind, client, 'GET', reverse(name, args=[pks[OBJECT_ARGS[name]]]), None
+            elif name == 'model_history':
+                yield name, kind, client, 'GET', reverse(name, args=['Order', pks[Order]]), None
+            elif name == 'autocomplete':
+                for autocomplete, query in AUTOCOMPLETE_QUERIES.items():
+                    yield name, kind, client, 'GET', reverse(name, args=[autocomplete]) + f'?q={query}', None
+            elif name == 'label_sheet':
+                yield name, kind, client, 'GET', reverse(name, args=['orders']) + f'?ids={pks[Order]}', None
+                yield name, kind, client, 'GET', reverse(name, args=['inventory']) + f'?ids={pks[InventoryItem]}', None
+            elif pattern.pattern.regex.groups:
+                # Takes arguments this command doesn't know how to fill in (e.g. a file name)
+                self.stdout.write(f'Skipping {name}: no arguments to benchmark it with.')
+            else:
+                url = reverse(name)
+                for suffix in [''] + VARIANTS.get(name, []):
+                    yield name, kind, client, 'GET', url + suffix, None
+
+    def import_data(self, name):
+        content = import_csv(name, self.options['import_rows'], seed=self.options['seed'])
+        return lambda: {'csv_file': SimpleUploadedFile(f'{name}.csv', content, content_type='text/csv')}
+
+    def request(self, client, method, url, data):
+        # Every request is rolled back, so imports and mark-as-read leave the dataset as it was
+        with transaction.atomic():
+            if method == 'POST':
+                response = client.post(url, data())
+            else:
+                response = client.get(url, HTTP_ACCEPT='application/json' if isinstance(client, APIClient) else '*/*')
+            size = sum(len(chunk) for chunk in response.streaming_content) if response.streaming else len(response.content)
+            transaction.set_rollback(True)
+        return response, size
+
+    def measure(self, client, method, url, data):
+        warm = self.options['warm_cache']
+        self.request(client, method, url, data)  # first hit: imports, template compilation
+        if not warm:
+            cache.clear()
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            response, size = self.request(client, method, url, data)
+        if not warm:
+            cache.clear()
+        tracemalloc.start()
+        self.request(client, method, url, data)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        samples = []
+        for _ in range(self.options['repeat']):
+            if not warm:
+                cache.clear()
+            start = time.perf_counter()
+            self.request(client, method, url, data)
+            samples.append((time.perf_counter() - start) * 1000)
+        return {
+            'status': response.status_code,
+            'p50_ms': round(percentile(samples, 50), 3),
+            'p95_ms': round(percentile(samples, 95), 3),
+            'mean_ms': round(sum(samples) / len(samples), 3),
+            'queries': queries.count,
+            'peak_memory_kb': round(peak / 1024, 1),
+            'response_bytes': size,
+        }
+
+    def run_size(self, size):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Benchmarking with {size} customers'))
+        models = [Customer, InventoryItem, Order, Requirement, Payment, Supplier, Purchase]
+        results = []
+        for name, kind, client, method, url, data in self.cases():
+            result = {'name': name, 'kind': kind, 'method': method, 'url': url, **self.measure(client, method, url, data)}
+            results.append(result)
+            style = self.style.ERROR if result['status'] >= 500 else str
+            self.stdout.write(style(
+                f"  {method:<4} {url:<42} {result['status']}  p50 {result['p50_ms']:8.1f} ms  p95 {result['p95_ms']:8.1f} ms  "
+                f"{result['queries']:4d} queries  {result['peak_memory_kb']:9.1f} KB"))
+        return {'customers': size, 'rows': {model._meta.model_name: model.objects.count() for model in models}, 'results': results}
+
+    def compare(self, path, report):
+        try:
+            with open(path) as f:
+                old = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Cannot read {path}: {e}')
+        before = {(size['customers'], r['method'], r['url']): r for size in old.get('sizes', []) for r in size['results']}
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Compared with {path} (commit {old.get('commit') or 'unknown'})"))
+        slower = 0
+        for size in report['sizes']:
+            for result in size['results']:
+                previous = before.get((size['customers'], result['method'], result['url']))
+                if previous is None:
+                    continue
+                change = (result['p50_ms'] - previous['p50_ms']) / previous['p50_ms'] * 100 if previous['p50_ms'] else 0
+                queries = result['queries'] - previous['queries']
+                if change > self.options['threshold'] or queries > 0:
+                    slower += 1
+                    self.stdout.write(self.style.WARNING(
+                        f"  {size['customers']:>7} {result['method']:<4} {result['url']:<42} p50 {previous['p50_ms']:.1f} -> "
+                        f"{result['p50_ms']:.1f} ms ({change:+.0f}%), queries {previous['queries']} -> {result['queries']}"))
+        if slower:
+            self.stdout.write(self.style.WARNING(f'{slower} result(s) slower or running more queries.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('No regressions.'))
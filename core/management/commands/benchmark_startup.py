@@ -0,0 +1,145 @@
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.management.commands.benchmark import git_commit
+
+# Libraries that should load only when a view needing them is first called
+HEAVY_MODULES = ('rest_framework', 'reportlab', 'qrcode', 'openpyxl', 'icalendar', 'PIL')
+
+# Run in a fresh interpreter per sample: django.setup(), then loading the URLconf and resolving
+# every URL once. Prints one JSON object. With `trace`, memory is measured with tracemalloc
+# (which slows imports down, so those runs are not timed).
+PROBE = '''
+import json, sys, time
+trace = sys.argv[1] == 'trace'
+if trace:
+    import tracemalloc
+    tracemalloc.start()
+heavy = %(heavy)r
+def stage(start):
+    return {
+        'seconds': time.perf_counter() - start,
+        'modules': len(sys.modules),
+        'heavy': sorted(name for name in heavy if name in sys.modules),
+        'traced_kb': tracemalloc.get_traced_memory()[0] / 1024 if trace else None,
+    }
+start = time.perf_counter()
+import django
+django.setup()
+result = {'setup': stage(start)}
+start = time.perf_counter()
+from django.urls import URLResolver, get_resolver, resolve, reverse
+resolver = get_resolver()
+reverse('home')
+result['urlconf'] = stage(start)
+def paths(patterns, prefix=''):
+    for pattern in patterns:
+        route = str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            yield from paths(pattern.url_patterns, prefix + route)
+        elif not route.startswith('^'):
+            yield '/' + prefix + route.replace('<int:', '1<').replace('<str:', 'x<').split('<')[0]
+urls = sorted(set(paths(resolver.url_patterns)))
+start = time.perf_counter()
+for url in urls:
+    try:
+        resolve(url)
+    except Exception:
+        pass
+result['resolve'] = dict(stage(start), urls=len(urls))
+print(json.dumps(result))
+'''
+
+STAGES = ('setup', 'urlconf', 'resolve')
+
+
+class Command(BaseCommand):
+    help = ('Measure cold start: django.setup(), URLconf loading and URL resolution time, modules loaded '
+            'and import-time memory, each in a fresh interpreter, and write them to a JSON report.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Fresh interpreters to time (default: 5).')
+        parser.add_argument('--output', default='benchmark-startup.json',
+                            help='Where to write the JSON report (default: benchmark-startup.json).')
+        parser.add_argument('--compare', help='An earlier report to compare the results with.')
+        parser.add_argument('--threshold', type=float, default=20,
+                            help='With --compare, flag slowdowns above this percentage (default: 20).')
+
+    def probe(self, mode):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        env['PYTHONPATH'] = os.pathsep.join([str(settings.BASE_DIR)] + [p for p in [env.get('PYTHONPATH')] if p])
+        process = subprocess.run([sys.executable, '-c', PROBE % {'heavy': HEAVY_MODULES}, mode],
+                                 cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+        if process.returncode:
+            raise CommandError(f'Startup probe failed:\n{process.stderr}')
+        return json.loads(process.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be positive.')
+        timed = [self.probe('time') for _ in range(options['repeat'])]
+        traced = self.probe('trace')
+        report = {
+            'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'repeat': options['repeat'],
+            'stages': {},
+        }
+        for name in STAGES:
+            samples = [run[name]['seconds'] * 1000 for run in timed]
+            stage = {
+                'median_ms': round(statistics.median(samples), 2),
+                'min_ms': round(min(samples), 2),
+                'modules': timed[0][name]['modules'],
+                'heavy_modules': timed[0][name]['heavy'],
+                'traced_memory_kb': round(traced[name]['traced_kb'], 1),
+            }
+            if name == 'resolve':
+                stage['urls'] = timed[0][name]['urls']
+            report['stages'][name] = stage
+            self.stdout.write(
+                f"{name:<8} {stage['median_ms']:8.1f} ms (min {stage['min_ms']:.1f})  {stage['modules']:5d} modules  "
+                f"{stage['traced_memory_kb']:9.1f} KB allocated  "
+                f"heavy: {', '.join(stage['heavy_modules']) or 'none'}")
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}."))
+        if options['compare']:
+            self.compare(options['compare'], report, options['threshold'])
+
+    def compare(self, path, report, threshold):
+        try:
+            with open(path) as f:
+                old = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Cannot read {path}: {e}')
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Compared with {path} (commit {old.get('commit') or 'unknown'})"))
+        slower = 0
+        for name, stage in report['stages'].items():
+            previous = old.get('stages', {}).get(name)
+            if previous is None:
+                continue
+            change = (stage['median_ms'] - previous['median_ms']) / previous['median_ms'] * 100 if previous['median_ms'] else 0
+            line = (f"  {name:<8} {previous['median_ms']:.1f} -> {stage['median_ms']:.1f} ms ({change:+.0f}%), "
+                    f"{previous['traced_memory_kb']:.0f} -> {stage['traced_memory_kb']:.0f} KB, "
+                    f"{previous['modules']} -> {stage['modules']} modules")
+            if change > threshold:
+                slower += 1
+                self.stdout.write(self.style.WARNING(line))
+            else:
+                self.stdout.write(line)
+        if slower:
+            self.stdout.write(self.style.WARNING(f'{slower} stage(s) slower.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('No regressions.'))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from core.snapshots import end_of_day, take_checkpoint
+
+class Command(BaseCommand):
+    help = ('Write a checkpoint of the stock of every inventory item, which "as of" reports start from. '
+            'Schedule it (e.g. nightly) so a report only replays the inventory history since the last one.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', action='append', default=[],
+                            help='Checkpoint the end of this past day (YYYY-MM-DD) from the inventory history '
+                                 'instead of the live inventory; can be repeated to backfill. Before the first '
+                                 'checkpoint this replays the whole history, which only knows items that have '
+                                 'history, and is refused once that history has been compacted.')
+
+    def handle(self, *args, **options):
+        days = []
+        for value in options['date']:
+            try:
+                day = parse_date(value)
+            except ValueError:
+                day = None
+            if day is None:
+                raise CommandError(f'Invalid date: {value!r} (expected YYYY-MM-DD).')
+            if end_of_day(day) > timezone.now():
+                raise CommandError(f'{day} has not ended yet; run without --date to checkpoint the live inventory.')
+            days.append(day)
+        # Oldest first, so each backfilled checkpoint starts from the one before it
+        moments = [end_of_day(day) for day in sorted(days)] or [None]
+        for moment in moments:
+            try:
+                checkpoint = take_checkpoint(moment)
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS(f'{checkpoint}: {checkpoint.item_count} items'))
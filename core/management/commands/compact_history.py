@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from core.history import RETENTION, expired_records, record_compaction
+from core.models import InventoryItem
+from core.snapshots import take_checkpoint
+
+class Command(BaseCommand):
+    help = ('Delete historical records past their model\'s retention policy (keep_versions or keep_days on '
+            'HistoricalRecords in core/models.py), a range of objects per transaction so writers are never held up for long.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', help='Only this model (e.g. InventoryItem); can be repeated.')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Objects whose history is compacted per transaction, by id range (default: 1000).')
+        parser.add_argument('--sleep', type=float, default=0, help='Seconds to pause after each batch that deleted records (default: 0).')
+        parser.add_argument('--dry-run', action='store_true', help='Count what would be deleted without deleting it.')
+
+    def handle(self, *args, **options):
+        models = {model.__name__.lower(): model for model in RETENTION}
+        names = [name.lower() for name in options['model'] or sorted(models)]
+        unknown = [name for name in names if name not in models]
+        if unknown:
+            raise CommandError(f"No retention policy for {', '.join(unknown)}; models with one: {', '.join(sorted(models))}.")
+        batch_size = max(1, options['batch_size'])
+        now = timezone.now()
+        total = 0
+        for name in names:
+            model = models[name]
+            bounds = model.history.model.objects.aggregate(lower=Min('id'), upper=Max('id'))
+            needs_checkpoint = model is InventoryItem
+            count = 0
+            for lower in range(bounds['lower'] or 0, (bounds['upper'] or -1) + 1, batch_size):
+                expired = expired_records(model, lower, lower + batch_size, now=now)
+                if options['dry_run']:
+                    count += expired.count()
+                    continue
+                newest = expired.aggregate(newest=Max('history_date'))['newest']
+                if newest is None:
+                    continue
+                if needs_checkpoint:
+                    # Stock "as of" a date is worked out from checkpoints plus history; checkpoint
+                    # first so the current stock stays exact once older versions are gone
+                    checkpoint = take_checkpoint()
+                    self.stdout.write(f'{checkpoint}: {checkpoint.item_count} items')
+                    needs_checkpoint = False
+                with transaction.atomic():
+                    record_compaction(model, newest)
+                    count += expired.delete()[0]
+                if options['sleep']:
+                    time.sleep(options['sleep'])
+            total += count
+            verb = 'would be deleted' if options['dry_run'] else 'deleted'
+            self.stdout.write(f'{model.__name__}: {count} historical record(s) {verb}')
+        self.stdout.write(self.style.SUCCESS(f'{total} historical record(s) {"to delete" if options["dry_run"] else "deleted"}.'))
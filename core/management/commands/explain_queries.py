@@ -0,0 +1,102 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+
+from core.dashboard import LOW_STOCK_THRESHOLD, pending
+from core.invoices import month_payments, outstanding_by_customer
+from core.models import Customer, CustomerMonthlyOrderCount, InventoryItem, Job, MonthlyOrderCount, Notification, Order, Payment
+from core.pagination import keyset_filter
+
+
+def hot_queries():
+    """
+    (name, queryset, index the plan should use) for the queries the busy pages and jobs run,
+    built by the same functions they use where there is one. An expected index of None means
+    the query is printed for reference only.
+    """
+    today = datetime.date.today()
+    user = User(pk=1)
+    orders_page = ('-order_date', '-id')
+    return [
+        ('dashboard: low-stock items',
+         InventoryItem.objects.filter(stock_quantity__lte=LOW_STOCK_THRESHOLD).values('item_name', 'stock_quantity'),
+         'core_inventory_low_stock_idx'),
+        ('orders list: first page',
+         Order.objects.select_related('customer').order_by(*orders_page)[:51],
+         'core_order_date_id_idx'),
+        ('orders list: later page',
+         Order.objects.select_related('customer').filter(keyset_filter(orders_page, [today, 1000])).order_by(*orders_page)[:51],
+         'core_order_date_id_idx'),
+        ('dashboard reconcile: pending orders',
+         pending(Order.objects.all()).values('id'),
+         'core_order_status_lower_idx'),
+        ('deliveries due',
+         Order.objects.filter(delivery_date__range=(today, today + datetime.timedelta(days=31))).values('id', 'delivery_date'),
+         'core_order_delivery_idx'),
+        ('dashboard reconcile: outstanding payments',
+         pending(Payment.objects.all()).values('amount'),
+         'core_payment_status_lower_idx'),
+        ('statements: outstanding by customer',
+         outstanding_by_customer(today),
+         'core_payment_status_lower_idx'),
+        ('statements: payments in a month',
+         month_payments(today.replace(day=1), today),
+         'core_payment_date_idx'),
+        ('analytics: orders by month',
+         MonthlyOrderCount.objects.filter(month__gte=today.replace(day=1, year=today.year - 1)).order_by('month'),
+         None),
+        ('analytics: top customers',
+         CustomerMonthlyOrderCount.objects.filter(month__gte=today.replace(day=1, year=today.year - 1))
+         .values('customer_id').annotate(order_count=Sum('count')).order_by('-order_count')[:10],
+         None),
+        ('analytics: inventory stock',
+         InventoryItem.objects.values('item_name').annotate(stock=Sum('stock_quantity')).order_by('-stock')[:10],
+         None),
+        ('notifications list',
+         Notification.objects.filter(user=user).order_by('-created_at'),
+         'core_notification_user_idx'),
+        ('unread notifications',
+         Notification.objects.filter(user=user, is_read=False).order_by('-created_at'),
+         'core_notification_unread_idx'),
+        ('import: customers by name',
+         Customer.objects.filter(name__in=['Alice', 'Bob']).only('id', 'name').order_by('id'),
+         'core_customer_name_idx'),
+        ('job queue: next due job',
+         Job.objects.filter(status='queued', run_at__lte=datetime.datetime.now(datetime.timezone.utc)).order_by('run_at', 'id').values_list('pk', flat=True)[:10],
+         'core_job_queue_idx'),
+        ('job queue: stale running jobs',
+         Job.objects.filter(status='running', heartbeat_at__lt=datetime.datetime.now(datetime.timezone.utc)).values('pk'),
+         'core_job_queue_idx'),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Print EXPLAIN plans for the hot view queries and flag any that no longer use their index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Exit with an error if a query does not use its expected index.')
+        parser.add_argument('--filter', default='', help='Only explain queries whose name contains this text.')
+
+    def handle(self, *args, **options):
+        missing = []
+        for name, queryset, index in hot_queries():
+            if options['filter'].lower() not in name.lower():
+                continue
+            plan = queryset.explain()
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(plan)
+            if index is None:
+                pass
+            elif index in plan:
+                self.stdout.write(self.style.SUCCESS(f'uses {index}'))
+            else:
+                missing.append(name)
+                self.stdout.write(self.style.ERROR(f'does not use {index}'))
+            self.stdout.write('')
+        if missing and options['check']:
+            raise CommandError(f"{len(missing)} quer{'y' if len(missing) == 1 else 'ies'} not using the expected index "
+                               f"on {connection.vendor}: {', '.join(missing)}")
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.fakedata import FAKE_BATCH_SIZE, default_counts, generate
+
+class Command(BaseCommand):
+    help = 'Fill the database with seeded fake customers, inventory, orders, requirements, payments, suppliers and purchases.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=1000,
+                            help='Number of customers; the other models default to a proportional count (default: 1000).')
+        for name in default_counts():
+            parser.add_argument(f'--{name}', type=int, help=f'Number of {name} to create (overrides --size).')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same data.')
+        parser.add_argument('--batch-size', type=int, default=FAKE_BATCH_SIZE, help='Rows per bulk insert.')
+
+    def handle(self, *args, **options):
+        counts = default_counts(options['size'])
+        for name in counts:
+            if options[name] is not None:
+                counts[name] = options[name]
+        if any(count < 0 for count in counts.values()):
+            raise CommandError('Counts cannot be negative.')
+        created = generate(counts, seed=options['seed'], batch_size=options['batch_size'],
+                           log=lambda message: self.stdout.write(f'  {message}'))
+        self.stdout.write(self.style.SUCCESS('Created ' + ', '.join(f'{count} {name}' for name, count in created.items()) + '.'))
@@ -0,0 +1,42 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from core.models import InventoryItem, Order
+from core.thumbnails import IMAGE_DIRS, delete_variants, is_ready, mark_ready, render_or_error
+from core.workers import parallel_map
+
+class Command(BaseCommand):
+    help = ('Make the thumbnails (every size, WebP and JPEG) of inventory and order images that do not have them yet, '
+            'in the worker pool. Pages otherwise make them on first view.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Delete and remake existing thumbnails too.')
+        parser.add_argument('--batch-size', type=int, default=100, help='Images per round of the worker pool (default: 100).')
+
+    def handle(self, *args, **options):
+        names = set()
+        for model in (InventoryItem, Order):
+            names.update(model.objects.exclude(image='').exclude(image__isnull=True).values_list('image', flat=True))
+        names = sorted(name for name in names if name.startswith(IMAGE_DIRS))
+        missing = {name for name in names if not default_storage.exists(name)}
+        if missing:
+            self.stdout.write(self.style.WARNING(f'{len(missing)} image file(s) not found, e.g. {min(missing)}.'))
+        names = [name for name in names if name not in missing]
+        if options['force']:
+            for name in names:
+                delete_variants(name)
+        else:
+            names = [name for name in names if not is_ready(name)]
+        made = failed = 0
+        batch_size = max(1, options['batch_size'])
+        for index in range(0, len(names), batch_size):
+            batch = names[index:index + batch_size]
+            for name, error in zip(batch, parallel_map(render_or_error, batch)):
+                if error:
+                    failed += 1
+                    self.stdout.write(self.style.ERROR(f'{name}: {error}'))
+                else:
+                    made += 1
+                    mark_ready(name)
+            self.stdout.write(f'{index + len(batch)}/{len(names)} images processed')
+        self.stdout.write(self.style.SUCCESS(f'Thumbnails made for {made} image(s); {failed} failed.'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.search import SEARCH_INDEXES, index_available, rebuild_index
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for customers, inventory, orders and purchases.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*', help='Model names to rebuild (default: all), e.g. order customer.')
+
+    def handle(self, *args, **options):
+        models = {model._meta.model_name: model for model in SEARCH_INDEXES}
+        names = [name.lower() for name in options['models']] or list(models)
+        unknown = [name for name in names if name not in models]
+        if unknown:
+            raise CommandError(f"Unknown model(s): {', '.join(unknown)}. Choose from: {', '.join(models)}.")
+        for name in names:
+            model = models[name]
+            if not index_available(model):
+                self.stdout.write(self.style.WARNING(f'No search table for {name}; run migrate (SQLite/PostgreSQL only).'))
+                continue
+            with transaction.atomic():
+                count = rebuild_index(model)
+            self.stdout.write(self.style.SUCCESS(f'Indexed {count} {name} rows.'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core.dashboard import reconcile
+
+class Command(BaseCommand):
+    help = 'Recount the dashboard counters from the database and correct any drift in the snapshot.'
+
+    def handle(self, *args, **options):
+        drift = reconcile()
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('Dashboard snapshot is up to date.'))
+            return
+        for counter, (stored, actual) in drift.items():
+            self.stdout.write(self.style.WARNING(f'{counter}: {stored} -> {actual}'))
+        self.stdout.write(self.style.SUCCESS(f'Corrected {len(drift)} counter(s).'))
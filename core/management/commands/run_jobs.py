@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.jobs import JOB_KEEP_DAYS, claim_next_job, purge_jobs, run_job
+
+# Seconds between purges of old finished jobs while polling
+PURGE_INTERVAL = 60 * 60
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (imports, exports, payment reminders).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty instead of polling.')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to wait between polls of an empty queue.')
+        parser.add_argument('--keep-days', type=int, default=JOB_KEEP_DAYS,
+                            help='Delete finished jobs and their files after this many days.')
+
+    def handle(self, *args, **options):
+        purged_at = None
+        while True:
+            close_old_connections()
+            if purged_at is None or time.monotonic() - purged_at >= PURGE_INTERVAL:
+                purged = purge_jobs(options['keep_days'])
+                if purged:
+                    self.stdout.write(f'Deleted {purged} finished jobs older than {options["keep_days"]} days')
+                purged_at = time.monotonic()
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+                continue
+            self.stdout.write(f'Running {job}')
+            job = run_job(job)
+            style = self.style.SUCCESS if job.status == 'done' else self.style.ERROR
+            self.stdout.write(style(f'{job}: {job.message}'))
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import querylog
+
+class Command(BaseCommand):
+    help = 'Show the SQL statements (fingerprinted) that take the most database time, overall or per view.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--by-view', action='store_true', help='Report each fingerprint separately for every view that runs it.')
+        parser.add_argument('--sort', choices=['total', 'count', 'p95', 'mean'], default='total', help='Rank by total time (default), executions, p95 or mean time.')
+        parser.add_argument('--limit', type=int, default=20, help='Number of fingerprints to show.')
+        parser.add_argument('--slow', action='store_true', help='Also show the most recent slow statements with their query plans.')
+        parser.add_argument('--reset', action='store_true', help='Clear the figures of every process and exit.')
+
+    def handle(self, *args, **options):
+        if getattr(settings, 'CACHE_BACKEND', 'locmem') == 'locmem':
+            self.stderr.write(self.style.WARNING(
+                'CACHE_BACKEND is locmem: only this process is visible. Use file or redis to see the web and job workers.'))
+        if options['reset']:
+            querylog.reset()
+            self.stdout.write('Query figures cleared.')
+            return
+        series, recent = querylog.merged()
+        rows = querylog.summarize(series, options['by_view'], options['sort'], options['limit'])
+        if not rows:
+            self.stdout.write('No queries recorded yet.')
+        for row in rows:
+            where = row['view'] or ', '.join(row['views'][:5]) + (' ...' if len(row['views']) > 5 else '')
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{row['total_ms']:>10.1f} ms total  {row['count']:>7} x  mean {row['mean_ms']:.2f} ms  "
+                f"p95 {row['p95_ms']:.2f} ms  max {row['max_ms']:.2f} ms  [{where}]"))
+            self.stdout.write(f"  {row['fingerprint']}")
+        if options['slow']:
+            threshold = getattr(settings, 'SLOW_QUERY_MS', querylog.SLOW_QUERY_MS)
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\nRecent statements over {threshold} ms:'))
+            for entry in recent[:options['limit']]:
+                self.stdout.write(f"{entry['ms']:.1f} ms in {entry['view']}: {entry['sql']}")
+                for line in (entry['plan'] or '(no plan)').splitlines():
+                    self.stdout.write(f'    {line}')
@@ -0,0 +1,223 @@
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.db import connections
+from django.http import FileResponse
+from django.template.backends.django import DjangoTemplates, Template
+
+from . import querylog
+from .threadstores import ThreadStores
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# name -> (type, help, label names, histogram buckets)
+METRICS = {
+    'stockstitch_requests_total': (
+        'counter', 'Requests served, by URL name, method and status.', ('view', 'method', 'status'), None),
+    'stockstitch_request_duration_seconds': (
+        'histogram', 'Time from the first middleware to the last byte of the response.', ('view', 'method'), LATENCY_BUCKETS),
+    'stockstitch_request_queries': (
+        'histogram', 'SQL queries run per request.', ('view', 'method'), QUERY_BUCKETS),
+    'stockstitch_request_sql_seconds': (
+        'histogram', 'Time spent executing SQL per request.', ('view', 'method'), LATENCY_BUCKETS),
+    'stockstitch_request_template_seconds': (
+        'histogram', 'Time spent rendering templates per request.', ('view', 'method'), LATENCY_BUCKETS),
+    'stockstitch_response_size_bytes': (
+        'histogram', 'Response body size.', ('view', 'method'), SIZE_BUCKETS),
+}
+
+
+def add(totals, key, series):
+    total = totals.get(key)
+    if total is None:
+        totals[key] = list(series)
+    else:
+        for i, value in enumerate(series):
+            total[i] += value
+
+
+# Every thread records into its own dict of series, so recording never takes a lock; a
+# scrape adds up the dicts of all threads. dict.copy is atomic in CPython.
+_stores = ThreadStores(add)
+
+# The RequestMetrics of the request being handled, for the template backend
+current_request = ContextVar('current_request_metrics', default=None)
+
+
+def thread_store():
+    return _stores.get()
+
+
+def observe(name, labels, value):
+    """Add `value` to histogram `name`. A series is [count per bucket..., count over the last bucket, sum]."""
+    buckets = METRICS[name][3]
+    store = thread_store()
+    series = store.get((name, labels))
+    if series is None:
+        series = store[(name, labels)] = [0] * (len(buckets) + 2)
+    series[bisect_left(buckets, value)] += 1
+    series[-1] += value
+
+
+def increment(name, labels, amount=1):
+    store = thread_store()
+    series = store.get((name, labels))
+    if series is None:
+        series = store[(name, labels)] = [0]
+    series[0] += amount
+
+
+def collect():
+    """All series summed over every thread: {(name, labels): series}."""
+    totals = {}
+    for store in _stores.all():
+        for key, series in store.copy().items():
+            add(totals, key, series)
+    return totals
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def label_text(names, values, extra=()):
+    pairs = [f'{name}="{escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_metrics():
+    """Everything recorded so far, in the Prometheus text exposition format."""
+    totals = collect()
+    lines = []
+    for name, (kind, help_text, label_names, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for (series_name, labels), series in sorted(totals.items()):
+            if series_name != name:
+                continue
+            if kind == 'counter':
+                lines.append(f'{name}{label_text(label_names, labels)} {number(series[0])}')
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), series):
+                cumulative += count
+                lines.append(f"{name}_bucket{label_text(label_names, labels, [('le', bound)])} {cumulative}")
+            lines.append(f'{name}_sum{label_text(label_names, labels)} {number(series[-1])}')
+            lines.append(f'{name}_count{label_text(label_names, labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+class RequestMetrics:
+    """SQL and template time of one request; execute() is installed as a connection execute_wrapper."""
+    def __init__(self, request=None):
+        self.request = request
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.rendering = 0
+
+    def execute(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.queries += 1
+            self.sql_time += duration
+            querylog.record(view_label(self.request), sql, params, duration, context['connection'])
+
+    def wrap_connections(self, stack):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self.execute))
+
+
+def view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.route
+
+
+class MetricsMiddleware:
+    """
+    Records latency, SQL, template time and response size per URL name; served by the
+    `metrics` view. Goes first in MIDDLEWARE so the timings include the other middleware.
+    Streamed responses (exports) are recorded once the last chunk has been sent.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics(request)
+        start = time.perf_counter()
+        token = current_request.set(metrics)
+        try:
+            with ExitStack() as stack:
+                metrics.wrap_connections(stack)
+                response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        if response.streaming and not isinstance(response, FileResponse):
+            response.streaming_content = self.stream(request, response, response.streaming_content, metrics, start)
+        else:
+            if response.streaming:
+                size = int(response.get('Content-Length') or 0)
+            else:
+                size = len(response.content)
+            self.record(request, response, metrics, start, size)
+        return response
+
+    def stream(self, request, response, content, metrics, start):
+        size = 0
+        try:
+            with ExitStack() as stack:
+                metrics.wrap_connections(stack)
+                for chunk in content:
+                    size += len(chunk)
+                    yield chunk
+        finally:
+            self.record(request, response, metrics, start, size)
+
+    def record(self, request, response, metrics, start, size):
+        labels = (view_label(request), request.method)
+        increment('stockstitch_requests_total', labels + (str(response.status_code),))
+        observe('stockstitch_request_duration_seconds', labels, time.perf_counter() - start)
+        observe('stockstitch_request_queries', labels, metrics.queries)
+        observe('stockstitch_request_sql_seconds', labels, metrics.sql_time)
+        observe('stockstitch_request_template_seconds', labels, metrics.template_time)
+        observe('stockstitch_response_size_bytes', labels, size)
+        querylog.flush()
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = current_request.get()
+        if metrics is None or metrics.rendering:
+            # Not in a request, or rendered from inside another template (already being timed)
+            return super().render(context, request)
+        metrics.rendering += 1
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.rendering -= 1
+            metrics.template_time += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing each top-level render for MetricsMiddleware."""
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
@@ -0,0 +1,63 @@
+from django.db import migrations
+
+# model name -> (index columns, SELECT filling them from the existing rows, id first)
+SEARCH_TABLES = {
+    'customer': (
+        ['name', 'contact', 'address'],
+        'SELECT id, name, contact, address FROM core_customer',
+    ),
+    'inventoryitem': (
+        ['item_name', 'fabric_type', 'supplier', 'color', 'size'],
+        'SELECT id, item_name, fabric_type, supplier, color, size FROM core_inventoryitem',
+    ),
+    'order': (
+        ['customer', 'status', 'product_type', 'notes'],
+        'SELECT o.id, c.name, o.status, o.product_type, o.notes '
+        'FROM core_order o JOIN core_customer c ON c.id = o.customer_id',
+    ),
+    'purchase': (
+        ['supplier', 'item', 'notes'],
+        'SELECT p.id, s.name, i.item_name, p.notes FROM core_purchase p '
+        'JOIN core_supplier s ON s.id = p.supplier_id JOIN core_inventoryitem i ON i.id = p.item_id',
+    ),
+}
+
+
+def create_search_tables(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for name, (columns, select) in SEARCH_TABLES.items():
+        if vendor == 'sqlite':
+            table = f'core_fts_{name}'
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {table} USING fts5({', '.join(columns)}, tokenize='trigram')")
+            schema_editor.execute(f"INSERT INTO {table} (rowid, {', '.join(columns)}) {select}")
+        elif vendor == 'postgresql':
+            table = f'core_search_{name}'
+            document = ' || '.join(
+                f"setweight(to_tsvector('simple', coalesce(src.c{i}, '')), '{'ABCD'[min(i, 3)]}')"
+                for i in range(len(columns)))
+            aliases = ', '.join(f'c{i}' for i in range(len(columns)))
+            schema_editor.execute(f'CREATE TABLE {table} (object_id bigint PRIMARY KEY, document tsvector NOT NULL)')
+            schema_editor.execute(f'CREATE INDEX {table}_document_idx ON {table} USING gin (document)')
+            schema_editor.execute(
+                f'INSERT INTO {table} (object_id, document) SELECT src.id, {document} FROM ({select}) AS src (id, {aliases})')
+
+
+def drop_search_tables(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for name in SEARCH_TABLES:
+        if vendor == 'sqlite':
+            schema_editor.execute(f'DROP TABLE IF EXISTS core_fts_{name}')
+        elif vendor == 'postgresql':
+            schema_editor.execute(f'DROP TABLE IF EXISTS core_search_{name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_order_date_id_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_tables, drop_search_tables),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_customers', models.IntegerField(default=0)),
+                ('total_orders', models.IntegerField(default=0)),
+                ('pending_orders', models.IntegerField(default=0)),
+                ('total_inventory', models.IntegerField(default=0)),
+                ('low_stock_items', models.IntegerField(default=0)),
+                ('total_payments', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('outstanding_payments', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_suppliers', models.IntegerField(default=0)),
+                ('total_purchases', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_rollups(apps, schema_editor):
+    # Same as the backfill_rollups command, against the historical models
+    Order = apps.get_model('core', 'Order')
+    Payment = apps.get_model('core', 'Payment')
+    MonthlyOrderCount = apps.get_model('core', 'MonthlyOrderCount')
+    MonthlyRevenue = apps.get_model('core', 'MonthlyRevenue')
+    CustomerMonthlyOrderCount = apps.get_model('core', 'CustomerMonthlyOrderCount')
+    orders = Order.objects.annotate(m=TruncMonth('order_date')).order_by()
+    payments = Payment.objects.annotate(m=TruncMonth('payment_date')).order_by()
+    MonthlyOrderCount.objects.bulk_create(
+        [MonthlyOrderCount(month=row['m'], count=row['n']) for row in orders.values('m').annotate(n=Count('id'))],
+        batch_size=500)
+    MonthlyRevenue.objects.bulk_create(
+        [MonthlyRevenue(month=row['m'], total=row['t'] or 0) for row in payments.values('m').annotate(t=Sum('amount'))],
+        batch_size=500)
+    CustomerMonthlyOrderCount.objects.bulk_create(
+        [CustomerMonthlyOrderCount(customer_id=row['customer_id'], month=row['m'], count=row['n'])
+         for row in orders.values('customer_id', 'm').annotate(n=Count('id'))],
+        batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_dashboardsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyOrderCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MonthlyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(blank=True, null=True, unique=True)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CustomerMonthlyOrderCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('count', models.IntegerField(default=0)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_order_counts', to='core.customer')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['month', 'customer'], name='core_cust_month_idx')],
+                'constraints': [models.UniqueConstraint(fields=('customer', 'month'), name='core_customer_month_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
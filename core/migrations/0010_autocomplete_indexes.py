@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:00
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_hot_column_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='core_customer_name_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(django.db.models.functions.text.Lower('item_name'), name='core_inventory_name_lower_idx'),
+        ),
+    ]
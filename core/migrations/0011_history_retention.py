@@ -0,0 +1,78 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_autocomplete_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalcustomer',
+            name='history_changes',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='historicalinventoryitem',
+            name='history_changes',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='historicalorder',
+            name='history_changes',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='historicalpayment',
+            name='history_changes',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='historicalpurchase',
+            name='history_changes',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='historicalrequirement',
+            name='history_changes',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='historicalsupplier',
+            name='history_changes',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='historicalcustomer',
+            index=models.Index(fields=['id', 'history_date'], name='core_hcustomer_id_date'),
+        ),
+        migrations.AddIndex(
+            model_name='historicalinventoryitem',
+            index=models.Index(fields=['id', 'history_date'], name='core_hinventoryitem_id_date'),
+        ),
+        migrations.AddIndex(
+            model_name='historicalorder',
+            index=models.Index(fields=['id', 'history_date'], name='core_horder_id_date'),
+        ),
+        migrations.AddIndex(
+            model_name='historicalpayment',
+            index=models.Index(fields=['id', 'history_date'], name='core_hpayment_id_date'),
+        ),
+        migrations.AddIndex(
+            model_name='historicalpurchase',
+            index=models.Index(fields=['id', 'history_date'], name='core_hpurchase_id_date'),
+        ),
+        migrations.AddIndex(
+            model_name='historicalrequirement',
+            index=models.Index(fields=['id', 'history_date'], name='core_hrequirement_id_date'),
+        ),
+        migrations.AddIndex(
+            model_name='historicalsupplier',
+            index=models.Index(fields=['id', 'history_date'], name='core_hsupplier_id_date'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_history_retention'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='historicalcustomer',
+            index=models.Index(fields=['history_user', 'history_date'], name='core_hcustomer_user_date'),
+        ),
+        migrations.AddIndex(
+            model_name='historicalinventoryitem',
+            index=models.Index(fields=['history_user', 'history_date'], name='core_hinventoryitem_user_date'),
+        ),
+        migrations.AddIndex(
+            model_name='historicalorder',
+            index=models.Index(fields=['history_user', 'history_date'], name='core_horder_user_date'),
+        ),
+        migrations.AddIndex(
+            model_name='historicalpayment',
+            index=models.Index(fields=['history_user', 'history_date'], name='core_hpayment_user_date'),
+        ),
+        migrations.AddIndex(
+            model_name='historicalpurchase',
+            index=models.Index(fields=['history_user', 'history_date'], name='core_hpurchase_user_date'),
+        ),
+        migrations.AddIndex(
+            model_name='historicalrequirement',
+            index=models.Index(fields=['history_user', 'history_date'], name='core_hrequirement_user_date'),
+        ),
+        migrations.AddIndex(
+            model_name='historicalsupplier',
+            index=models.Index(fields=['history_user', 'history_date'], name='core_hsupplier_user_date'),
+        ),
+    ]
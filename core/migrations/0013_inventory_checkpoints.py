@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_history_user_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField(unique=True)),
+                ('item_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='InventoryCheckpointItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_id', models.IntegerField()),
+                ('item_name', models.CharField(max_length=100)),
+                ('item_type', models.CharField(max_length=20)),
+                ('fabric_type', models.CharField(max_length=100)),
+                ('cost_per_meter', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('total_meters', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('taxes', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('stock_quantity', models.PositiveIntegerField(default=0)),
+                ('checkpoint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='core.inventorycheckpoint')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('checkpoint', 'item_id'), name='core_checkpoint_item_unique')],
+            },
+        ),
+    ]
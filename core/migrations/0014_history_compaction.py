@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_inventory_checkpoints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoryCompaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100, unique=True)),
+                ('compacted_through', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:29
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_history_compaction'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='order',
+            name='core_order_status_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='payment',
+            name='core_payment_pending_idx',
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(django.db.models.functions.text.Lower('status'), models.F('order_date'), name='core_order_status_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(django.db.models.functions.text.Lower('status'), models.F('payment_date'), models.F('amount'), models.F('order_id'), name='core_payment_status_lower_idx'),
+        ),
+    ]
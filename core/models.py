@@ -1,6 +1,9 @@
 from django.db import models
 from django.contrib.auth.models import User
-from simple_history.models import HistoricalRecords
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from .history import HistoricalRecords
 
 class Customer(models.Model):
     name = models.CharField(max_length=100)
@@ -9,6 +12,14 @@ class Customer(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     history = HistoricalRecords()
 
+    class Meta:
+        indexes = [
+            # Importers resolve customers by name
+            models.Index(fields=['name'], name='core_customer_name_idx'),
+            # Autocomplete prefix search
+            models.Index(Lower('name'), name='core_customer_name_lower_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -29,7 +40,16 @@ class InventoryItem(models.Model):
     stock_quantity = models.PositiveIntegerField(default=0)
     supplier = models.CharField(max_length=100, blank=True)
     image = models.ImageField(upload_to='inventory/', blank=True, null=True)
-    history = HistoricalRecords()
+    # Edited whenever stock is counted; only recent versions are ever looked at
+    history = HistoricalRecords(keep_versions=200)
+
+    class Meta:
+        indexes = [
+            # Dashboard low-stock list, answered from the index alone
+            models.Index(fields=['stock_quantity', 'item_name'], condition=models.Q(stock_quantity__lte=5), name='core_inventory_low_stock_idx'),
+            # Autocomplete prefix search
+            models.Index(Lower('item_name'), name='core_inventory_name_lower_idx'),
+        ]
 
     def __str__(self):
         return f"{self.item_name} ({self.item_type})"
@@ -44,7 +64,16 @@ class Order(models.Model):
     order_date = models.DateField(auto_now_add=True)
     delivery_date = models.DateField(blank=True, null=True)
     image = models.ImageField(upload_to='orders/', blank=True, null=True)
-    history = HistoricalRecords()
+    history = HistoricalRecords(keep_days=730)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the orders list walks (order_date, id)
+            models.Index(fields=['order_date', 'id'], name='core_order_date_id_idx'),
+            # Pending orders (status matched in any case, see dashboard.pending)
+            models.Index(Lower('status'), 'order_date', name='core_order_status_lower_idx'),
+            models.Index(fields=['delivery_date'], name='core_order_delivery_idx'),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} for {self.customer.name}"
@@ -59,10 +88,10 @@ class Requirement(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     notes = models.TextField(blank=True)
-    history = HistoricalRecords()
+    history = HistoricalRecords(keep_versions=100)
 
     def __str__(self):
-        return f"Requirement for Order #{self.order.id if self.order else 'N/A'}"
+        return f"Requirement for Order #{self.order_id or 'N/A'}"
 
 class Payment(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='payments')
@@ -72,8 +101,15 @@ class Payment(models.Model):
     notes = models.TextField(blank=True)
     history = HistoricalRecords()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['payment_date'], name='core_payment_date_idx'),
+            # Outstanding payments (status matched in any case), answered from the index alone
+            models.Index(Lower('status'), 'payment_date', 'amount', 'order_id', name='core_payment_status_lower_idx'),
+        ]
+
     def __str__(self):
-        return f"Payment for Order #{self.order.id} - {self.amount}"
+        return f"Payment for Order #{self.order_id} - {self.amount}"
 
 class Supplier(models.Model):
     name = models.CharField(max_length=100)
@@ -103,6 +139,14 @@ class Notification(models.Model):
     url = models.CharField(max_length=255, blank=True)
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='core_notification_user_idx'),
+            # is_read=False compiles to NOT is_read, which only a partial index can serve
+            models.Index(fields=['user', 'created_at'], condition=models.Q(is_read=False), name='core_notification_unread_idx'),
+        ]
+
     def __str__(self):
         return f"Notification for {self.user.username}: {self.message[:30]}"
 
@@ -111,3 +155,121 @@ class CustomerUser(models.Model):
     customer = models.OneToOneField('Customer', on_delete=models.CASCADE)
     def __str__(self):
         return f"CustomerUser: {self.user.username}"
+
+class Job(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    kind = models.CharField(max_length=50)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    params = models.JSONField(default=dict, blank=True)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    input_file = models.FileField(upload_to='jobs/input/', blank=True, null=True)
+    result_file = models.FileField(upload_to='jobs/results/', blank=True, null=True)
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    message = models.TextField(blank=True)
+    run_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    # Last sign of life from the worker running it; a running job without one for a while is requeued
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+    attempts = models.PositiveIntegerField(default=0)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        # The worker polls for the oldest due job in 'queued', and for stale ones in 'running'
+        indexes = [models.Index(fields=['status', 'run_at'], name='core_job_queue_idx')]
+
+    def __str__(self):
+        return f"Job #{self.id} {self.kind} ({self.status})"
+
+class DashboardSnapshot(models.Model):
+    """
+    Single row (pk=1) of dashboard counters, kept current by the signal handlers in
+    core.signals and corrected by the reconcile_dashboard command.
+    """
+    total_customers = models.IntegerField(default=0)
+    total_orders = models.IntegerField(default=0)
+    pending_orders = models.IntegerField(default=0)
+    total_inventory = models.IntegerField(default=0)
+    low_stock_items = models.IntegerField(default=0)
+    total_payments = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    outstanding_payments = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_suppliers = models.IntegerField(default=0)
+    total_purchases = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Dashboard snapshot at {self.updated_at:%Y-%m-%d %H:%M}"
+
+# Monthly rollups for the analytics page, maintained by core.rollups. `month` is the first
+# day of the month.
+
+class MonthlyOrderCount(models.Model):
+    month = models.DateField(unique=True)
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.month:%Y-%m}: {self.count} orders"
+
+class MonthlyRevenue(models.Model):
+    # Payments without a payment date are totalled under a NULL month
+    month = models.DateField(unique=True, null=True, blank=True)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.month:%Y-%m}: {self.total}" if self.month else f"Undated: {self.total}"
+
+class CustomerMonthlyOrderCount(models.Model):
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='monthly_order_counts')
+    month = models.DateField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['customer', 'month'], name='core_customer_month_unique')]
+        indexes = [models.Index(fields=['month', 'customer'], name='core_cust_month_idx')]
+
+    def __str__(self):
+        return f"{self.customer_id} {self.month:%Y-%m}: {self.count} orders"
+
+class HistoryCompaction(models.Model):
+    """How far compact_history has deleted a model's history: the newest record it removed."""
+    model = models.CharField(max_length=100, unique=True)  # label of the tracked model, e.g. core.inventoryitem
+    compacted_through = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.model} compacted through {self.compacted_through:%Y-%m-%d %H:%M}"
+
+# Inventory checkpoints: the stock of every item at a moment, written by the
+# checkpoint_inventory command. core.snapshots answers "as of" questions from the latest
+# checkpoint before a moment plus the inventory history recorded after it.
+
+class InventoryCheckpoint(models.Model):
+    # Changes recorded before this moment are included
+    taken_at = models.DateTimeField(unique=True)
+    item_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"Inventory checkpoint at {self.taken_at:%Y-%m-%d %H:%M}"
+
+class InventoryCheckpointItem(models.Model):
+    checkpoint = models.ForeignKey(InventoryCheckpoint, on_delete=models.CASCADE, related_name='items')
+    # Not a foreign key: checkpoints keep items deleted since
+    item_id = models.IntegerField()
+    item_name = models.CharField(max_length=100)
+    item_type = models.CharField(max_length=20)
+    fabric_type = models.CharField(max_length=100)
+    cost_per_meter = models.DecimalField(max_digits=10, decimal_places=2)
+    total_meters = models.DecimalField(max_digits=10, decimal_places=2)
+    taxes = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    stock_quantity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['checkpoint', 'item_id'], name='core_checkpoint_item_unique')]
+
+    def __str__(self):
+        return f"{self.item_name} at {self.checkpoint_id}"
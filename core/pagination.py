@@ -0,0 +1,145 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import CharField, DateField, IntegerField, Q, TextField
+
+PAGE_SIZE = 50
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder cuts times to milliseconds; a cursor needs the exact value or rows
+        # within the same millisecond are skipped
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    data = json.dumps(values, cls=CursorEncoder).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+def cursor_values(queryset, ordering, cursor):
+    """
+    The values of `cursor` as Python values of the `ordering` fields (model fields or
+    annotations of `queryset`), or None unless there is one valid value per field (e.g. an
+    int for id, a parseable date for order_date, a string for a text column).
+    """
+    values = decode_cursor(cursor)
+    if values is None or len(values) != len(ordering):
+        return None
+    converted = []
+    for name, value in zip(ordering, values):
+        name = name.lstrip('-')
+        try:
+            if name in queryset.query.annotations:
+                field = queryset.query.annotations[name].output_field
+            else:
+                field = queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        if value is None or isinstance(value, bool):
+            return None
+        if isinstance(field, IntegerField) and not isinstance(value, int):
+            return None
+        if isinstance(field, (CharField, DateField, TextField)) and not isinstance(value, str):
+            return None
+        try:
+            converted.append(field.to_python(value))
+        except (ValidationError, TypeError, ValueError):
+            return None
+    return converted
+
+
+def keyset_filter(ordering, values, backwards=False):
+    """
+    Rows strictly after `values` in `ordering`, e.g. for ('-order_date', '-id'):
+    order_date < d OR (order_date = d AND id < i). Walking backwards flips each comparison.
+    """
+    condition = None
+    equal = {}
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        descending = field.startswith('-') != backwards
+        term = Q(**equal, **{f"{name}__{'lt' if descending else 'gt'}": value})
+        condition = term if condition is None else condition | term
+        equal[name] = value
+    return condition
+
+
+def reverse_ordering(ordering):
+    return [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+
+class KeysetPage:
+    def __init__(self, request, object_list, ordering, has_next, has_previous):
+        self.request = request
+        self.object_list = object_list
+        self.ordering = ordering
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def cursor_for(self, obj):
+        return encode_cursor([getattr(obj, field.lstrip('-')) for field in self.ordering])
+
+    def url_with(self, param, cursor):
+        params = self.request.GET.copy()
+        params.pop('after', None)
+        params.pop('before', None)
+        params[param] = cursor
+        return f'?{params.urlencode()}'
+
+    @property
+    def next_url(self):
+        if self.has_next and self.object_list:
+            return self.url_with('after', self.cursor_for(self.object_list[-1]))
+        return ''
+
+    @property
+    def previous_url(self):
+        if self.has_previous and self.object_list:
+            return self.url_with('before', self.cursor_for(self.object_list[0]))
+        return ''
+
+
+def keyset_paginate(request, queryset, ordering=('-id',), per_page=PAGE_SIZE):
+    """
+    Keyset ("seek") pagination: pages are selected with WHERE on the ordering columns rather
+    than OFFSET, so every page costs one indexed range scan however deep it is. The ordering
+    must end in a unique column (normally id) so the position of every row is exact.
+    """
+    ordering = list(ordering)
+    after = cursor_values(queryset, ordering, request.GET.get('after'))
+    before = cursor_values(queryset, ordering, request.GET.get('before'))
+    if before is not None:
+        rows = list(queryset.filter(keyset_filter(ordering, before, backwards=True))
+                    .order_by(*reverse_ordering(ordering))[:per_page + 1])
+        if len(rows) > per_page:
+            return KeysetPage(request, rows[:per_page][::-1], ordering, has_next=True, has_previous=True)
+        # Walked back to the start: show a full first page
+        after = None
+    if after is not None:
+        queryset = queryset.filter(keyset_filter(ordering, after))
+    rows = list(queryset.order_by(*ordering)[:per_page + 1])
+    return KeysetPage(request, rows[:per_page], ordering, has_next=len(rows) > per_page, has_previous=after is not None)
@@ -0,0 +1,292 @@
+import cProfile
+import io
+import marshal
+import pstats
+import re
+import sys
+import sysconfig
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+
+from .metrics import view_label
+from .querylog import fingerprint
+
+MODES = ('cprofile', 'sample')
+# Seconds between stack samples in sample mode
+SAMPLE_INTERVAL = 0.001
+# Profiles kept in PROFILE_ROOT; older ones are deleted
+KEEP_PROFILES = 50
+# Call tree branches under this share of the total time are left out
+TREE_MIN_SHARE = 0.005
+TREE_MAX_DEPTH = 60
+UNSAFE = re.compile(r'[^\w-]')
+PROFILE_NAME = re.compile(r'^[\w-]+\.(txt|prof|folded)$')
+# One cProfile at a time: Python allows a single active profiler, so a cprofile request made
+# while another is running (or under an outside profiler) is sampled instead
+_cprofile_lock = threading.Lock()
+
+SITE_PACKAGES = re.compile(r'[\\/](?:site|dist)-packages[\\/]')
+# Frames of the profiling machinery itself, skipped when looking for the code that ran a query
+OWN_FILES = ('core/profiling.py', 'core/metrics.py', 'core/querylog.py')
+
+
+@lru_cache(maxsize=None)
+def short_path(filename):
+    base = str(settings.BASE_DIR) + '/'
+    if filename.startswith(base):
+        return filename[len(base):]
+    match = SITE_PACKAGES.search(filename)
+    if match:
+        return filename[match.end():]
+    stdlib = sysconfig.get_paths()['stdlib'] + '/'
+    if filename.startswith(stdlib):
+        return filename[len(stdlib):]
+    return filename
+
+
+@lru_cache(maxsize=None)
+def is_app_code(filename):
+    return (filename.startswith(str(settings.BASE_DIR)) and not SITE_PACKAGES.search(filename)
+            and not short_path(filename).endswith(OWN_FILES))
+
+
+def call_site(frame):
+    """'path:line in function' of the innermost frame of project code (not Django or a library)."""
+    while frame is not None:
+        code = frame.f_code
+        if is_app_code(code.co_filename):
+            return f'{short_path(code.co_filename)}:{frame.f_lineno} in {code.co_name}'
+        frame = frame.f_back
+    return '(outside project code)'
+
+
+class SQLRecorder:
+    """execute_wrapper adding up SQL time per (call site, fingerprint) while a request is profiled."""
+    def __init__(self):
+        self.sites = {}
+        self.running = None
+
+    def __call__(self, execute, sql, params, many, context):
+        site = call_site(sys._getframe(1))
+        shape = fingerprint(sql)
+        self.running = shape
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.running = None
+            entry = self.sites.setdefault((site, shape), [0, 0.0])
+            entry[0] += 1
+            entry[1] += time.perf_counter() - start
+
+    def report(self):
+        lines = []
+        by_time = sorted(self.sites.items(), key=lambda item: -item[1][1])
+        for (site, shape), (count, seconds) in by_time:
+            lines.append(f'{seconds * 1000:9.2f} ms {count:5} x  {site}')
+            lines.append(f'                     {shape}')
+        return '\n'.join(lines) or '(no queries)'
+
+    def totals(self):
+        return sum(count for count, _ in self.sites.values()), sum(seconds for _, seconds in self.sites.values())
+
+
+class Sampler(threading.Thread):
+    """Samples the stack of one thread below frame `top` every SAMPLE_INTERVAL seconds into collapsed-stack counts."""
+    def __init__(self, thread_id, top, sql):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.top = top
+        self.sql = sql
+        self.stacks = Counter()
+        self.done = threading.Event()
+
+    def run(self):
+        while not self.done.wait(SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame is not self.top:
+                code = frame.f_code
+                stack.append(f'{short_path(code.co_filename)}:{code.co_name}')
+                frame = frame.f_back
+            stack.reverse()
+            if self.sql.running:
+                # The query in flight, as a leaf under the code that ran it
+                stack.append(f'SQL {self.sql.running[:200]}')
+            self.stacks[';'.join(stack)] += 1
+
+    def stop(self):
+        self.done.set()
+        self.join()
+
+    def folded(self):
+        return '\n'.join(f'{stack} {count}' for stack, count in self.stacks.most_common()) + '\n'
+
+
+def frame_label(func):
+    filename, line, name = func
+    if filename == '~':
+        return name
+    return f'{short_path(filename)}:{line}({name})'
+
+
+def call_tree(stats, total):
+    """The cProfile call graph as an indented tree of cumulative times, from the outermost calls down."""
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((edge[3], edge[1], func))
+    # Calls made straight from the profiled block record no caller edge
+    roots = [(ct, nc - sum(edge[1] for edge in callers.values()), func)
+             for func, (_, nc, _, ct, callers) in stats.stats.items()
+             if nc > sum(edge[1] for edge in callers.values())]
+    lines = []
+
+    def walk(entries, depth, path):
+        for cumulative, calls, func in sorted(entries, key=lambda entry: -entry[0]):
+            if total and cumulative < total * TREE_MIN_SHARE:
+                continue
+            lines.append(f'{cumulative * 1000:9.1f} ms {calls:6}  {"  " * depth}{frame_label(func)}')
+            if func not in path and depth < TREE_MAX_DEPTH:
+                walk(callees.get(func, []), depth + 1, path | {func})
+
+    walk(roots, 0, frozenset())
+    return '\n'.join(lines)
+
+
+def cprofile_report(stats, header):
+    out = io.StringIO()
+    stats.stream = out
+    stats.sort_stats('tottime').print_stats(40)
+    return (f'{header}\n\nCall tree (cumulative time, calls)\n{call_tree(stats, stats.total_tt)}\n\n'
+            f'Functions by own time{out.getvalue()}')
+
+
+def profile_root():
+    root = Path(settings.PROFILE_ROOT)
+    root.mkdir(parents=True, exist_ok=True)
+    return root
+
+
+def list_profiles():
+    """Stored profiles, newest first: [{'name', 'files': [(filename, kind, size)], 'modified'}]."""
+    root = Path(settings.PROFILE_ROOT)
+    if not root.is_dir():
+        return []
+    profiles = {}
+    for path in root.iterdir():
+        if PROFILE_NAME.match(path.name):
+            stat = path.stat()
+            entry = profiles.setdefault(path.stem, {'name': path.stem, 'files': [], 'modified': stat.st_mtime})
+            entry['files'].append((path.name, path.suffix[1:], stat.st_size))
+            entry['modified'] = max(entry['modified'], stat.st_mtime)
+    for entry in profiles.values():
+        entry['modified'] = datetime.fromtimestamp(entry['modified'])
+        entry['files'].sort()
+    return sorted(profiles.values(), key=lambda entry: entry['name'], reverse=True)
+
+
+def profile_path(filename):
+    """Path of a stored profile file, or None for anything that is not one."""
+    if not PROFILE_NAME.match(filename):
+        return None
+    path = Path(settings.PROFILE_ROOT) / filename
+    return path if path.is_file() else None
+
+
+def store(name, files):
+    root = profile_root()
+    for suffix, data in files.items():
+        (root / f'{name}.{suffix}').write_bytes(data if isinstance(data, bytes) else data.encode())
+    for old in list_profiles()[KEEP_PROFILES:]:
+        for filename, _, _ in old['files']:
+            (root / filename).unlink(missing_ok=True)
+
+
+class ProfileMiddleware:
+    """
+    ?__profile=cprofile or ?__profile=sample, by a staff user, returns a profile of the request
+    instead of its response: a cProfile call tree, or sampled stacks in collapsed (flamegraph)
+    format, both with SQL time per call site. Profiles are also kept in PROFILE_ROOT, listed
+    at /profiles/. Requests without the parameter only pay for a substring check. Only one
+    request is profiled with cProfile at a time; others asking for it meanwhile are sampled.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if '__profile=' not in request.META.get('QUERY_STRING', ''):
+            return self.get_response(request)
+        mode = request.GET.get('__profile')
+        if mode not in MODES or not request.user.is_staff:
+            return self.get_response(request)
+        return self.profile(request, mode)
+
+    def start_cprofile(self):
+        """An enabled cProfile.Profile holding _cprofile_lock, or None if profiling is busy."""
+        if not _cprofile_lock.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiling tool is active in this process
+            _cprofile_lock.release()
+            return None
+        return profiler
+
+    def profile(self, request, mode):
+        sql = SQLRecorder()
+        requested = mode
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(sql))
+            profiler = self.start_cprofile() if mode == 'cprofile' else None
+            if profiler is None:
+                mode = 'sample'
+                sampler = Sampler(threading.get_ident(), sys._getframe(), sql)
+                sampler.start()
+            try:
+                response = self.get_response(request)
+                if response.streaming:
+                    # Exports do their work while streaming; that is part of the request
+                    for _ in response.streaming_content:
+                        pass
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                    _cprofile_lock.release()
+                else:
+                    sampler.stop()
+        elapsed = time.perf_counter() - start
+        queries, sql_time = sql.totals()
+        view = view_label(request)
+        name = f"{datetime.now():%Y%m%d-%H%M%S-%f}-{UNSAFE.sub('_', view)}-{mode}"
+        header = (f'{request.method} {request.get_full_path()}\nview: {view}  status: {response.status_code}  '
+                  f'time: {elapsed * 1000:.1f} ms  queries: {queries}  sql: {sql_time * 1000:.1f} ms\n'
+                  f'stored as: {name}')
+        if mode != requested:
+            header += '\n(cProfile was in use by another request or profiler, so this one was sampled)'
+        sql_report = f'SQL by call site\n{sql.report()}\n'
+        if mode == 'cprofile':
+            stats = pstats.Stats(profiler)
+            report = f'{cprofile_report(stats, header)}\n{sql_report}'
+            # The .prof file is in the pstats format (snakeviz, python -m pstats)
+            store(name, {'txt': report, 'prof': marshal.dumps(stats.stats)})
+            body = report
+        else:
+            body = sampler.folded()
+            store(name, {'folded': body, 'txt': f'{header}\nsamples: {sum(sampler.stacks.values())}\n\n{sql_report}'})
+        result = HttpResponse(body, content_type='text/plain; charset=utf-8')
+        result['X-Profile'] = name
+        return result
@@ -0,0 +1,108 @@
+import hashlib
+import io
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from .workers import parallel_map
+
+# Bump when the rendering below changes, so cached images and browser copies are replaced
+QR_VERSION = 1
+# Seconds a device reuses a code before revalidating it with its ETag (a 304 unless the
+# encoded text changed, e.g. an item was renamed)
+QR_MAX_AGE = 24 * 60 * 60
+QR_CACHE_TIMEOUT = 30 * 24 * 60 * 60
+# Label sheet layout: columns and rows of labels per page
+LABEL_COLUMNS = 3
+LABEL_ROWS = 7
+LABEL_SHEET_MAX = 1000
+
+
+def order_payload(order):
+    return f"Order ID: {order.id}"
+
+
+def inventory_payload(item):
+    return f"Item: {item.item_name}"
+
+
+def qr_digest(payload):
+    return hashlib.sha256(f'{QR_VERSION}:{payload}'.encode()).hexdigest()
+
+
+def render_png(payload):
+    """PNG bytes of the QR code for `payload`. Runs in worker processes, so no ORM here."""
+    import qrcode
+
+    buf = io.BytesIO()
+    qrcode.make(payload).save(buf, format='PNG')
+    return buf.getvalue()
+
+
+def qr_pngs(payloads):
+    """
+    {payload: PNG bytes}. Images are cached by the hash of what they encode, so a code is
+    generated once however often or wherever it is shown; misses are rendered in parallel.
+    """
+    keys = {payload: f'qr:{qr_digest(payload)}' for payload in set(payloads)}
+    found = cache.get_many(keys.values())
+    images = {payload: found[key] for payload, key in keys.items() if key in found}
+    missing = [payload for payload in keys if payload not in images]
+    if missing:
+        rendered = dict(zip(missing, parallel_map(render_png, missing)))
+        cache.set_many({keys[payload]: png for payload, png in rendered.items()}, QR_CACHE_TIMEOUT)
+        images.update(rendered)
+    return images
+
+
+def qr_response(request, payload):
+    """The QR image with a strong ETag; a matching If-None-Match gets a 304 without the image."""
+    etag = f'"{qr_digest(payload)}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(qr_pngs([payload])[payload], content_type='image/png')
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, max_age=QR_MAX_AGE)
+    return response
+
+
+def label_sheet_pdf(labels):
+    """
+    A printable PDF of QR labels, LABEL_COLUMNS x LABEL_ROWS per page; `labels` is a list of
+    (payload, caption lines).
+    """
+    from PIL import Image
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import mm
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+
+    # Grayscale rather than the RGB reportlab makes of 1-bit images: a third of the pixel data to
+    # compress and encode. (Binary streams instead of ASCII85 would be faster still, but that is
+    # reportlab's process-wide rl_config.useA85, which would change every other PDF too.)
+    images = {
+        payload: ImageReader(Image.open(io.BytesIO(png)).convert('L'))
+        for payload, png in qr_pngs([payload for payload, _ in labels]).items()
+    }
+    buf = io.BytesIO()
+    pdf = canvas.Canvas(buf, pagesize=A4)
+    page_width, page_height = A4
+    margin = 10 * mm
+    width = (page_width - 2 * margin) / LABEL_COLUMNS
+    height = (page_height - 2 * margin) / LABEL_ROWS
+    size = min(height - 4 * mm, width / 2)
+    per_page = LABEL_COLUMNS * LABEL_ROWS
+    for index, (payload, caption) in enumerate(labels):
+        if index and index % per_page == 0:
+            pdf.showPage()
+        column, row = index % LABEL_COLUMNS, index % per_page // LABEL_COLUMNS
+        x = margin + column * width
+        y = page_height - margin - (row + 1) * height
+        pdf.drawImage(images[payload], x + 2 * mm, y + (height - size) / 2, size, size)
+        pdf.setFont('Helvetica', 8)
+        for line_number, line in enumerate(caption[:4]):
+            pdf.drawString(x + size + 4 * mm, y + height / 2 + 6 * mm - line_number * 4 * mm, str(line)[:30])
+    pdf.showPage()
+    pdf.save()
+    return buf.getvalue()
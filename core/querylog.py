@@ -0,0 +1,278 @@
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections, transaction
+
+from .threadstores import ThreadStores
+
+logger = logging.getLogger(__name__)
+
+# Statements slower than this (ms) are logged with their query plan; SLOW_QUERY_MS overrides it
+SLOW_QUERY_MS = 100
+# Processes write their figures to the cache at most this often (seconds)
+FLUSH_INTERVAL = 30
+# Slow statements kept per process for the report
+RECENT_SLOW = 50
+# A fingerprint's plan is explained again after this many seconds
+PLAN_TTL = 600
+# Distinct (view, fingerprint) pairs tracked per thread; later ones are counted under OTHER
+MAX_SERIES = 5000
+OTHER = '(other statements)'
+CACHE_TIMEOUT = 7 * 24 * 60 * 60
+# The list of processes is changed under a lock: tries to take it, seconds between tries, and
+# seconds after which a lock left by a dead process expires
+LOCK_TRIES = 50
+LOCK_WAIT = 0.01
+LOCK_TIMEOUT = 5
+
+# Upper bounds (ms) of the duration buckets p95 is estimated from: 0.01 ms to ~70 s, 25% apart
+BUCKETS = [0.01 * 1.25 ** i for i in range(71)]
+
+STRING = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r'(?<![\w".])-?\d+(?:\.\d+)?\b')
+PLACEHOLDERS = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+ROWS = re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+')
+SAVEPOINT = re.compile(r'"s\d+_x\d+"')
+SPACE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(sql):
+    """
+    The shape of a statement: literals become ?, IN lists and multi-row VALUES collapse to
+    (...), so every execution of the same ORM query maps to one fingerprint.
+    """
+    sql = STRING.sub('?', sql)
+    sql = NUMBER.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = PLACEHOLDERS.sub('(...)', sql)
+    sql = ROWS.sub('(...)', sql)
+    sql = SAVEPOINT.sub('"s?"', sql)
+    return SPACE.sub(' ', sql).strip()
+
+
+def p95(buckets, count):
+    """Upper bound of the bucket the 95th percentile falls in."""
+    target = count * 0.95
+    seen = 0
+    for bound, n in zip(BUCKETS + [float('inf')], buckets):
+        seen += n
+        if seen >= target:
+            return bound if bound != float('inf') else BUCKETS[-1]
+    return 0
+
+
+def retire(finished, key, values):
+    # Figures of a thread that ended, kept to MAX_SERIES like a thread's own
+    if key not in finished and len(finished) >= MAX_SERIES:
+        key = (key[0], OTHER)
+    add(finished, key, values)
+
+
+# Per-thread figures, merged when read, so recording takes no lock (see core.threadstores).
+# A series is [count, total ms, max ms, count per duration bucket...].
+_local = threading.local()
+_stores = ThreadStores(retire)
+_recent = deque(maxlen=RECENT_SLOW)
+_plans = {}
+_state = {'flushed': 0.0, 'generation': None}
+PROCESS_KEY = f'querylog:process:{os.getpid()}:{time.time_ns()}'
+
+
+def thread_store():
+    return _stores.get()
+
+
+def record(view, sql, params, duration, connection):
+    """Add one executed statement (duration in seconds) to the figures of `view`."""
+    if getattr(_local, 'explaining', False):
+        return
+    ms = duration * 1000
+    shape = fingerprint(sql)
+    store = thread_store()
+    key = (view, shape)
+    series = store.get(key)
+    if series is None:
+        if len(store) >= MAX_SERIES:
+            key = (view, OTHER)
+            series = store.get(key)
+        if series is None:
+            series = store[key] = [0, 0.0, 0.0] + [0] * (len(BUCKETS) + 1)
+    series[0] += 1
+    series[1] += ms
+    if ms > series[2]:
+        series[2] = ms
+    series[3 + bisect_left(BUCKETS, ms)] += 1
+    if ms >= getattr(settings, 'SLOW_QUERY_MS', SLOW_QUERY_MS):
+        log_slow(view, sql, params, shape, ms, connection)
+
+
+def explain(connection, sql, params):
+    """The plan of a SELECT, or '' if it cannot be explained (writes are never re-run)."""
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return ''
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    _local.explaining = True
+    try:
+        # A savepoint, so a failed EXPLAIN cannot break the request's transaction
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            rows = cursor.fetchall()
+    except DatabaseError:
+        return ''
+    finally:
+        _local.explaining = False
+    if connection.vendor == 'sqlite':
+        return '\n'.join(row[-1] for row in rows)
+    return '\n'.join(' '.join(str(value) for value in row) for row in rows)
+
+
+def log_slow(view, sql, params, shape, ms, connection):
+    plan, explained = _plans.get(shape, ('', 0))
+    if time.monotonic() - explained > PLAN_TTL:
+        plan = explain(connection, sql, params)
+        _plans[shape] = (plan, time.monotonic())
+    logger.warning('Slow query (%.1f ms) in %s: %s\n%s', ms, view, sql, plan or '(no plan)')
+    _recent.append({
+        'view': view, 'sql': sql, 'params': repr(params)[:500], 'ms': round(ms, 2),
+        'plan': plan, 'at': time.time(),
+    })
+
+
+class Recorder:
+    """connection.execute_wrapper() recording every statement under a fixed label."""
+    def __init__(self, label, connection):
+        self.label = label
+        self.connection = connection
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            record(self.label, sql, params, time.perf_counter() - start, self.connection)
+
+
+@contextmanager
+def recording(label):
+    """Record the statements run inside the block (outside of requests, e.g. background jobs)."""
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(Recorder(label, connection)))
+        yield
+    flush()
+
+
+# Sharing: each process writes its merged figures to the cache, where the report reads those
+# of every process. Shared between processes only when the cache is (CACHE_BACKEND=file or redis).
+
+def add(series, key, values):
+    total = series.get(key)
+    if total is None:
+        series[key] = list(values)
+        return
+    total[0] += values[0]
+    total[1] += values[1]
+    total[2] = max(total[2], values[2])
+    for i in range(3, len(values)):
+        total[i] += values[i]
+
+
+def snapshot():
+    series = {}
+    for store in _stores.all():
+        for key, values in store.copy().items():
+            add(series, key, values)
+    return {'series': series, 'recent': list(_recent)}
+
+
+def flush(force=False):
+    """Write this process's figures to the cache, at most every FLUSH_INTERVAL seconds unless forced."""
+    if not force and time.monotonic() - _state['flushed'] < FLUSH_INTERVAL:
+        return
+    current = cache.get('querylog:generation')
+    if _state['flushed'] and current != _state['generation']:
+        # The figures were reset (possibly by another process) since this one last wrote them
+        for store in _stores.all():
+            store.clear()
+        _recent.clear()
+    _state['generation'] = current
+    _state['flushed'] = time.monotonic()
+    data = snapshot()
+    if not data['series'] and not data['recent']:
+        return
+    cache.set(PROCESS_KEY, data, CACHE_TIMEOUT)
+    # Checked at every flush, so a process whose entry was lost adds it back the next time
+    if PROCESS_KEY not in cache.get('querylog:processes', set()):
+        with processes_lock() as locked:
+            processes = cache.get('querylog:processes', set())
+            if locked and PROCESS_KEY not in processes:
+                cache.set('querylog:processes', processes | {PROCESS_KEY}, CACHE_TIMEOUT)
+
+
+@contextmanager
+def processes_lock():
+    """
+    Held while querylog:processes is read and rewritten, so processes registering at the same
+    time do not drop each other's entries. Yields False if the lock could not be taken.
+    cache.add is atomic on locmem and Redis; on the file cache two processes can, rarely, both
+    get it, and the one whose entry is lost adds it back at its next flush.
+    """
+    for _ in range(LOCK_TRIES):
+        if cache.add('querylog:processes:lock', PROCESS_KEY, LOCK_TIMEOUT):
+            try:
+                yield True
+            finally:
+                cache.delete('querylog:processes:lock')
+            return
+        time.sleep(LOCK_WAIT)
+    yield False
+
+
+def reset():
+    with processes_lock():
+        processes = cache.get('querylog:processes', set())
+        cache.delete_many(list(processes) + ['querylog:processes'])
+    cache.set('querylog:generation', time.time_ns(), None)
+    flush(force=True)
+
+
+def merged():
+    """Figures of every process: ({(view, fingerprint): series}, [recent slow statements, newest first])."""
+    flush(force=True)
+    series = {}
+    recent = []
+    for data in cache.get_many(cache.get('querylog:processes', set())).values():
+        recent += data['recent']
+        for key, values in data['series'].items():
+            add(series, key, values)
+    return series, sorted(recent, key=lambda entry: -entry['at'])
+
+
+def summarize(series, by_view=False, sort='total', limit=20):
+    """The top fingerprints (per view if by_view) by total time, count, p95 or mean."""
+    totals = {}
+    views = {}
+    for (view, shape), values in series.items():
+        key = (view if by_view else None, shape)
+        add(totals, key, values)
+        views.setdefault(key, set()).add(view)
+    rows = []
+    for (view, shape), values in totals.items():
+        count, total_ms, max_ms = values[:3]
+        rows.append({
+            'fingerprint': shape, 'view': view, 'views': sorted(views[(view, shape)]),
+            'count': count, 'total_ms': round(total_ms, 2), 'mean_ms': round(total_ms / count, 3),
+            'p95_ms': round(min(p95(values[3:], count), max_ms), 3), 'max_ms': round(max_ms, 3),
+        })
+    key = {'total': 'total_ms', 'count': 'count', 'p95': 'p95_ms', 'mean': 'mean_ms'}[sort]
+    return sorted(rows, key=lambda row: -row[key])[:limit]
@@ -0,0 +1,126 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+
+from .caching import invalidate
+from .models import CustomerMonthlyOrderCount, MonthlyOrderCount, MonthlyRevenue, Order, Payment
+
+TOP_CUSTOMERS = 10
+
+
+def month_start(value):
+    return value.replace(day=1) if value else None
+
+
+def contributions(model, values, sign=1):
+    """
+    What one row of `model` with `values` adds to the rollups, times `sign`:
+    {(rollup model, key): (field, amount)}.
+    """
+    if model is Order:
+        month = month_start(values['order_date'])
+        result = {(MonthlyOrderCount, (('month', month),)): ('count', sign)}
+        if values['customer_id'] is not None:
+            key = (('customer_id', values['customer_id']), ('month', month))
+            result[(CustomerMonthlyOrderCount, key)] = ('count', sign)
+        return result
+    if model is Payment:
+        amount = Decimal(values['amount'] or 0)
+        return {(MonthlyRevenue, (('month', month_start(values['payment_date'])),)): ('total', sign * amount)}
+    return {}
+
+
+def merge(*deltas):
+    total = {}
+    for delta in deltas:
+        for key, (field, amount) in delta.items():
+            total[key] = (field, total[key][1] + amount if key in total else amount)
+    return total
+
+
+def change_delta(model, old, new):
+    if old is None:
+        return {}
+    return merge(contributions(model, new), contributions(model, old, sign=-1))
+
+
+def bump(rollup, key, field, amount):
+    # UPDATE ... SET field = field + amount, creating the row the first time it is needed
+    lookup = {name if value is not None else f'{name}__isnull': value if value is not None else True
+              for name, value in key}
+    if rollup.objects.filter(**lookup).update(**{field: F(field) + amount}):
+        return
+    if field == 'count' and amount < 0:
+        # Nothing to take from: a customer's rows are cascade-deleted before its orders
+        return
+    try:
+        with transaction.atomic():
+            rollup.objects.create(**dict(key), **{field: amount})
+    except IntegrityError:
+        # Created concurrently
+        rollup.objects.filter(**lookup).update(**{field: F(field) + amount})
+
+
+def apply_delta(delta):
+    for (rollup, key), (field, amount) in delta.items():
+        if amount:
+            bump(rollup, key, field, amount)
+
+
+def backfill():
+    """Rebuild every rollup from the order and payment tables. Returns the row counts written."""
+    with transaction.atomic():
+        MonthlyOrderCount.objects.all().delete()
+        MonthlyRevenue.objects.all().delete()
+        CustomerMonthlyOrderCount.objects.all().delete()
+        orders = (Order.objects.annotate(m=TruncMonth('order_date')).values('m')
+                  .annotate(n=Count('id')).order_by())
+        MonthlyOrderCount.objects.bulk_create(
+            [MonthlyOrderCount(month=row['m'], count=row['n']) for row in orders], batch_size=500)
+        revenue = (Payment.objects.annotate(m=TruncMonth('payment_date')).values('m')
+                   .annotate(total=Sum('amount')).order_by())
+        MonthlyRevenue.objects.bulk_create(
+            [MonthlyRevenue(month=row['m'], total=row['total'] or 0) for row in revenue], batch_size=500)
+        per_customer = (Order.objects.annotate(m=TruncMonth('order_date')).values('customer_id', 'm')
+                        .annotate(n=Count('id')).order_by())
+        created = CustomerMonthlyOrderCount.objects.bulk_create(
+            (CustomerMonthlyOrderCount(customer_id=row['customer_id'], month=row['m'], count=row['n'])
+             for row in per_customer.iterator(chunk_size=2000)), batch_size=500)
+        for rollup in (MonthlyOrderCount, MonthlyRevenue, CustomerMonthlyOrderCount):
+            invalidate(rollup)
+    return {
+        'monthly order counts': MonthlyOrderCount.objects.count(),
+        'monthly revenue': MonthlyRevenue.objects.count(),
+        'customer monthly order counts': len(created),
+    }
+
+
+# Reads: only the rollup tables are touched
+
+def month_range(queryset, start=None, end=None):
+    if start:
+        queryset = queryset.filter(month__gte=month_start(start))
+    if end:
+        queryset = queryset.filter(month__lte=month_start(end))
+    return queryset
+
+
+def orders_by_month(start=None, end=None):
+    return list(month_range(MonthlyOrderCount.objects.filter(count__gt=0), start, end)
+                .order_by('month').values('month', 'count'))
+
+
+def revenue_by_month(start=None, end=None):
+    queryset = MonthlyRevenue.objects.exclude(total=0)
+    if start or end:
+        queryset = month_range(queryset, start, end)
+    return [{'month': row['month'], 'total': float(row['total'])}
+            for row in queryset.order_by(F('month').asc(nulls_last=True)).values('month', 'total')]
+
+
+def top_customers(start=None, end=None, limit=TOP_CUSTOMERS):
+    return list(month_range(CustomerMonthlyOrderCount.objects.all(), start, end)
+                .values('customer_id').annotate(name=F('customer__name'), order_count=Sum('count'))
+                .filter(order_count__gt=0).order_by('-order_count', 'customer_id')[:limit])
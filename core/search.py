@@ -0,0 +1,275 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Customer, InventoryItem, Order, Purchase, Supplier
+from .pagination import PAGE_SIZE, KeysetPage, decode_cursor, encode_cursor, keyset_paginate
+
+# Rows read per query while (re)indexing
+INDEX_CHUNK_SIZE = 1000
+# Trigram matching needs at least this many characters; shorter queries use icontains
+MIN_QUERY_LENGTH = 3
+
+# Indexed models: (index column, ORM path) pairs. Column order is the ranking weight order.
+SEARCH_INDEXES = {
+    Customer: [('name', 'name'), ('contact', 'contact'), ('address', 'address')],
+    InventoryItem: [
+        ('item_name', 'item_name'),
+        ('fabric_type', 'fabric_type'),
+        ('supplier', 'supplier'),
+        ('color', 'color'),
+        ('size', 'size'),
+    ],
+    Order: [('customer', 'customer__name'), ('status', 'status'), ('product_type', 'product_type'), ('notes', 'notes')],
+    Purchase: [('supplier', 'supplier__name'), ('item', 'item__item_name'), ('notes', 'notes')],
+}
+
+# Models whose indexed text comes partly from a related row: related model -> [(model, FK field)]
+SEARCH_DEPENDENTS = {
+    Customer: [(Order, 'customer')],
+    Supplier: [(Purchase, 'supplier')],
+    InventoryItem: [(Purchase, 'item')],
+}
+
+_tables = {}
+
+
+def index_table(model):
+    prefix = 'core_search_' if connection.vendor == 'postgresql' else 'core_fts_'
+    return prefix + model._meta.model_name
+
+
+def index_available(model):
+    """The search table is created by migration 0006 on SQLite (FTS5) and PostgreSQL only."""
+    if model not in SEARCH_INDEXES or connection.vendor not in ('sqlite', 'postgresql'):
+        return False
+    key = (connection.alias, connection.vendor)
+    if key not in _tables:
+        _tables[key] = set(connection.introspection.table_names())
+    return index_table(model) in _tables[key]
+
+
+# SQLite: one FTS5 table per model, rowid = object id, one trigram-tokenized column per field.
+# A quoted phrase query against trigrams is a case-insensitive substring match, i.e. the same
+# rows icontains finds, but answered from the index and ranked by bm25.
+
+def sqlite_match(query):
+    return '"%s"' % query.replace('"', '""')
+
+
+def sqlite_replace(model, rows):
+    table = index_table(model)
+    columns = [column for column, _ in SEARCH_INDEXES[model]]
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {table} WHERE rowid = %s', [(row[0],) for row in rows])
+        cursor.executemany(
+            f"INSERT INTO {table} (rowid, {', '.join(columns)}) VALUES ({', '.join(['%s'] * (len(columns) + 1))})",
+            [[pk] + [value or '' for value in values] for pk, *values in rows],
+        )
+
+
+def sqlite_delete(model, pks):
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {index_table(model)} WHERE rowid = %s', [(pk,) for pk in pks])
+
+
+def sqlite_ids_sql(model, query):
+    table = index_table(model)
+    return f'SELECT rowid FROM {table} WHERE {table} MATCH %s', [sqlite_match(query)]
+
+
+def sqlite_ranked_ids(model, query, after, backwards, limit):
+    # bm25 rank: lower is better
+    table = index_table(model)
+    sql = f'SELECT rowid, rank FROM {table} WHERE {table} MATCH %s'
+    params = [sqlite_match(query)]
+    if after:
+        past = '<' if backwards else '>'
+        sql += f' AND (rank {past} %s OR (rank = %s AND rowid {past} %s))'
+        params += [after[0], after[0], after[1]]
+    direction = ' DESC' if backwards else ''
+    with connection.cursor() as cursor:
+        cursor.execute(f'{sql} ORDER BY rank{direction}, rowid{direction} LIMIT %s', params + [limit])
+        return cursor.fetchall()
+
+
+# PostgreSQL: one table per model holding a weighted tsvector, with a GIN index on it.
+# Each word of the query is matched as a prefix.
+
+WEIGHTS = 'ABCD'
+
+
+def postgres_tsquery(query):
+    words = re.findall(r'\w+', query)
+    return ' & '.join(f'{word}:*' for word in words)
+
+
+def postgres_document_sql(model):
+    parts = [f"setweight(to_tsvector('simple', %s), '{WEIGHTS[min(i, 3)]}')" for i in range(len(SEARCH_INDEXES[model]))]
+    return ' || '.join(parts)
+
+
+def postgres_replace(model, rows):
+    table = index_table(model)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {table} (object_id, document) VALUES (%s, {postgres_document_sql(model)}) '
+            f'ON CONFLICT (object_id) DO UPDATE SET document = EXCLUDED.document',
+            [[pk] + [value or '' for value in values] for pk, *values in rows],
+        )
+
+
+def postgres_delete(model, pks):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {index_table(model)} WHERE object_id = ANY(%s)', [list(pks)])
+
+
+def postgres_ids_sql(model, query):
+    return (f"SELECT object_id FROM {index_table(model)} WHERE document @@ to_tsquery('simple', %s)",
+            [postgres_tsquery(query)])
+
+
+def postgres_ranked_ids(model, query, after, backwards, limit):
+    # ts_rank: higher is better
+    sql = (f"SELECT object_id, ts_rank(document, query) AS rank FROM {index_table(model)}, "
+           f"to_tsquery('simple', %s) query WHERE document @@ query")
+    params = [postgres_tsquery(query)]
+    if after:
+        past = '>' if backwards else '<'
+        sql += (f' AND (ts_rank(document, query) {past} %s OR '
+                f'(ts_rank(document, query) = %s AND object_id {past} %s))')
+        params += [after[0], after[0], after[1]]
+    direction = '' if backwards else ' DESC'
+    with connection.cursor() as cursor:
+        cursor.execute(f'{sql} ORDER BY rank{direction}, object_id{direction} LIMIT %s', params + [limit])
+        return cursor.fetchall()
+
+
+def backend():
+    if connection.vendor == 'postgresql':
+        return postgres_replace, postgres_delete, postgres_ids_sql, postgres_ranked_ids
+    return sqlite_replace, sqlite_delete, sqlite_ids_sql, sqlite_ranked_ids
+
+
+# Index maintenance
+
+def index_queryset(model, queryset):
+    """(Re)index every object in `queryset`, reading only the indexed values."""
+    if not index_available(model):
+        return 0
+    replace = backend()[0]
+    paths = [path for _, path in SEARCH_INDEXES[model]]
+    count = 0
+    rows = []
+    for row in queryset.order_by().values_list('pk', *paths).iterator(chunk_size=INDEX_CHUNK_SIZE):
+        rows.append(row)
+        if len(rows) >= INDEX_CHUNK_SIZE:
+            replace(model, rows)
+            count += len(rows)
+            rows = []
+    if rows:
+        replace(model, rows)
+        count += len(rows)
+    return count
+
+
+def index_objects(model, pks):
+    pks = list(pks)
+    if pks:
+        index_queryset(model, model.objects.filter(pk__in=pks))
+
+
+def reindex_dependents(model, pks):
+    for dependent, field in SEARCH_DEPENDENTS.get(model, []):
+        index_queryset(dependent, dependent.objects.filter(**{f'{field}__in': list(pks)}))
+
+
+def unindex_objects(model, pks):
+    if index_available(model):
+        backend()[1](model, list(pks))
+
+
+def clear_index(model):
+    if index_available(model):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {index_table(model)}')
+
+
+def rebuild_index(model):
+    clear_index(model)
+    return index_queryset(model, model.objects.all())
+
+
+# Queries
+
+def icontains_filter(queryset, query):
+    condition = Q()
+    for _, path in SEARCH_INDEXES[queryset.model]:
+        condition |= Q(**{f'{path}__icontains': query})
+    return queryset.filter(condition)
+
+
+def use_index(model, query):
+    return len(query) >= MIN_QUERY_LENGTH and index_available(model)
+
+
+def filter_search(queryset, query):
+    """All rows matching `query`, unordered (exports)."""
+    model = queryset.model
+    if not use_index(model, query):
+        return icontains_filter(queryset, query)
+    sql, params = backend()[2](model, query)
+    return queryset.filter(pk__in=RawSQL(sql, params))
+
+
+class SearchPage(KeysetPage):
+    def cursor_for(self, obj):
+        return encode_cursor([obj.search_rank, obj.pk])
+
+
+def search_cursor(value):
+    cursor = decode_cursor(value)
+    if cursor is None or len(cursor) != 2 or not isinstance(cursor[1], int):
+        return None
+    return cursor if isinstance(cursor[0], (int, float)) else None
+
+
+def ranked_objects(queryset, hits):
+    """The objects of `hits` ([(id, rank)]) in that order, with their rank as `search_rank`."""
+    if not hits:
+        return []
+    objects = queryset.in_bulk([pk for pk, _ in hits])
+    ranked = []
+    for pk, rank in hits:
+        if pk in objects:
+            objects[pk].search_rank = rank
+            ranked.append(objects[pk])
+    return ranked
+
+
+def search_page(request, queryset, query, ordering=('-id',), per_page=PAGE_SIZE):
+    """
+    One page of the matches for `query`, best first. Pages are taken from the index in its
+    own order, (rank, id), with a keyset cursor on that pair, so every match is reachable
+    and each page reads only its own rows. Queries too short for the index page through the
+    icontains matches by `ordering` instead.
+    """
+    model = queryset.model
+    if not use_index(model, query):
+        return keyset_paginate(request, icontains_filter(queryset, query), ordering, per_page)
+    ranked_ids = backend()[3]
+    ordering = ['search_rank', 'id']
+    after = search_cursor(request.GET.get('after'))
+    before = search_cursor(request.GET.get('before'))
+    if before:
+        hits = ranked_ids(model, query, before, True, per_page + 1)
+        if len(hits) > per_page:
+            objects = ranked_objects(queryset, hits[:per_page][::-1])
+            return SearchPage(request, objects, ordering, has_next=True, has_previous=True)
+        # Walked back to the start: show a full first page
+        after = None
+    hits = ranked_ids(model, query, after, False, per_page + 1)
+    objects = ranked_objects(queryset, hits[:per_page])
+    return SearchPage(request, objects, ordering, has_next=len(hits) > per_page, has_previous=after is not None)
@@ -0,0 +1,197 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from . import caching, dashboard, invoices, rollups, search, thumbnails
+from .models import Customer, InventoryItem, Order, Payment, Purchase, Supplier
+
+# Sent by the bulk CSV importers around batches written with bulk_create/bulk_update,
+# which bypass pre_save/post_save. Both receive `objects`, the instances; bulk_saved also
+# receives `created`. bulk_pre_save is only sent for updates.
+bulk_pre_save = Signal()
+bulk_saved = Signal()
+
+
+# Search index
+
+@receiver(post_save, sender=Customer)
+@receiver(post_save, sender=InventoryItem)
+@receiver(post_save, sender=Order)
+@receiver(post_save, sender=Purchase)
+@receiver(post_save, sender=Supplier)
+def index_saved(sender, instance, created=False, **kwargs):
+    if sender in search.SEARCH_INDEXES:
+        search.index_objects(sender, [instance.pk])
+    if not created:
+        search.reindex_dependents(sender, [instance.pk])
+
+
+@receiver(bulk_saved)
+def index_bulk_saved(sender, objects, created=False, **kwargs):
+    pks = [obj.pk for obj in objects if obj.pk is not None]
+    if sender in search.SEARCH_INDEXES:
+        search.index_objects(sender, pks)
+    if not created:
+        search.reindex_dependents(sender, pks)
+
+
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=InventoryItem)
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=Purchase)
+def unindex_deleted(sender, instance, **kwargs):
+    search.unindex_objects(sender, [instance.pk])
+
+
+# Values before an update. The dashboard counters and the analytics rollups move by the
+# difference between a row's stored and new values, so pre_save (and bulk_pre_save for the
+# importers) reads the fields they depend on, once, into instance._stored_values.
+
+TRACKED_FIELDS = {
+    Order: ['status', 'order_date', 'customer_id'],
+    Payment: ['amount', 'status', 'payment_date', 'order_id'],
+    InventoryItem: ['stock_quantity'],
+}
+
+
+def current_values(instance):
+    # Importers assign raw CSV strings; compare the values as the database stores them
+    fields = TRACKED_FIELDS.get(type(instance), [])
+    return {name: instance._meta.get_field(name).to_python(getattr(instance, name)) for name in fields}
+
+
+def stored_values(model, pks):
+    fields = TRACKED_FIELDS[model]
+    return {row.pop('pk'): row for row in model._default_manager.filter(pk__in=pks).values('pk', *fields)}
+
+
+@receiver(pre_save, sender=Order)
+@receiver(pre_save, sender=Payment)
+@receiver(pre_save, sender=InventoryItem)
+def remember_stored_values(sender, instance, **kwargs):
+    if not instance._state.adding and instance.pk is not None:
+        instance._stored_values = stored_values(sender, [instance.pk]).get(instance.pk)
+
+
+@receiver(bulk_pre_save, sender=Order)
+@receiver(bulk_pre_save, sender=Payment)
+@receiver(bulk_pre_save, sender=InventoryItem)
+def remember_bulk_stored_values(sender, objects, **kwargs):
+    stored = stored_values(sender, [obj.pk for obj in objects])
+    for obj in objects:
+        obj._stored_values = stored.get(obj.pk)
+
+
+# Dashboard counters
+
+@receiver(post_save, sender=Customer)
+@receiver(post_save, sender=Order)
+@receiver(post_save, sender=Payment)
+@receiver(post_save, sender=InventoryItem)
+@receiver(post_save, sender=Supplier)
+@receiver(post_save, sender=Purchase)
+def count_saved(sender, instance, created=False, **kwargs):
+    if created:
+        dashboard.apply_delta(dashboard.counters(sender, current_values(instance)))
+    else:
+        dashboard.apply_delta(dashboard.change_delta(sender, getattr(instance, '_stored_values', None), current_values(instance)))
+
+
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=Payment)
+@receiver(post_delete, sender=InventoryItem)
+@receiver(post_delete, sender=Supplier)
+@receiver(post_delete, sender=Purchase)
+def count_deleted(sender, instance, **kwargs):
+    dashboard.apply_delta(dashboard.counters(sender, current_values(instance), sign=-1))
+
+
+@receiver(bulk_saved)
+def count_bulk_saved(sender, objects, created=False, **kwargs):
+    if created:
+        deltas = [dashboard.counters(sender, current_values(obj)) for obj in objects if obj.pk is not None]
+    else:
+        deltas = [dashboard.change_delta(sender, getattr(obj, '_stored_values', None), current_values(obj)) for obj in objects]
+    dashboard.apply_delta(dashboard.merge(*deltas))
+
+
+# Analytics rollups
+
+@receiver(post_save, sender=Order)
+@receiver(post_save, sender=Payment)
+def roll_up_saved(sender, instance, created=False, **kwargs):
+    if created:
+        rollups.apply_delta(rollups.contributions(sender, current_values(instance)))
+    else:
+        rollups.apply_delta(rollups.change_delta(sender, getattr(instance, '_stored_values', None), current_values(instance)))
+
+
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=Payment)
+def roll_up_deleted(sender, instance, **kwargs):
+    rollups.apply_delta(rollups.contributions(sender, current_values(instance), sign=-1))
+
+
+@receiver(bulk_saved, sender=Order)
+@receiver(bulk_saved, sender=Payment)
+def roll_up_bulk_saved(sender, objects, created=False, **kwargs):
+    if created:
+        deltas = [rollups.contributions(sender, current_values(obj)) for obj in objects if obj.pk is not None]
+    else:
+        deltas = [rollups.change_delta(sender, getattr(obj, '_stored_values', None), current_values(obj)) for obj in objects]
+    rollups.apply_delta(rollups.merge(*deltas))
+
+
+# Cached invoices of the orders written to. A stale invoice would not be served anyway (its
+# version no longer matches); this frees the space.
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def forget_order_invoice(sender, instance, **kwargs):
+    invoices.forget_invoices([instance.pk])
+
+
+def payment_order_ids(payment):
+    # The order it is on and, if the payment was moved, the one it left
+    stored = getattr(payment, '_stored_values', None)
+    return [payment.order_id, stored['order_id']] if stored else [payment.order_id]
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def forget_payment_invoice(sender, instance, **kwargs):
+    invoices.forget_invoices(payment_order_ids(instance))
+
+
+@receiver(bulk_saved, sender=Order)
+@receiver(bulk_saved, sender=Payment)
+def forget_bulk_invoices(sender, objects, **kwargs):
+    if sender is Order:
+        invoices.forget_invoices([obj.pk for obj in objects])
+    else:
+        invoices.forget_invoices([pk for obj in objects for pk in payment_order_ids(obj)])
+
+
+# Thumbnails of uploaded images, made in the worker pool after the save commits
+
+@receiver(post_save, sender=InventoryItem)
+@receiver(post_save, sender=Order)
+def make_thumbnails(sender, instance, **kwargs):
+    if instance.image:
+        thumbnails.schedule(instance.image.name)
+
+
+# Cache versions: any write to a core model makes every cached value read from it unreachable
+
+def invalidate_saved(sender, **kwargs):
+    caching.invalidate(sender)
+
+
+@receiver(bulk_saved)
+def invalidate_bulk_saved(sender, **kwargs):
+    caching.invalidate(sender)
+
+
+for model in caching.core_models():
+    post_save.connect(invalidate_saved, sender=model, dispatch_uid=f'invalidate_saved_{model._meta.label_lower}')
+    post_delete.connect(invalidate_saved, sender=model, dispatch_uid=f'invalidate_deleted_{model._meta.label_lower}')
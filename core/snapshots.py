@@ -0,0 +1,98 @@
+import datetime
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .history import compacted_through
+from .models import InventoryCheckpoint, InventoryCheckpointItem, InventoryItem
+
+# Inventory item fields kept in checkpoints and shown "as of" a date
+ITEM_FIELDS = ['item_name', 'item_type', 'fabric_type', 'cost_per_meter', 'total_meters', 'taxes', 'stock_quantity']
+CHECKPOINT_BATCH = 500
+
+
+def item_value(item):
+    """Valuation of an item: its fabric at cost plus taxes."""
+    return (item['cost_per_meter'] * item['total_meters'] + item['taxes']).quantize(Decimal('0.01'))
+
+
+def end_of_day(day):
+    """The moment a day ends (the next local midnight); stock "as of" a day includes all of it."""
+    return timezone.make_aware(datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time()))
+
+
+def stock_as_of(moment, replay=False):
+    """
+    (checkpoint, {item id: item}, exact) for every inventory item that existed just before
+    `moment`: the latest checkpoint at or before it, with the inventory history recorded from
+    then until `moment` applied on top, so the rows read are one checkpoint plus the changes
+    since. exact is False when compact_history has deleted history after that checkpoint, so
+    some of those changes may be missing.
+
+    Without an earlier checkpoint the items are None, unless `replay` is set (for backfilling
+    checkpoints): then the whole history is replayed, which only knows items that have history.
+    """
+    checkpoint = InventoryCheckpoint.objects.filter(taken_at__lte=moment).order_by('-taken_at').first()
+    if checkpoint is None and not replay:
+        return None, None, False
+    compacted = compacted_through(InventoryItem)
+    records = InventoryItem.history.model.objects.filter(history_date__lt=moment)
+    if checkpoint:
+        items = {item['item_id']: item for item in checkpoint.items.values('item_id', *ITEM_FIELDS)}
+        records = records.filter(history_date__gte=checkpoint.taken_at)
+        exact = compacted is None or compacted < checkpoint.taken_at or moment == checkpoint.taken_at
+    else:
+        items = {}
+        exact = compacted is None
+    records = records.order_by('history_date', 'history_id').values('id', 'history_type', *ITEM_FIELDS)
+    for record in records.iterator(chunk_size=CHECKPOINT_BATCH):
+        item_id = record.pop('id')
+        if record.pop('history_type') == '-':
+            items.pop(item_id, None)
+        else:
+            items[item_id] = dict(record, item_id=item_id)
+    return checkpoint, items, exact
+
+
+def stock_report(moment):
+    """stock_as_of() as rows by item name with their value, and the totals."""
+    checkpoint, items, exact = stock_as_of(moment)
+    rows = sorted((items or {}).values(), key=lambda item: (item['item_name'].lower(), item['item_id']))
+    for row in rows:
+        row['value'] = item_value(row)
+    return {
+        'moment': moment,
+        'checkpoint': checkpoint,
+        'exact': exact,
+        'first_checkpoint': None if checkpoint else InventoryCheckpoint.objects.order_by('taken_at').first(),
+        'items': rows,
+        'total_stock': sum(row['stock_quantity'] for row in rows),
+        'total_value': sum((row['value'] for row in rows), Decimal(0)),
+    }
+
+
+def take_checkpoint(moment=None):
+    """
+    Write a checkpoint of every item: the live inventory now, or for a past `moment` the stock
+    worked out by stock_as_of(), which must be exact (ValueError otherwise). Replaces an
+    existing checkpoint at the same moment.
+    """
+    with transaction.atomic():
+        if moment is None:
+            # A change whose transaction commits after this read but whose history entry is
+            # dated before it is missed; inventory edits are single short requests, so the
+            # window is milliseconds
+            moment = timezone.now()
+            items = [dict(item, item_id=item.pop('id')) for item in InventoryItem.objects.values('id', *ITEM_FIELDS)]
+        else:
+            checkpoint, items, exact = stock_as_of(moment, replay=True)
+            if not exact:
+                raise ValueError(f'Inventory history before {moment} has been compacted, so it cannot be replayed.')
+            items = list(items.values())
+        InventoryCheckpoint.objects.filter(taken_at=moment).delete()
+        checkpoint = InventoryCheckpoint.objects.create(taken_at=moment, item_count=len(items))
+        InventoryCheckpointItem.objects.bulk_create(
+            [InventoryCheckpointItem(checkpoint=checkpoint, **item) for item in items], batch_size=CHECKPOINT_BATCH,
+        )
+    return checkpoint
@@ -0,0 +1,95 @@
+// Turns <select data-autocomplete-url="..."> (core.widgets.AutocompleteSelect) into a
+// type-ahead: options are fetched page by page from the JSON endpoint instead of being
+// rendered with the form.
+(function () {
+    'use strict';
+
+    function debounce(fn, wait) {
+        var timer;
+        return function () {
+            var args = arguments;
+            clearTimeout(timer);
+            timer = setTimeout(function () { fn.apply(null, args); }, wait);
+        };
+    }
+
+    function bind(select) {
+        var url = select.dataset.autocompleteUrl;
+        var search = document.createElement('input');
+        search.type = 'search';
+        search.className = 'form-control form-control-sm mb-1';
+        search.placeholder = 'Type to search...';
+        search.autocomplete = 'off';
+        select.parentNode.insertBefore(search, select);
+
+        var next = null;
+        var previous = select.value;
+        var more = document.createElement('option');
+        more.value = '__more__';
+        more.textContent = 'Show more results...';
+
+        function reset() {
+            // Keep the empty choice and the current value, drop the previous results
+            Array.prototype.slice.call(select.options).forEach(function (option) {
+                if (option.value !== '' && option !== more && !option.selected) {
+                    select.removeChild(option);
+                }
+            });
+            if (more.parentNode) {
+                select.removeChild(more);
+            }
+        }
+
+        function load(after) {
+            var params = new URLSearchParams({q: search.value.trim()});
+            if (after) {
+                params.set('after', after);
+            }
+            fetch(url + '?' + params.toString(), {credentials: 'same-origin'})
+                .then(function (response) { return response.json(); })
+                .then(function (data) {
+                    if (!after) {
+                        reset();
+                    } else if (more.parentNode) {
+                        select.removeChild(more);
+                    }
+                    var present = {};
+                    Array.prototype.forEach.call(select.options, function (option) {
+                        present[option.value] = true;
+                    });
+                    data.results.forEach(function (result) {
+                        if (!present[String(result.id)]) {
+                            select.appendChild(new Option(result.text, result.id));
+                        }
+                    });
+                    next = data.more ? data.next : null;
+                    if (next) {
+                        select.appendChild(more);
+                    }
+                });
+        }
+
+        search.addEventListener('input', debounce(function () { load(null); }, 250));
+        select.addEventListener('focus', function () {
+            if (select.options.length <= 2) {
+                load(null);
+            }
+        }, {once: true});
+        select.addEventListener('change', function () {
+            if (select.value !== more.value) {
+                previous = select.value;
+                return;
+            }
+            select.value = previous;
+            if (next) {
+                var after = next;
+                next = null;
+                load(after);
+            }
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        document.querySelectorAll('select[data-autocomplete-url]').forEach(bind);
+    });
+})();
@@ -0,0 +1,27 @@
+from django import template
+from django.utils.html import format_html
+
+from ..thumbnails import IMAGE_DIRS, SIZES, is_ready, srcset, variant_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(image, size=64, alt=''):
+    """
+    {% responsive_image item.image 64 alt=item.item_name %}: the image as a thumbnail fitting a
+    size x size box, WebP where the browser supports it, with srcset for high-density screens.
+    """
+    if not image:
+        return ''
+    if size not in SIZES:
+        raise ValueError(f'Thumbnail size must be one of {SIZES}.')
+    name = image.name
+    if not name.startswith(IMAGE_DIRS):
+        return format_html('<img src="{}" alt="{}" loading="lazy" style="max-width: {}px; max-height: {}px">', image.url, alt, size, size)
+    ready = is_ready(name)
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}">'
+        '<img src="{}" srcset="{}" alt="{}" loading="lazy" decoding="async" style="max-width: {}px; max-height: {}px"></picture>',
+        srcset(name, size, 'webp', ready), variant_url(name, size, 'jpg', ready), srcset(name, size, 'jpg', ready), alt, size, size,
+    )
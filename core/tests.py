@@ -1,3 +1,1339 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import re
+import shutil
+import tempfile
+import threading
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models.functions import Lower
+from django.template import Context, Template
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import dashboard, history, metrics, querylog, rollups, thumbnails
+from .audit import AUDIT_MODELS, audit_page
+from .autocomplete import autocomplete_page
+from .caching import cached, model_versions, version_key
+from . import exports
+from .dashboard import pending
+from .history import compacted_through, record_compaction
+from .imports import IMPORTERS
+from .invoices import invoice_key
+from .management.commands import benchmark
+from .jobs import JOB_MAX_ATTEMPTS, JOB_STALE_AFTER, claim_next_job, enqueue, purge_jobs, run_job
+from .models import (
+    Customer, CustomerMonthlyOrderCount, CustomerUser, InventoryCheckpoint, InventoryItem, Job, MonthlyOrderCount,
+    MonthlyRevenue, Notification, Order, Payment, Purchase, Requirement, Supplier,
+)
+from .pagination import encode_cursor
+from .profiling import _cprofile_lock
+from .search import SEARCH_INDEXES, filter_search, icontains_filter, rebuild_index, search_page
+from .snapshots import end_of_day, stock_as_of, stock_report, take_checkpoint
+from .urls import urlpatterns
+from .views.api import api_router
+
+# Rows per model before and after the fixture grows. LARGE is past the list page size (50)
+# so every paginated page is full; a view whose query count follows the row count fails.
+SMALL = 3
+LARGE = 60
+# More pages than any walk through the behaviour tests' fixtures takes
+MAX_PAGES = 200
+
+
+def seed(count, user):
+    """Add `count` rows of every model, then rebuild what signals would have kept current."""
+    start = Customer.objects.count()
+    customers = Customer.objects.bulk_create(
+        [Customer(name=f'Customer {start + i}', contact=f'0300{start + i}', address='Lahore') for i in range(count)])
+    items = InventoryItem.objects.bulk_create([
+        InventoryItem(item_name=f'Lawn {start + i}', item_type='unstitched', fabric_type='Lawn', cost_per_meter=Decimal('350'),
+                      total_meters=Decimal('25'), stock_quantity=i % 10)
+        for i in range(count)])
+    # One order per new customer, and as many again for the first customer (the portal user's)
+    first = Customer.objects.earliest('id')
+    orders = Order.objects.bulk_create([
+        Order(customer=customer, inventory_item=item, product_type='stitched', status=('Pending', 'Shipped')[i % 2],
+              notes='Lawn suit', delivery_date=None if i % 3 else customer.created_at.date())
+        for i, (customer, item) in enumerate(zip(customers + [first] * count, items + items))])
+    Requirement.objects.bulk_create(
+        [Requirement(order=order, description='Hemming', steps_done=['cut'], steps_not_done=['stitch']) for order in orders])
+    Payment.objects.bulk_create([
+        Payment(order=order, amount=Decimal('1500'), status=('Pending', 'Paid')[i % 2], payment_date=order.order_date)
+        for i, order in enumerate(orders)])
+    suppliers = Supplier.objects.bulk_create([Supplier(name=f'Supplier {start + i}') for i in range(count)])
+    Purchase.objects.bulk_create(
+        [Purchase(supplier=supplier, item=item, quantity=5, price=Decimal('900')) for supplier, item in zip(suppliers, items)])
+    Notification.objects.bulk_create([Notification(user=user, message=f'Order {order.pk} shipped') for order in orders])
+    Job.objects.bulk_create([Job(kind='export', status='done', user=user) for _ in range(count)])
+    for model in SEARCH_INDEXES:
+        rebuild_index(model)
+    rollups.backfill()
+    dashboard.reconcile()
+
+
+def url_names(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from url_names(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield pattern.name
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Upper bounds on the SQL queries each page and API endpoint runs. The same bound must hold
+    with SMALL and LARGE rows per model, so an N+1 (a related object read per row) fails here.
+    Every request is made with an empty cache, so the bounds are for a cache miss.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+        cls.portal_user = User.objects.create_user('portal', 'portal@example.com', 'x')
+        seed(SMALL, cls.admin)
+        cls.customer = Customer.objects.earliest('id')
+        CustomerUser.objects.create(user=cls.portal_user, customer=cls.customer)
+        cls.item = InventoryItem.objects.earliest('id')
+        cls.order = Order.objects.earliest('id')
+        cls.requirement = Requirement.objects.earliest('id')
+        cls.payment = Payment.objects.earliest('id')
+        cls.supplier = Supplier.objects.earliest('id')
+        cls.purchase = Purchase.objects.earliest('id')
+        cls.notification = Notification.objects.earliest('id')
+        cls.job = Job.objects.earliest('id')
+
+    def setUp(self):
+        # Cache invalidation runs on commit, which never happens inside a TestCase
+        cache.clear()
+        self.staff = Client()
+        self.staff.force_login(self.admin)
+        self.portal = Client()
+        self.portal.force_login(self.portal_user)
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+
+    def page_budgets(self):
+        """(url name, client, url, expected status, query budget) for every page in core/urls.py."""
+        staff, anonymous = self.staff, Client()
+        return [
+            ('home', staff, reverse('home'), 200, 2),
+            ('register', anonymous, reverse('register'), 200, 0),
+            ('logout', staff, reverse('logout'), 405, 0),
+            ('dashboard', staff, reverse('dashboard'), 200, 4),
+            ('meeting_mode', staff, reverse('meeting_mode'), 200, 2),
+            ('analytics', staff, reverse('analytics'), 200, 6),
+            ('analytics', staff, reverse('analytics') + '?start=2020-01&end=2099-12', 200, 6),
+            ('customers', staff, reverse('customers'), 200, 3),
+            ('customers', staff, reverse('customers') + '?q=customer', 200, 4),
+            ('customers', staff, reverse('customers') + '?q=cu', 200, 3),
+            ('edit_customer', staff, reverse('edit_customer', args=[self.customer.pk]), 200, 3),
+            ('delete_customer', staff, reverse('delete_customer', args=[self.customer.pk]), 200, 3),
+            ('customers_import', staff, reverse('customers_import'), 302, 2),
+            ('customers_export', staff, reverse('customers_export'), 200, 3),
+            ('customers_export_excel', staff, reverse('customers_export_excel'), 200, 3),
+            ('inventory', staff, reverse('inventory'), 200, 3),
+            ('inventory', staff, reverse('inventory') + '?q=lawn', 200, 4),
+            ('edit_inventory', staff, reverse('edit_inventory', args=[self.item.pk]), 200, 3),
+            ('delete_inventory', staff, reverse('delete_inventory', args=[self.item.pk]), 200, 3),
+            ('inventory_import', staff, reverse('inventory_import'), 302, 2),
+            ('inventory_export', staff, reverse('inventory_export'), 200, 3),
+            ('inventory_export_excel', staff, reverse('inventory_export_excel'), 200, 3),
+            ('inventory_as_of', staff, reverse('inventory_as_of'), 200, 6),
+            ('inventory_as_of_data', staff, reverse('inventory_as_of_data') + '?date=2020-01-01', 200, 6),
+            ('orders', staff, reverse('orders'), 200, 3),
+            ('orders', staff, reverse('orders') + '?q=customer', 200, 4),
+            ('edit_order', staff, reverse('edit_order', args=[self.order.pk]), 200, 5),
+            ('delete_order', staff, reverse('delete_order', args=[self.order.pk]), 200, 3),
+            ('orders_import', staff, reverse('orders_import'), 302, 2),
+            ('orders_export', staff, reverse('orders_export'), 200, 3),
+            ('orders_export_excel', staff, reverse('orders_export_excel'), 200, 3),
+            ('requirements', staff, reverse('requirements'), 200, 3),
+            ('edit_requirement', staff, reverse('edit_requirement', args=[self.requirement.pk]), 200, 4),
+            ('delete_requirement', staff, reverse('delete_requirement', args=[self.requirement.pk]), 200, 3),
+            ('requirements_import', staff, reverse('requirements_import'), 302, 2),
+            ('requirements_export', staff, reverse('requirements_export'), 200, 3),
+            ('requirements_export_excel', staff, reverse('requirements_export_excel'), 200, 3),
+            ('payments', staff, reverse('payments'), 200, 3),
+            ('edit_payment', staff, reverse('edit_payment', args=[self.payment.pk]), 200, 4),
+            ('delete_payment', staff, reverse('delete_payment', args=[self.payment.pk]), 200, 3),
+            ('payments_import', staff, reverse('payments_import'), 302, 2),
+            ('payments_export', staff, reverse('payments_export'), 200, 3),
+            ('payments_export_excel', staff, reverse('payments_export_excel'), 200, 3),
+            ('suppliers', staff, reverse('suppliers'), 200, 3),
+            ('edit_supplier', staff, reverse('edit_supplier', args=[self.supplier.pk]), 200, 3),
+            ('delete_supplier', staff, reverse('delete_supplier', args=[self.supplier.pk]), 200, 3),
+            ('purchases', staff, reverse('purchases'), 200, 4),
+            ('edit_purchase', staff, reverse('edit_purchase', args=[self.purchase.pk]), 200, 5),
+            ('delete_purchase', staff, reverse('delete_purchase', args=[self.purchase.pk]), 200, 3),
+            ('notifications', staff, reverse('notifications'), 200, 3),
+            ('mark_notification_read', staff, reverse('mark_notification_read', args=[self.notification.pk]), 302, 4),
+            ('customer_login', anonymous, reverse('customer_login'), 200, 0),
+            ('customer_dashboard', self.portal, reverse('customer_dashboard'), 200, 4),
+            ('customer_invoice_pdf', staff, reverse('customer_invoice_pdf', args=[self.order.pk]), 200, 4),
+            ('statements', staff, reverse('statements') + f'?month={timezone.localdate():%Y-%m}', 200, 6),
+            ('order_qrcode', staff, reverse('order_qrcode', args=[self.order.pk]), 200, 3),
+            ('inventory_qrcode', staff, reverse('inventory_qrcode', args=[self.item.pk]), 200, 3),
+            ('label_sheet', staff, reverse('label_sheet', args=['orders']) + f'?ids={self.order.pk}', 200, 3),
+            ('label_sheet', staff, reverse('label_sheet', args=['inventory']) + f'?ids={self.item.pk}', 200, 3),
+            ('thumbnail', staff, reverse('thumbnail', args=[64, 'webp', 'inventory/missing.jpg']), 404, 2),
+            ('orders_calendar', staff, reverse('orders_calendar'), 200, 2),
+            ('orders_calendar_events', staff, reverse('orders_calendar_events'), 200, 3),
+            ('orders_calendar_events', staff, reverse('orders_calendar_events') + '?start=2020-01-01&end=2099-01-01', 200, 3),
+            ('orders_ical', staff, reverse('orders_ical'), 200, 5),
+            ('orders_ical', staff, reverse('orders_ical') + '?start=2020-01-01&end=2099-01-01', 200, 5),
+            ('orders_ical', staff, reverse('orders_ical') + '?days=30', 200, 5),
+            ('sample_customers_csv', staff, reverse('sample_customers_csv'), 200, 2),
+            ('sample_inventory_csv', staff, reverse('sample_inventory_csv'), 200, 2),
+            ('sample_orders_csv', staff, reverse('sample_orders_csv'), 200, 2),
+            ('sample_requirements_csv', staff, reverse('sample_requirements_csv'), 200, 2),
+            ('sample_payments_csv', staff, reverse('sample_payments_csv'), 200, 2),
+            ('job_status', staff, reverse('job_status', args=[self.job.pk]), 200, 3),
+            ('job_download', staff, reverse('job_download', args=[self.job.pk]), 404, 3),
+            ('autocomplete', staff, reverse('autocomplete', args=['customers']) + '?q=cust', 200, 3),
+            ('autocomplete', staff, reverse('autocomplete', args=['inventory']) + '?q=lawn', 200, 3),
+            ('autocomplete', staff, reverse('autocomplete', args=['orders']) + '?q=cust', 200, 3),
+            ('autocomplete', staff, reverse('autocomplete', args=['orders']) + f'?q=%23{self.order.pk}', 200, 3),
+            ('metrics', staff, reverse('metrics'), 200, 2),
+            ('query_report', staff, reverse('query_report'), 200, 2),
+            ('profiles', staff, reverse('profiles'), 200, 2),
+            ('audit_feed', staff, reverse('audit_feed'), 200, 9),
+            ('audit_feed', staff, reverse('audit_feed') + f'?user={self.admin.username}&start=2020-01-01&end=2099-12-31', 200, 10),
+            ('audit_events', staff, reverse('audit_events') + '?model=order', 200, 3),
+            ('profile_download', staff, reverse('profile_download', args=['missing.txt']), 404, 2),
+            ('api_token_auth', anonymous, reverse('api_token_auth'), 405, 0),
+            ('api-root', self.api, reverse('api-root'), 200, 0),
+        ]
+
+    def api_budgets(self):
+        """The same, for the list and detail endpoints of every viewset registered on api_router."""
+        objects = {
+            Customer: self.customer, InventoryItem: self.item, Order: self.order, Requirement: self.requirement,
+            Payment: self.payment, Supplier: self.supplier, Purchase: self.purchase,
+        }
+        budgets = []
+        for prefix, viewset, basename in api_router.registry:
+            obj = objects[viewset.queryset.model]
+            budgets += [
+                (f'{basename}-list', self.api, reverse(f'{basename}-list'), 200, 1),
+                (f'{basename}-list', self.api, reverse(f'{basename}-list') + '?page_size=500', 200, 1),
+                (f'{basename}-detail', self.api, reverse(f'{basename}-detail', args=[obj.pk]), 200, 1),
+            ]
+        return budgets
+
+    def count_queries(self, client, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, HTTP_ACCEPT='application/json' if client is self.api else '*/*')
+            if response.streaming:
+                # Streamed exports run their queries while the body is read
+                b''.join(response.streaming_content)
+        return response, queries
+
+    def assertWithinBudgets(self, budgets):
+        for rows in (SMALL, LARGE):
+            if rows == LARGE:
+                seed(LARGE - SMALL, self.admin)
+            for name, client, url, status, budget in budgets:
+                with self.subTest(url=url, rows=rows):
+                    response, queries = self.count_queries(client, url)
+                    self.assertEqual(response.status_code, status)
+                    sql = '\n'.join(query['sql'] for query in queries.captured_queries)
+                    self.assertLessEqual(len(queries), budget, f'{url} ran {len(queries)} queries with {rows} rows per model:\n{sql}')
+
+    def test_pages(self):
+        self.assertWithinBudgets(self.page_budgets())
+
+    def test_api(self):
+        self.assertWithinBudgets(self.api_budgets())
+
+    def test_model_history(self):
+        self.assertWithinBudgets([
+            ('model_history', self.staff, reverse('model_history', args=['Order', self.order.pk]), 200, 4),
+        ])
+
+    def test_every_url_has_a_budget(self):
+        # A new URL has to be given a budget here before it can be added
+        budgeted = {name for name, *_ in self.page_budgets() + self.api_budgets()} | {'model_history'}
+        self.assertEqual(set(url_names(urlpatterns)) - budgeted, set())
+
+
+def walk_pages(paginate, path, query='', per_page=5):
+    """Follow next_url from the first page to the last, then previous_url back; returns both lists of pages."""
+    factory = RequestFactory()
+    forward, url = [], f'?{query}'
+    # A cursor that does not move on would page forever
+    for _ in range(MAX_PAGES):
+        page = paginate(factory.get(path + url), per_page)
+        forward.append(list(page))
+        if not page.next_url:
+            break
+        url = page.next_url
+    else:
+        raise AssertionError(f'{path}?{query} did not reach a last page')
+    backward = [list(page)]
+    for _ in range(MAX_PAGES):
+        if not page.previous_url:
+            break
+        page = paginate(factory.get(path + page.previous_url), per_page)
+        backward.insert(0, list(page))
+    else:
+        raise AssertionError(f'{path}?{query} did not walk back to the first page')
+    return forward, backward
+
+
+class ImportTests(TestCase):
+    """What the CSV importers report for the rows they create, update and skip."""
+
+    def run_import(self, kind, text, batch_size=2):
+        # Small batches, so rows are reported correctly across batch boundaries
+        return IMPORTERS[kind](batch_size).run(io.BytesIO(text.encode()))
+
+    def test_skipped_rows_are_reported(self):
+        message = self.run_import('customers', 'name,contact,address\nAnn,0300,Lahore\nBob\n,0301,Karachi\nCara,0302,Multan\n')
+        self.assertEqual(message, 'Created 2 customers. Updated 0. Skipped 2 row(s). Row 3: Not enough columns. Row 4: Missing required name.')
+        self.assertEqual(sorted(Customer.objects.values_list('name', flat=True)), ['Ann', 'Cara'])
+
+    def test_only_the_first_five_skipped_rows_are_listed(self):
+        message = self.run_import('customers', 'name,contact,address\n' + ',0300,Lahore\n' * 7)
+        self.assertEqual(message, 'Created 0 customers. Updated 0. Skipped 7 row(s).'
+                         + ''.join(f' Row {row}: Missing required name.' for row in range(2, 7)) + ' ...')
+
+    def test_rows_with_ids_are_created_updated_or_skipped(self):
+        customer = Customer.objects.create(name='Ann')
+        order = Order.objects.create(customer=customer, product_type='stitched')
+        payment = Payment.objects.create(order=order, amount=Decimal('500'))
+        message = self.run_import('payments', (
+            'id,order_id,amount,status,payment_date,notes\n'
+            f',{order.pk},1500,Paid,2024-01-05,first\n'
+            ',999999,100,Paid,,no such order\n'
+            f',{order.pk},abc,Paid,,bad amount\n'
+            f',{order.pk},,Paid,,no amount\n'
+            f'{payment.pk},{order.pk},2000,Paid,2024-01-06,updated\n'
+            f'{payment.pk},{order.pk},2500,Paid,2024-01-06,updated again\n'
+        ))
+        self.assertEqual(message, (
+            'Created 1 payments. Updated 2. Skipped 3 row(s). Row 3: Order not found. '
+            "Row 4: ['“abc” value must be a decimal number.']. Row 5: Missing required fields."
+        ))
+        payment.refresh_from_db()
+        self.assertEqual((payment.amount, payment.status, payment.notes), (Decimal('2500'), 'Paid', 'updated again'))
+        # One history entry per row, as one save() per row would write
+        self.assertEqual(payment.history.count(), 3)
+        self.assertTrue(Payment.objects.filter(order=order, amount=Decimal('1500'), notes='first').exists())
+
+
+class CounterTests(TestCase):
+    """The dashboard counters and analytics rollups moved by each write match a full recount."""
+
+    def assertMatchesRecount(self):
+        self.assertEqual(dashboard.reconcile(), {})
+        rows = self.rollup_rows()
+        rollups.backfill()
+        self.assertEqual(rows, self.rollup_rows())
+
+    def rollup_rows(self):
+        # Rows moved down to zero are kept by the incremental updates and dropped by a backfill
+        return (
+            set(MonthlyOrderCount.objects.exclude(count=0).values_list('month', 'count')),
+            set(MonthlyRevenue.objects.exclude(total=0).values_list('month', 'total')),
+            set(CustomerMonthlyOrderCount.objects.exclude(count=0).values_list('customer_id', 'month', 'count')),
+        )
+
+    def test_writes_match_reconcile_and_backfill(self):
+        dashboard.reconcile()
+        rollups.backfill()
+        ann = Customer.objects.create(name='Ann')
+        bob = Customer.objects.create(name='Bob')
+        item = InventoryItem.objects.create(item_name='Lawn', item_type='unstitched', fabric_type='Lawn',
+                                            cost_per_meter=Decimal('350'), total_meters=Decimal('25'), stock_quantity=8)
+        Supplier.objects.create(name='Sup')
+        orders = [Order.objects.create(customer=customer, inventory_item=item, product_type='stitched', status=status)
+                  for customer, status in ((ann, 'Pending'), (ann, 'Shipped'), (bob, 'pending'), (bob, 'Pending'))]
+        Payment.objects.create(order=orders[0], amount=Decimal('1500.50'), status='Pending', payment_date=datetime.date(2024, 1, 5))
+        paid = Payment.objects.create(order=orders[1], amount=Decimal('900'), status='Paid', payment_date=datetime.date(2024, 2, 1))
+        Payment.objects.create(order=orders[3], amount=Decimal('300'), status='Pending')
+        self.assertMatchesRecount()
+
+        orders[0].status = 'Shipped'
+        orders[0].order_date = datetime.date(2024, 1, 10)
+        orders[0].save()
+        item.stock_quantity = 2
+        item.save()
+        paid.amount = Decimal('950.25')
+        paid.payment_date = datetime.date(2024, 3, 1)
+        paid.save()
+        orders[2].delete()
+        # Cascades to the customer's remaining order and its payment
+        bob.delete()
+        self.assertMatchesRecount()
+
+        IMPORTERS['payments']().run(io.BytesIO((
+            'id,order_id,amount,status,payment_date,notes\n'
+            f',{orders[0].pk},200,Pending,2024-01-20,\n'
+            f'{paid.pk},{orders[1].pk},100,Pending,2024-04-02,\n'
+        ).encode()))
+        IMPORTERS['orders']().run(io.BytesIO((
+            'id,customer_name,product_type,status,order_date,delivery_date,notes\n'
+            ',Cara,stitched,Pending,2024-02-03,2024-02-10,\n'
+            f'{orders[1].pk},Ann,stitched,Pending,2024-05-06,2024-05-10,\n'
+        ).encode()))
+        self.assertMatchesRecount()
+        snapshot = dashboard.get_snapshot()
+        self.assertEqual((snapshot.total_customers, snapshot.total_orders, snapshot.pending_orders), (2, 3, 2))
+        self.assertEqual((snapshot.low_stock_items, snapshot.outstanding_payments), (1, Decimal('1800.50')))
+
+
+class SearchTests(TestCase):
+    """Index searches find exactly the rows the icontains search finds, on every page."""
+
+    QUERIES = ['lawn', 'customer 1', 'pend', 'LAHORE', 'supplier 2', 'lawn suit', 'no such text']
+
+    @classmethod
+    def setUpTestData(cls):
+        seed(LARGE, User.objects.create_superuser('admin', 'admin@example.com', 'x'))
+
+    def test_index_matches_icontains(self):
+        for model in SEARCH_INDEXES:
+            queryset = model.objects.all()
+            paginate = lambda request, per_page: search_page(request, queryset, query, per_page=per_page)
+            for query in self.QUERIES:
+                with self.subTest(model=model.__name__, query=query):
+                    expected = set(icontains_filter(queryset, query).values_list('pk', flat=True))
+                    self.assertEqual(set(filter_search(queryset, query).values_list('pk', flat=True)), expected)
+                    forward, backward = walk_pages(paginate, '/')
+                    found = [obj.pk for page in forward for obj in page]
+                    self.assertEqual(len(found), len(set(found)))
+                    self.assertEqual(set(found), expected)
+                    self.assertEqual(backward, forward)
+
+    def test_index_follows_writes(self):
+        customer = Customer.objects.create(name='Zubair Qureshi', address='Quetta')
+        order = Order.objects.create(customer=customer, product_type='stitched')
+        matches = lambda model, query: set(filter_search(model.objects.all(), query).values_list('pk', flat=True))
+        self.assertEqual(matches(Customer, 'qureshi'), {customer.pk})
+        # Orders are indexed with their customer's name
+        self.assertEqual(matches(Order, 'qureshi'), {order.pk})
+        customer.name = 'Zubair Malik'
+        customer.save()
+        self.assertEqual(matches(Customer, 'qureshi'), set())
+        self.assertEqual(matches(Order, 'malik'), {order.pk})
+        customer.delete()
+        self.assertEqual(matches(Customer, 'zubair') | matches(Order, 'zubair'), set())
+
+
+class AuditFeedTests(TestCase):
+    """The audit feed lists the history of every table newest first, across pages, in one order."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+        start = timezone.make_aware(datetime.datetime(2024, 5, 1, 12))
+        for i in range(12):
+            # Three rounds share each moment, so entries tie across tables and within one
+            moment = start + datetime.timedelta(hours=i // 3 * 8)
+            user = cls.admin if i % 2 else None
+            customer = cls.save(Customer(name=f'Customer {i}'), moment, user)
+            supplier = cls.save(Supplier(name=f'Supplier {i}'), moment, user)
+            item = cls.save(InventoryItem(item_name=f'Lawn {i}', item_type='unstitched', fabric_type='Lawn',
+                                          cost_per_meter=1, total_meters=1), moment, user)
+            order = cls.save(Order(customer=customer, inventory_item=item, product_type='stitched'), moment, user)
+            cls.save(Payment(order=order, amount=Decimal('10')), moment, user)
+            if i % 3 == 0:
+                customer.name += ' (renamed)'
+                cls.save(customer, moment, user)
+                purchase = cls.save(Purchase(supplier=supplier, item=item, quantity=1, price=1), moment, user)
+                purchase._history_date = moment + datetime.timedelta(minutes=1)
+                purchase.delete()
+
+    @staticmethod
+    def save(obj, moment, user):
+        obj._history_date = moment
+        obj._history_user = user
+        obj.save()
+        return obj
+
+    def entries(self, models=AUDIT_MODELS, **filters):
+        ranks = {model: rank for rank, model in enumerate(AUDIT_MODELS)}
+        rows = [(record.history_date, ranks[model], record.history_id, model._meta.model_name)
+                for model in models for record in model.history.filter(**filters)]
+        return [(name, history_id) for _, _, history_id, name in sorted(rows, reverse=True)]
+
+    def walk(self, query=''):
+        forward, backward = walk_pages(audit_page, '/audit/', query, per_page=4)
+        self.assertEqual(backward, forward)
+        return [(entry['model_name'], entry['history_id']) for page in forward for entry in page]
+
+    def test_pages_follow_one_order(self):
+        self.assertEqual(self.walk(), self.entries())
+
+    def test_filters(self):
+        self.assertEqual(self.walk('model=customer&model=purchase'), self.entries([Customer, Purchase]))
+        self.assertEqual(self.walk(f'user={self.admin.username}'), self.entries(history_user=self.admin))
+        self.assertEqual(self.walk('user=nobody'), [])
+        self.assertEqual(self.walk('start=2024-05-02&end=2024-05-02'), self.entries(history_date__date=datetime.date(2024, 5, 2)))
+
+    def test_invalid_cursor_is_the_first_page(self):
+        first = audit_page(RequestFactory().get('/audit/'), 4)
+        for cursor in ('bogus', encode_cursor(['x', 1, 2]), encode_cursor([1, 2, 3]), encode_cursor(['2024-05-01T12:00:00', '1', 2])):
+            with self.subTest(cursor=cursor):
+                page = audit_page(RequestFactory().get(f'/audit/?after={cursor}'), 4)
+                self.assertEqual(list(page), list(first))
+                self.assertFalse(page.has_previous)
+
+    def test_feed_is_staff_only(self):
+        client = Client()
+        client.force_login(User.objects.create_user('clerk', 'clerk@example.com', 'x'))
+        self.assertEqual(client.get(reverse('audit_events')).status_code, 403)
+
+
+class StockAsOfTests(TestCase):
+    """Stock as of a past day, worked out from checkpoints plus the inventory history since."""
+
+    EXPECTED = {
+        1: {'Silk': 10, 'Lawn': 4},
+        2: {'Silk': 7, 'Lawn': 4, 'Cotton': 5},
+        3: {'Silk': 7, 'Cotton': 3},
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        silk = cls.change(InventoryItem(item_name='Silk', item_type='unstitched', fabric_type='Silk',
+                                        cost_per_meter=Decimal('800'), total_meters=Decimal('10')), 1, stock_quantity=10)
+        lawn = cls.change(InventoryItem(item_name='Lawn', item_type='unstitched', fabric_type='Lawn',
+                                        cost_per_meter=Decimal('350'), total_meters=Decimal('20')), 1, stock_quantity=4)
+        cls.change(silk, 2, stock_quantity=7)
+        cotton = cls.change(InventoryItem(item_name='Cotton', item_type='stitched', fabric_type='Cotton',
+                                          cost_per_meter=Decimal('200'), total_meters=Decimal('5')), 2, stock_quantity=5)
+        lawn._history_date = cls.at(3)
+        lawn.delete()
+        cls.change(cotton, 3, stock_quantity=3)
+        # A later change, after every day asked about
+        cls.change(silk, 20, stock_quantity=1)
+
+    @staticmethod
+    def at(day, hour=12):
+        return timezone.make_aware(datetime.datetime(2024, 3, day, hour))
+
+    @classmethod
+    def change(cls, item, day, **values):
+        for name, value in values.items():
+            setattr(item, name, value)
+        item._history_date = cls.at(day)
+        item.save()
+        return item
+
+    def day_end(self, day):
+        return end_of_day(datetime.date(2024, 3, day))
+
+    def stock(self, items):
+        return {item['item_name']: item['stock_quantity'] for item in items.values()}
+
+    def test_no_checkpoint(self):
+        self.assertEqual(stock_as_of(self.day_end(2)), (None, None, False))
+        checkpoint, items, exact = stock_as_of(self.day_end(2), replay=True)
+        self.assertEqual((checkpoint, self.stock(items), exact), (None, self.EXPECTED[2], True))
+
+    def test_answers_across_checkpoints(self):
+        first = take_checkpoint(self.day_end(1))
+        second = take_checkpoint(self.day_end(2))
+        for moment, checkpoint, expected in (
+            (self.day_end(1), first, self.EXPECTED[1]),
+            (self.at(2, 18), first, self.EXPECTED[2]),
+            (self.day_end(2), second, self.EXPECTED[2]),
+            (self.day_end(3), second, self.EXPECTED[3]),
+        ):
+            with self.subTest(moment=moment):
+                found, items, exact = stock_as_of(moment)
+                self.assertEqual((found, self.stock(items), exact), (checkpoint, expected, True))
+        report = stock_report(self.day_end(3))
+        self.assertEqual([row['item_name'] for row in report['items']], ['Cotton', 'Silk'])
+        self.assertEqual((report['total_stock'], report['total_value']), (10, Decimal('9000.00')))
+
+    def test_compacted_history(self):
+        first = take_checkpoint(self.day_end(1))
+        # As compact_history leaves it after deleting the history through day 2
+        InventoryItem.history.filter(history_date__lte=self.at(2)).delete()
+        record_compaction(InventoryItem, self.at(2))
+        self.assertEqual(stock_as_of(self.day_end(1))[::2], (first, True))
+        self.assertEqual(stock_as_of(self.day_end(3))[::2], (first, False))
+        with self.assertRaises(ValueError):
+            take_checkpoint(self.day_end(3))
+        latest = take_checkpoint()
+        self.assertEqual(stock_as_of(timezone.now())[::2], (latest, True))
+
+
+class AutocompleteTests(TestCase):
+    """Autocomplete pages: name prefix matches in name order, then the next pages by cursor."""
+
+    @classmethod
+    def setUpTestData(cls):
+        names = ['Ali', 'alia', 'Alina', 'Bilal', 'ALI Raza', 'Zara']
+        cls.customers = Customer.objects.bulk_create([Customer(name=name) for name in names * 3])
+        Order.objects.bulk_create([Order(customer=customer, product_type='stitched') for customer in cls.customers * 2])
+
+    def walk(self, name, query):
+        results, after = [], None
+        for _ in range(MAX_PAGES):
+            page = autocomplete_page(name, query, after, per_page=4)
+            results += page['results']
+            if not page['more']:
+                return results
+            after = page['next']
+        raise AssertionError(f'{name} autocomplete did not reach a last page')
+
+    def test_prefix_matches_in_order(self):
+        customers = self.walk('customers', 'ali')
+        expected = Customer.objects.filter(name__istartswith='ali').order_by(Lower('name'), 'id')
+        self.assertEqual([row['id'] for row in customers], [c.pk for c in expected])
+        orders = self.walk('orders', 'ALI')
+        expected = Order.objects.filter(customer__name__istartswith='ali').order_by(Lower('customer__name'), '-id')
+        self.assertEqual([row['id'] for row in orders], [o.pk for o in expected])
+        order = Order.objects.earliest('id')
+        self.assertEqual(self.walk('orders', f'#{order.pk}'), [{'id': order.pk, 'text': str(order)}])
+
+    def test_invalid_cursor_is_the_first_page(self):
+        cursors = {
+            'customers': [encode_cursor([None, None]), encode_cursor([1, 2]), encode_cursor(['ali']), 'bogus'],
+            'orders': [encode_cursor(['x']), encode_cursor([['a'], 1]), encode_cursor(['ali', 'x'])],
+            'inventory': [encode_cursor([{}, 1])],
+        }
+        for name, bad in cursors.items():
+            first = autocomplete_page(name, 'ali', per_page=4)
+            for cursor in bad:
+                with self.subTest(name=name, cursor=cursor):
+                    self.assertEqual(autocomplete_page(name, 'ali', cursor, per_page=4), first)
+        client = Client()
+        client.force_login(User.objects.create_user('clerk', 'clerk@example.com', 'x'))
+        response = client.get(reverse('autocomplete', args=['orders']) + f'?after={encode_cursor(["x"])}')
+        self.assertEqual(response.status_code, 200)
+
+
+class InvoiceTests(TestCase):
+    """Invoice ETags and cached PDFs follow every change to what an invoice prints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+        cls.customer = Customer.objects.create(name='Ann')
+        cls.item = InventoryItem.objects.create(item_name='Silk', item_type='stitched', fabric_type='Silk',
+                                                cost_per_meter=1, total_meters=1)
+        cls.order = Order.objects.create(customer=cls.customer, inventory_item=cls.item, product_type='stitched')
+        cls.other = Order.objects.create(customer=cls.customer, product_type='stitched')
+        cls.payment = Payment.objects.create(order=cls.order, amount=Decimal('500'))
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def etag(self, order):
+        response = self.client.get(reverse('customer_invoice_pdf', args=[order.pk]))
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def assertNewVersions(self, change, *orders):
+        # A browser's copy of each invoice is no longer current
+        etags = [self.etag(order) for order in orders]
+        url = reverse('customer_invoice_pdf', args=[orders[0].pk])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etags[0]).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        for order, etag in zip(orders, etags):
+            self.assertNotEqual(self.etag(order), etag)
+
+    def test_changes_make_a_new_version(self):
+        def rename(obj, field):
+            setattr(obj, field, getattr(obj, field) + ' (new)')
+            return obj.save
+        self.assertNewVersions(rename(self.customer, 'name'), self.order)
+        self.assertNewVersions(rename(self.item, 'item_name'), self.order)
+        self.assertNewVersions(rename(self.order, 'notes'), self.order)
+        self.payment.amount = Decimal('600')
+        self.assertNewVersions(self.payment.save, self.order)
+
+    def test_moved_payment_changes_both_orders(self):
+        self.payment.order = self.other
+        self.assertNewVersions(self.payment.save, self.order, self.other)
+        self.etag(self.order)
+        self.etag(self.other)
+        # Both cached PDFs are dropped when the payment moves back
+        self.payment.order = self.order
+        with self.captureOnCommitCallbacks(execute=True):
+            self.payment.save()
+        self.assertEqual(cache.get_many([invoice_key(self.order.pk), invoice_key(self.other.pk)]), {})
+
+
+class ExplainQueriesTests(TestCase):
+    """The hot queries, as the app builds them, are planned with their indexes."""
+
+    def test_hot_queries_use_their_indexes(self):
+        seed(SMALL, User.objects.create_superuser('admin', 'admin@example.com', 'x'))
+        Payment.objects.create(order=Order.objects.earliest('id'), amount=Decimal('10'), status='pending')
+        out = io.StringIO()
+        call_command('explain_queries', '--check', stdout=out)
+        self.assertIn('uses core_payment_status_lower_idx', out.getvalue())
+
+    def test_pending_matches_any_case(self):
+        customer = Customer.objects.create(name='Ann')
+        for status in ('Pending', 'pending', 'PENDING', 'Shipped'):
+            Order.objects.create(customer=customer, product_type='stitched', status=status)
+        self.assertEqual(pending(Order.objects.all()).count(), 3)
+        self.assertEqual(dashboard.compute_counts()['pending_orders'], 3)
+
+
+class CalendarTests(TestCase):
+    """The orders calendar events and iCal feed list the orders whose span overlaps their window."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+        customer = Customer.objects.create(name='Ann, "A"')
+        today = timezone.localdate()
+        cls.orders = {}
+        for name, placed, delivered in (
+            ('old', today - datetime.timedelta(days=800), None),
+            ('long', today - datetime.timedelta(days=60), today + datetime.timedelta(days=5)),
+            ('recent', today - datetime.timedelta(days=3), None),
+        ):
+            order = Order.objects.create(customer=customer, product_type='stitched', delivery_date=delivered)
+            Order.objects.filter(pk=order.pk).update(order_date=placed)
+            cls.orders[name] = order.pk
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def feed(self, query=''):
+        response = self.client.get(reverse('orders_ical') + query)
+        self.assertEqual(response.status_code, 200)
+        body = b''.join(response.streaming_content).decode()
+        return {name for name, pk in self.orders.items() if f'UID:order-{pk}@' in body}, response
+
+    def test_feed_lists_every_order_by_default(self):
+        self.assertEqual(self.feed()[0], {'old', 'long', 'recent'})
+        # The last 30 days: orders placed in them, and earlier ones delivered in them
+        self.assertEqual(self.feed('?days=30')[0], {'long', 'recent'})
+        self.assertEqual(self.feed('?days=x')[0], {'old', 'long', 'recent'})
+        start = timezone.localdate() - datetime.timedelta(days=100)
+        self.assertEqual(self.feed(f'?start={start}&end={start + datetime.timedelta(days=50)}')[0], {'long'})
+
+    def test_unchanged_feed_is_not_modified(self):
+        _, response = self.feed()
+        again = self.client.get(reverse('orders_ical'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+        Customer.objects.update(name='Bob')
+        Customer.objects.get().save()
+        self.assertEqual(self.client.get(reverse('orders_ical'), HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_events(self):
+        start = timezone.localdate() - datetime.timedelta(days=10)
+        response = self.client.get(reverse('orders_calendar_events') + f'?start={start}&end={start + datetime.timedelta(days=30)}')
+        titles = [event['title'] for event in response.json()]
+        self.assertEqual(titles, [f"Order #{self.orders['long']} - Ann, \"A\"", f"Order #{self.orders['recent']} - Ann, \"A\""])
+
+
+class LabelTests(TestCase):
+    """QR codes revalidate by what they encode; label sheets print one code per object asked for."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+        cls.items = [
+            InventoryItem.objects.create(item_name=f'Silk {i}', item_type='stitched', fabric_type='Silk',
+                                         cost_per_meter=1, total_meters=1)
+            for i in range(3)]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def test_qr_code_is_not_modified_until_renamed(self):
+        url = reverse('inventory_qrcode', args=[self.items[0].pk])
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.items[0].item_name = 'Chiffon'
+        self.items[0].save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_label_sheet(self):
+        from reportlab import rl_config
+        use_a85 = rl_config.useA85
+        ids = ','.join(str(item.pk) for item in self.items)
+        response = self.client.get(reverse('label_sheet', args=['inventory']) + f'?ids={ids},999999')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(response.content.startswith(b'%PDF'))
+        self.assertEqual(response.content.count(b'/Subtype /Image'), len(self.items))
+        # Other PDFs the process builds are not affected
+        self.assertEqual(rl_config.useA85, use_a85)
+        self.assertEqual(self.client.get(reverse('label_sheet', args=['inventory'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('label_sheet', args=['suppliers']) + f'?ids={ids}').status_code, 404)
+
+
+class JobTests(TestCase):
+    """Jobs run once each, come back if their worker dies, and leave no files behind."""
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+        Customer.objects.create(name='Ann')
+
+    def test_import_job_drops_its_upload(self):
+        job = enqueue('import', params={'name': 'customers'}, input_file=ContentFile(b'name,contact,address\nBob,0301,Karachi\n', name='customers.csv'))
+        upload = job.input_file.name
+        call_command('run_jobs', '--once', stdout=io.StringIO())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.message), ('done', 1, 'Created 1 customers. Updated 0.'))
+        self.assertFalse(job.input_file)
+        self.assertFalse(default_storage.exists(upload))
+        self.assertIsNone(claim_next_job())
+
+    def test_job_of_a_dead_worker_is_requeued(self):
+        job = enqueue('export', params={'name': 'customers'})
+        self.assertEqual(claim_next_job().pk, job.pk)
+        self.assertIsNone(claim_next_job())
+        for attempt in range(2, JOB_MAX_ATTEMPTS + 1):
+            Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - JOB_STALE_AFTER - datetime.timedelta(seconds=1))
+            with self.assertLogs('core.jobs', 'WARNING'):
+                job = claim_next_job()
+            self.assertEqual((job.status, job.attempts), ('running', attempt))
+        # A job that keeps killing its worker is not retried forever
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - JOB_STALE_AFTER - datetime.timedelta(seconds=1))
+        with self.assertLogs('core.jobs', 'WARNING'):
+            self.assertIsNone(claim_next_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        # One that reports progress is left to its worker
+        job = enqueue('export', params={'name': 'customers'})
+        job = claim_next_job()
+        Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - JOB_STALE_AFTER / 2)
+        self.assertIsNone(claim_next_job())
+        job = run_job(job)
+        self.assertEqual((job.status, job.attempts), ('done', 1))
+
+    def test_old_finished_jobs_are_purged(self):
+        old, recent = [run_job(claim_next_job()) for job in [enqueue('export', params={'name': 'customers'}) for _ in range(2)]]
+        self.assertEqual(old.status, 'done')
+        self.assertTrue(default_storage.exists(old.result_file.name))
+        Job.objects.filter(pk=old.pk).update(finished_at=timezone.now() - datetime.timedelta(days=8))
+        self.assertEqual(purge_jobs(days=7), 1)
+        self.assertFalse(default_storage.exists(old.result_file.name))
+        self.assertTrue(default_storage.exists(recent.result_file.name))
+        self.assertEqual(list(Job.objects.values_list('pk', flat=True)), [recent.pk])
+
+
+class BenchmarkTests(TestCase):
+    """The benchmark command has a request to time for every URL, or says why it has none."""
+
+    def test_every_url_is_timed_or_skipped(self):
+        seed(SMALL, User.objects.create_superuser('admin', 'admin@example.com', 'x'))
+        out = io.StringIO()
+        command = benchmark.Command(stdout=out)
+        command.options = {'filter': '', 'import_rows': 5, 'seed': 0}
+        command.create_users()
+        cases = list(command.cases())
+        skipped = set(re.findall(r'Skipping (\S+):', out.getvalue()))
+        self.assertEqual(skipped, {'profile_download', 'thumbnail'})
+        self.assertEqual({name for name, *_ in cases} | skipped | benchmark.SKIPPED, set(url_names(urlpatterns)))
+        self.assertIn(reverse('label_sheet', args=['inventory']) + f'?ids={InventoryItem.objects.latest("id").pk}',
+                      [url for _, _, _, _, url, _ in cases])
+
+
+class CompactHistoryTests(TestCase):
+    """compact_history deletes what each retention policy no longer keeps, and nothing else."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.now = now = timezone.now()
+        customer = Customer.objects.create(name='Ann')
+        # Orders keep two years, plus their last version before that
+        cls.orders = {}
+        for name, days in (('old', [1000, 900, 800, 10]), ('older', [1000]), ('new', [30, 20])):
+            order = Order(customer=customer, product_type='stitched')
+            for day in days:
+                order._history_date = now - datetime.timedelta(days=day)
+                order.save()
+            cls.orders[name] = order
+        # Requirements keep their newest 100 versions
+        cls.requirements = [Requirement.objects.create(description='Hemming') for _ in range(3)]
+        Requirement.history.model.objects.bulk_create([
+            Requirement.history.model(id=requirement.pk, description=f'v{version}', history_type='~', created_at=now,
+                                      updated_at=now, history_date=now - datetime.timedelta(days=200 - version))
+            for requirement, versions in zip(cls.requirements, (104, 99, 100)) for version in range(versions)])
+
+    def compact(self, *args):
+        out = io.StringIO()
+        call_command('compact_history', '--batch-size', '2', *args, stdout=out)
+        return out.getvalue()
+
+    def test_dry_run_counts(self):
+        out = self.compact('--dry-run')
+        self.assertIn('Order: 2 historical record(s) would be deleted', out)
+        self.assertIn('Requirement: 6 historical record(s) would be deleted', out)
+        self.assertEqual(Order.history.count(), 7)
+
+    def test_compaction(self):
+        out = self.compact()
+        self.assertIn('InventoryItem: 0 historical record(s) deleted', out)
+        self.assertFalse(InventoryCheckpoint.objects.exists())
+        ages = {name: [(self.now - record.history_date).days for record in order.history.all()]
+                for name, order in self.orders.items()}
+        self.assertEqual(ages, {'old': [10, 800], 'older': [1000], 'new': [20, 30]})
+        self.assertEqual(compacted_through(Order), self.now - datetime.timedelta(days=900))
+        # The oldest versions go: five of the first requirement's 105, one of the last one's 101
+        self.assertEqual([requirement.history.count() for requirement in self.requirements], [100, 100, 100])
+        self.assertEqual(self.requirements[0].history.earliest('history_date').description, 'v5')
+        self.assertIn('0 historical record(s) deleted', self.compact())
+
+
+class ProfileTests(TestCase):
+    """?__profile= returns and stores a profile of the request, for staff only."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+        cls.clerk = User.objects.create_user('clerk', 'clerk@example.com', 'x')
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        self.enterContext(override_settings(PROFILE_ROOT=root))
+        self.client.force_login(self.admin)
+
+    def profile(self, mode):
+        response = self.client.get(reverse('customers') + f'?__profile={mode}')
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        return response, self.client.get(reverse('profile_download', args=[response['X-Profile'] + '.txt']))
+
+    def test_profiles(self):
+        response, stored = self.profile('cprofile')
+        self.assertTrue(response['X-Profile'].endswith('-cprofile'))
+        self.assertIn(b'Call tree', response.content)
+        self.assertIn(b'SQL by call site', b''.join(stored.streaming_content))
+        response, stored = self.profile('sample')
+        self.assertTrue(response['X-Profile'].endswith('-sample'))
+        self.assertIn(b'samples: ', b''.join(stored.streaming_content))
+        self.client.force_login(self.clerk)
+        self.assertNotIn('X-Profile', self.client.get(reverse('home') + '?__profile=cprofile'))
+
+    def test_busy_cprofile_falls_back_to_sampling(self):
+        with _cprofile_lock:
+            response, stored = self.profile('cprofile')
+            self.assertTrue(response['X-Profile'].endswith('-sample'))
+            self.assertIn(b'so this one was sampled', b''.join(stored.streaming_content))
+        self.assertTrue(self.profile('cprofile')[0]['X-Profile'].endswith('-cprofile'))
+
+
+class QueryLogTests(TestCase):
+    """Each process's query figures are listed in the cache for the report, none dropped."""
+
+    def setUp(self):
+        cache.clear()
+        querylog.reset()
+        querylog.record('customers', "SELECT * FROM core_customer WHERE name = 'Ann'", (), 0.002, connection)
+
+    def processes(self):
+        return cache.get('querylog:processes', set())
+
+    def test_processes_keep_each_others_entries(self):
+        cache.set('querylog:processes', {'querylog:process:other'})
+        querylog.flush(force=True)
+        self.assertEqual(self.processes(), {'querylog:process:other', querylog.PROCESS_KEY})
+        # Another process rewrote the list from a copy read before this one was added
+        cache.set('querylog:processes', {'querylog:process:other'})
+        querylog.flush(force=True)
+        self.assertEqual(self.processes(), {'querylog:process:other', querylog.PROCESS_KEY})
+        rows = querylog.summarize(querylog.merged()[0])
+        self.assertEqual([(row['fingerprint'], row['count']) for row in rows],
+                         [('SELECT * FROM core_customer WHERE name = ?', 1)])
+
+    def test_registration_waits_for_the_lock(self):
+        cache.delete('querylog:processes')
+        cache.add('querylog:processes:lock', 'querylog:process:other')
+        with mock.patch.object(querylog, 'LOCK_TRIES', 2):
+            querylog.flush(force=True)
+        self.assertEqual(self.processes(), set())
+        cache.delete('querylog:processes:lock')
+        querylog.flush(force=True)
+        self.assertEqual(self.processes(), {querylog.PROCESS_KEY})
+        self.assertFalse(cache.has_key('querylog:processes:lock'))
+
+
+class ExportTests(TestCase):
+    """Exports hold the selected columns of every matching row, read and sent in chunks."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+        seed(SMALL, cls.admin)
+        Customer.objects.create(name='Khan, "Sana"', contact='0321', address='Multan\nCantt')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def csv(self, name, query=''):
+        response = self.client.get(reverse(f'{name}_export') + query)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="{name}.csv"')
+        return list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+    def test_csv(self):
+        rows = self.csv('customers')
+        self.assertEqual(rows[0], ['Name', 'Contact', 'Address', 'Created At'])
+        self.assertEqual([row[0] for row in rows[1:]], list(Customer.objects.values_list('name', flat=True)))
+        self.assertEqual(self.csv('customers', '?q=khan&columns=address&columns=name'),
+                         [['Name', 'Address'], ['Khan, "Sana"', 'Multan\nCantt']])
+        order = Order.objects.select_related('customer').earliest('id')
+        self.assertEqual(self.csv('orders')[1][:4], [str(order.pk), order.customer.name, 'Stitched', order.status])
+        self.assertEqual(self.csv('inventory', '?columns=item_type&columns=is_printed')[1], ['Unstitched', 'No'])
+        self.assertEqual(self.csv('requirements', '?columns=steps_done&columns=is_fulfilled')[1], ['No', 'cut'])
+
+    def test_rows_are_read_and_sent_in_chunks(self):
+        queryset = Order.objects.all()
+        with mock.patch.object(exports, 'EXPORT_FLUSH_SIZE', 10):
+            with CaptureQueriesContext(connection) as queries:
+                chunks = list(exports.stream_csv(['Order'], exports.export_rows(queryset, [('id', 'Order')], chunk_size=2)))
+        self.assertEqual(''.join(chunks).split(), ['Order'] + [str(pk) for pk in queryset.values_list('id', flat=True)])
+        # Sent once past the flush size, not held to the end
+        self.assertTrue(all(len(chunk) < 10 + len('Order\r\n') for chunk in chunks))
+        # One query, its rows fetched from the cursor as they are sent
+        self.assertEqual(len(queries), 1)
+
+    def test_xlsx(self):
+        from openpyxl import load_workbook
+
+        response = self.client.get(reverse('customers_export_excel') + '?columns=name&columns=created_at')
+        self.assertEqual(response['Content-Type'], exports.XLSX_CONTENT_TYPE)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="customers.xlsx"')
+        sheet = load_workbook(io.BytesIO(b''.join(response.streaming_content))).active
+        rows = list(sheet.values)
+        self.assertEqual(rows[0], ('Name', 'Created At'))
+        customers = list(Customer.objects.values_list('name', 'created_at'))
+        self.assertEqual([name for name, _ in rows[1:]], [name for name, _ in customers])
+        # Excel keeps local times to the millisecond
+        for (_, written), (_, created) in zip(rows[1:], customers):
+            self.assertLess(abs(written - timezone.make_naive(created)), datetime.timedelta(milliseconds=1))
+        # Widths fit the longest value among the sampled rows
+        self.assertEqual(sheet.column_dimensions['A'].width, max(len(name) for name, _ in customers) + 2)
+
+    def test_xlsx_widths_come_from_a_sample(self):
+        from openpyxl import load_workbook
+
+        buf = io.BytesIO()
+        with mock.patch.object(exports, 'XLSX_WIDTH_SAMPLE', 2):
+            exports.write_xlsx(['N'], iter([['ab'], ['abcd'], ['abcdefghij']]), buf)
+        sheet = load_workbook(buf).active
+        self.assertEqual(list(sheet.values), [('N',), ('ab',), ('abcd',), ('abcdefghij',)])
+        self.assertEqual(sheet.column_dimensions['A'].width, len('abcd') + 2)
+
+
+class CacheTests(TestCase):
+    """Cached page data is keyed on model versions that every committed write replaces."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+        seed(SMALL, cls.admin)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def dashboard(self):
+        return self.client.get(reverse('dashboard')).context['total_customers']
+
+    def test_writes_replace_cached_pages(self):
+        self.assertEqual(self.dashboard(), SMALL)
+        with self.assertNumQueries(2):
+            # The session and user; the page data comes from the cache
+            self.assertEqual(self.dashboard(), SMALL)
+        version = model_versions([Customer])
+        with self.captureOnCommitCallbacks() as callbacks:
+            Customer.objects.create(name='Ann')
+        # Not before the write commits, so no request can cache the old data under the new version
+        self.assertEqual(model_versions([Customer]), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(model_versions([Customer]), version)
+        self.assertEqual(self.dashboard(), SMALL + 1)
+        # Bulk writes (the importers) and deletes too
+        with self.captureOnCommitCallbacks(execute=True):
+            IMPORTERS['customers']().run(io.BytesIO(b'name,contact,address\nBob,0301,Karachi\n'))
+        self.assertEqual(self.dashboard(), SMALL + 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            Customer.objects.get(name='Bob').delete()
+        self.assertEqual(self.dashboard(), SMALL + 1)
+
+    def test_lost_version_never_matches_old_entries(self):
+        compute = mock.Mock(side_effect=[1, 2, 3])
+        self.assertEqual(cached('test', [Customer], compute, 'a'), 1)
+        self.assertEqual(cached('test', [Customer], compute, 'a'), 1)
+        self.assertEqual(cached('test', [Customer], compute, 'b'), 2)
+        cache.delete(version_key(Customer))
+        self.assertEqual(cached('test', [Customer], compute, 'a'), 3)
+
+
+class MetricsTests(TestCase):
+    """Every request adds to its view's series, read from all threads at /metrics."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+        seed(SMALL, cls.admin)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def series(self, name, *labels):
+        return metrics.collect().get((name, labels), [0])
+
+    def test_requests_are_recorded_per_view(self):
+        before = {name: self.series(name, 'customers', 'GET') for name in metrics.METRICS}
+        requests = self.series('stockstitch_requests_total', 'customers', 'GET', '200')[0]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('customers'))
+        self.assertEqual(self.series('stockstitch_requests_total', 'customers', 'GET', '200')[0], requests + 1)
+        after = {name: self.series(name, 'customers', 'GET') for name in metrics.METRICS}
+        added = {name: after[name][-1] - before[name][-1] for name in metrics.METRICS}
+        self.assertEqual(added['stockstitch_request_queries'], len(queries))
+        self.assertEqual(added['stockstitch_response_size_bytes'], len(response.content))
+        self.assertGreater(added['stockstitch_request_template_seconds'], 0)
+        self.assertGreaterEqual(added['stockstitch_request_duration_seconds'], added['stockstitch_request_template_seconds'])
+
+    def test_streamed_response_is_recorded_when_sent(self):
+        size = self.series('stockstitch_response_size_bytes', 'customers_export', 'GET')[-1]
+        response = self.client.get(reverse('customers_export'))
+        self.assertEqual(self.series('stockstitch_response_size_bytes', 'customers_export', 'GET')[-1], size)
+        body = b''.join(response.streaming_content)
+        self.assertEqual(self.series('stockstitch_response_size_bytes', 'customers_export', 'GET')[-1], size + len(body))
+
+    def test_threads_that_end_are_kept(self):
+        count = self.series('stockstitch_requests_total', 'test', 'GET', '200')[0]
+        stores = len(metrics._stores.all())
+        workers = [threading.Thread(target=metrics.increment, args=('stockstitch_requests_total', ('test', 'GET', '200')))
+                   for _ in range(3)]
+        for worker in workers:
+            worker.start()
+            worker.join()
+        del worker, workers
+        self.assertEqual(self.series('stockstitch_requests_total', 'test', 'GET', '200')[0], count + 3)
+        # Their series were folded into the finished threads' total
+        self.assertEqual(len(metrics._stores.all()), stores)
+
+    def test_endpoint(self):
+        self.client.get(reverse('customers'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'], metrics.PROMETHEUS_CONTENT_TYPE)
+        text = response.content.decode()
+        self.assertIn('# TYPE stockstitch_request_duration_seconds histogram', text)
+        self.assertRegex(text, r'stockstitch_requests_total\{view="customers",method="GET",status="200"\} \d+')
+        self.assertRegex(text, r'stockstitch_request_queries_bucket\{view="customers",method="GET",le="\+Inf"\} \d+')
+        anonymous = Client()
+        self.assertEqual(anonymous.get(reverse('metrics')).status_code, 403)
+        with override_settings(METRICS_TOKEN='secret'):
+            self.assertEqual(anonymous.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+            self.assertEqual(anonymous.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+
+
+def png(width, height, mode='RGBA'):
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.new(mode, (width, height), (200, 30, 30, 128) if mode == 'RGBA' else (200, 30, 30)).save(buf, 'PNG')
+    return buf.getvalue()
+
+
+class ThumbnailTests(TestCase):
+    """Uploaded images get every thumbnail size and format, on upload or on first request."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+        cls.customer = Customer.objects.create(name='Ann')
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def order_with_image(self, width=600, height=400):
+        order = Order.objects.create(customer=self.customer, product_type='stitched')
+        # Saved without the signal, like images uploaded before thumbnails were made on upload
+        order.image.save('photo.png', ContentFile(png(width, height)), save=False)
+        Order.objects.filter(pk=order.pk).update(image=order.image.name)
+        return order.image.name
+
+    def test_made_on_upload_in_the_worker_pool(self):
+        from PIL import Image
+
+        with mock.patch.object(thumbnails, 'submit') as submit, self.captureOnCommitCallbacks(execute=True):
+            item = InventoryItem.objects.create(item_name='Silk', item_type='stitched', cost_per_meter=1, total_meters=1,
+                                                image=SimpleUploadedFile('silk.png', png(300, 200)))
+        submit.assert_called_once_with(thumbnails.render_variants, item.image.name)
+        self.assertEqual(thumbnails.render_variants(item.image.name), item.image.name)
+        for size in thumbnails.SIZES:
+            with default_storage.open(thumbnails.variant_name(item.image.name, size, 'webp')) as f:
+                webp = Image.open(f)
+                self.assertEqual((webp.size, webp.mode), ((size, round(size * 2 / 3)), 'RGBA'))
+            with default_storage.open(thumbnails.variant_name(item.image.name, size, 'jpg')) as f:
+                self.assertEqual(Image.open(f).mode, 'RGB')
+
+    def test_template_tag(self):
+        name = self.order_with_image()
+        template = Template('{% load images %}{% responsive_image image 64 alt="Photo" %}')
+        html = template.render(Context({'image': Order.objects.get(image=name).image}))
+        lazy = reverse('thumbnail', args=[128, 'webp', name])
+        self.assertIn(f'{lazy} 2x', html)
+        self.assertIn('alt="Photo"', html)
+        thumbnails.generate(name)
+        html = template.render(Context({'image': Order.objects.get(image=name).image}))
+        self.assertIn(f'{default_storage.url(thumbnails.variant_name(name, 256, "webp"))} 4x', html)
+        self.assertNotIn('/thumbs/64/', html)
+
+    def test_made_on_first_request(self):
+        name = self.order_with_image()
+        response = self.client.get(reverse('thumbnail', args=[128, 'jpg', name]))
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertTrue(thumbnails.is_ready(name))
+        for size, ext, path in ((100, 'jpg', name), (128, 'gif', name), (128, 'jpg', 'customers/x.png'),
+                                (128, 'jpg', 'orders/../settings.py'), (128, 'jpg', 'orders/missing.png')):
+            self.assertEqual(self.client.get(reverse('thumbnail', args=[size, ext, path])).status_code, 404)
+
+    def test_backfill_command(self):
+        names = [self.order_with_image(), self.order_with_image(50, 80)]
+        out = io.StringIO()
+        call_command('generate_thumbnails', stdout=out)
+        self.assertIn('Thumbnails made for 2 image(s); 0 failed.', out.getvalue())
+        self.assertTrue(all(default_storage.exists(variant) for name in names for variant in thumbnails.variant_names(name)))
+        call_command('generate_thumbnails', stdout=out)
+        self.assertIn('Thumbnails made for 0 image(s)', out.getvalue())
+
+
+class HistoryBatchTests(TestCase):
+    """history.batch() writes the same records as saving one by one, in one INSERT per model."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+
+    def inserts(self, queries):
+        return sorted(query['sql'].split('"')[1] for query in queries if query['sql'].startswith('INSERT INTO "core_historical'))
+
+    def test_records_are_written_together_when_the_block_ends(self):
+        customer = Customer.objects.create(name='Ann')
+        created = mock.Mock()
+        history.post_create_historical_record.connect(created)
+        self.addCleanup(history.post_create_historical_record.disconnect, created)
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            with history.batch():
+                customer.name = 'Ann Khan'
+                customer._history_user = self.admin
+                customer.save()
+                orders = [Order.objects.create(customer=customer, product_type='stitched') for _ in range(3)]
+                self.assertEqual(Order.history.count(), 0)
+        self.assertEqual(self.inserts(queries), ['core_historicalcustomer', 'core_historicalorder'])
+        self.assertEqual(created.call_count, 4)
+        record = customer.history.first()
+        self.assertEqual((record.name, record.history_type, record.history_user), ('Ann Khan', '~', self.admin))
+        self.assertEqual(sorted(Order.history.values_list('id', flat=True)), [order.pk for order in orders])
+
+    def test_cascading_delete(self):
+        customer = Customer.objects.create(name='Ann')
+        order = Order.objects.create(customer=customer, product_type='stitched')
+        Payment.objects.create(order=order, amount=Decimal('100'))
+        Requirement.objects.create(order=order, description='Hem')
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            with history.batch():
+                customer.delete()
+        self.assertEqual(self.inserts(queries), ['core_historicalcustomer', 'core_historicalorder',
+                                                 'core_historicalpayment', 'core_historicalrequirement'])
+        self.assertEqual(Payment.history.filter(history_type='-').count(), 1)
+
+    def test_rolled_back_changes_leave_no_record(self):
+        customer = Customer.objects.create(name='Ann')
+        with self.captureOnCommitCallbacks(execute=True):
+            with history.batch():
+                with self.assertRaises(ValueError), transaction.atomic():
+                    customer.name = 'Rolled back'
+                    customer.save()
+                    raise ValueError
+                customer.name = 'Kept'
+                customer.save()
+        self.assertEqual(list(customer.history.values_list('name', flat=True)), ['Kept', 'Ann'])
+
+    def test_write_requests_are_batched(self):
+        self.client.force_login(self.admin)
+        with mock.patch.object(history, 'batch', wraps=history.batch) as batch, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('customers'), {'name': 'Ann', 'contact': '0300', 'address': 'Lahore'})
+            self.client.get(reverse('customers'))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(batch.call_count, 1)
+        record = Customer.history.get()
+        self.assertEqual((record.name, record.history_type), ('Ann', '+'))
+
+
+class HistoryPageTests(TestCase):
+    """An object's history page by page, with each change's fields worked out once and stored."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+        cls.item = InventoryItem.objects.create(item_name='Silk', item_type='stitched', cost_per_meter=1, total_meters=1)
+        for quantity in range(1, 60):
+            cls.item.stock_quantity = quantity
+            cls.item.save()
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def pages(self, model='InventoryItem', pk=None):
+        url = reverse('model_history', args=[model, pk or self.item.pk])
+        pages = []
+        for _ in range(MAX_PAGES):
+            response = self.client.get(url)
+            pages.append(list(response.context['page']))
+            if not response.context['page'].next_url:
+                return pages
+            url = reverse('model_history', args=[model, pk or self.item.pk]) + response.context['page'].next_url
+        raise AssertionError('The history did not reach a last page')
+
+    def test_changes_are_stored_once(self):
+        records = self.item.history.all()
+        self.assertFalse(records.exclude(history_changes=None).exists())
+        pages = self.pages()
+        self.assertEqual([len(page) for page in pages], [50, 10])
+        changes = [record.history_changes for page in pages for record in page]
+        # Newest first, each against the one before it, across the page boundary too
+        self.assertEqual(changes, [[['stock_quantity', str(n - 1), str(n)]] for n in range(59, 0, -1)] + [[]])
+        self.assertEqual(list(records.values_list('history_changes', flat=True)), changes)
+        with CaptureQueriesContext(connection) as queries:
+            self.pages()
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE')])
+
+    def test_compacted_and_deleted_objects(self):
+        # The record before the oldest one kept has gone, so its changes cannot be worked out
+        self.item.history.filter(stock_quantity__lt=30).delete()
+        response = self.client.get(reverse('model_history', args=['InventoryItem', self.item.pk]))
+        self.assertEqual([record.history_changes for record in response.context['page']][-2:],
+                         [[['stock_quantity', '30', '31']], None])
+        self.assertContains(response, 'Earlier history removed', count=1)
+        pk = self.item.pk
+        self.item.delete()
+        self.assertEqual(self.pages(pk=pk)[0][0].history_type, '-')
+        self.assertEqual(self.client.get(reverse('model_history', args=['InventoryItem', 999999])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('model_history', args=['Nothing', pk])).status_code, 404)
@@ -0,0 +1,43 @@
+import threading
+import weakref
+
+
+class _Owner:
+    # Held only by the thread's locals, so it is collected when the thread ends
+    __slots__ = ('store', '__weakref__')
+
+
+class ThreadStores:
+    """
+    One dict of series per thread, so recording never takes a lock; readers add them up. When a
+    thread ends, its series are folded into the dict of finished threads with fold(total, key,
+    series), so threads that come and go (runserver starts one per connection) don't pile up.
+    """
+
+    def __init__(self, fold):
+        self.fold = fold
+        self.local = threading.local()
+        self.lock = threading.RLock()
+        self.finished = {}
+        # Replaced, never changed in place, so readers can iterate it without the lock
+        self.stores = [self.finished]
+
+    def get(self):
+        """This thread's dict."""
+        owner = getattr(self.local, 'owner', None)
+        if owner is None:
+            owner = self.local.owner = _Owner()
+            owner.store = {}
+            with self.lock:
+                self.stores = self.stores + [owner.store]
+            weakref.finalize(owner, self.retire, owner.store)
+        return owner.store
+
+    def retire(self, store):
+        with self.lock:
+            for key, series in list(store.items()):
+                self.fold(self.finished, key, series)
+            self.stores = [other for other in self.stores if other is not store]
+
+    def all(self):
+        return self.stores
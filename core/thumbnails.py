@@ -0,0 +1,128 @@
+import io
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.urls import reverse
+
+from .workers import submit
+
+# Bounding boxes (px) thumbnails are made at. Pages ask for a display size and get every size
+# from there up in srcset, so high-density screens pick the 2x or 4x one.
+SIZES = (64, 128, 256)
+# Extension -> Pillow format and save options. WebP for browsers that take it, JPEG for the rest.
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 80, 'optimize': True, 'progressive': True}),
+}
+# Where ImageFields upload to; only these originals get thumbnails
+IMAGE_DIRS = ('inventory/', 'orders/')
+READY_TIMEOUT = 30 * 24 * 60 * 60
+# Browsers keep thumbnails served by the thumbnail view this long
+THUMBNAIL_MAX_AGE = 24 * 60 * 60
+PENDING_TIMEOUT = 5 * 60
+
+
+def variant_name(name, size, ext):
+    return f'thumbs/{name}.{size}.{ext}'
+
+
+def variant_names(name):
+    return [variant_name(name, size, ext) for size in SIZES for ext in FORMATS]
+
+
+def ready_key(name):
+    return f'thumbs:ready:{name}'
+
+
+def render_variants(name):
+    """
+    Write every size and format of the image `name` to storage, skipping those already there;
+    returns `name`. Runs in the worker pool, so no ORM here.
+    """
+    from PIL import Image, ImageOps
+
+    missing = [(size, ext) for size in SIZES for ext in FORMATS if not default_storage.exists(variant_name(name, size, ext))]
+    if not missing:
+        return name
+    with default_storage.open(name, 'rb') as f:
+        original = ImageOps.exif_transpose(Image.open(f))
+        original.load()
+    has_alpha = original.mode in ('RGBA', 'LA') or (original.mode == 'P' and 'transparency' in original.info)
+    original = original.convert('RGBA' if has_alpha else 'RGB')
+    for size, ext in missing:
+        image = original.copy()
+        image.thumbnail((size, size), Image.LANCZOS)
+        if ext == 'jpg' and has_alpha:
+            # JPEG has no transparency; flatten onto white
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        buf = io.BytesIO()
+        image_format, options = FORMATS[ext]
+        image.save(buf, image_format, **options)
+        default_storage.save(variant_name(name, size, ext), ContentFile(buf.getvalue()))
+    return name
+
+
+def render_or_error(name):
+    # For the backfill command: one unreadable image should not stop the rest
+    try:
+        render_variants(name)
+    except Exception as e:
+        return f'{type(e).__name__}: {e}'
+    return None
+
+
+def delete_variants(name):
+    for variant in variant_names(name):
+        default_storage.delete(variant)
+    cache.delete(ready_key(name))
+
+
+def mark_ready(name):
+    cache.set(ready_key(name), True, READY_TIMEOUT)
+
+
+def is_ready(name):
+    if cache.get(ready_key(name)):
+        return True
+    # Made by an earlier process or the backfill command
+    if all(default_storage.exists(variant) for variant in variant_names(name)):
+        mark_ready(name)
+        return True
+    return False
+
+
+def generate(name):
+    """Make the thumbnails of `name` in this process (for a request that needs them now)."""
+    render_variants(name)
+    mark_ready(name)
+
+
+def schedule(name):
+    """Make the thumbnails of a newly saved image in the worker pool once the transaction commits."""
+    if not name or not name.startswith(IMAGE_DIRS):
+        return
+
+    def done(future):
+        if not future.cancelled() and future.exception() is None:
+            mark_ready(name)
+
+    def start():
+        if is_ready(name) or not cache.add(f'thumbs:pending:{name}', True, PENDING_TIMEOUT):
+            return
+        submit(render_variants, name).add_done_callback(done)
+
+    transaction.on_commit(start)
+
+
+def variant_url(name, size, ext, ready):
+    # Until the thumbnails exist, the thumbnail view makes them on first request
+    return default_storage.url(variant_name(name, size, ext)) if ready else reverse('thumbnail', args=[size, ext, name])
+
+
+def srcset(name, size, ext, ready):
+    """srcset of `name` for a display size: the variant at that size as 1x, larger ones as 2x, 4x."""
+    return ', '.join(f'{variant_url(name, s, ext, ready)} {s // size}x' for s in SIZES if s >= size and s % size == 0)
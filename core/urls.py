@@ -1,6 +1,7 @@
 from django.urls import path, include
 from . import views
-from .views import api_router, notifications, mark_notification_read, CustomerLoginView, customer_dashboard, customer_invoice_pdf, order_qrcode, inventory_qrcode, orders_calendar, orders_ical
+from .views import notifications, mark_notification_read, CustomerLoginView, customer_dashboard, customer_invoice_pdf, order_qrcode, inventory_qrcode, orders_calendar, orders_calendar_events, orders_ical
+from .views.api import api_router
 from rest_framework.authtoken.views import obtain_auth_token
 from django.contrib.auth import views as auth_views
 
@@ -20,6 +21,8 @@ urlpatterns = [
     path('inventory/import/', views.inventory_import, name='inventory_import'),
     path('inventory/edit/<int:pk>/', views.edit_inventory, name='edit_inventory'),
     path('inventory/delete/<int:pk>/', views.delete_inventory, name='delete_inventory'),
+    path('inventory/as-of/', views.inventory_as_of, name='inventory_as_of'),
+    path('inventory/as-of/data/', views.inventory_as_of_data, name='inventory_as_of_data'),
     path('orders/', views.orders, name='orders'),
     path('orders/export/', views.orders_export, name='orders_export'),
     path('orders/export/excel/', views.orders_export_excel, name='orders_export_excel'),
@@ -40,6 +43,7 @@ urlpatterns = [
     path('inventory/export/excel/', views.inventory_export_excel, name='inventory_export_excel'),
     path('requirements/export/excel/', views.requirements_export_excel, name='requirements_export_excel'),
     path('payments/export/excel/', views.payments_export_excel, name='payments_export_excel'),
+    path('payments/statements/', views.statements, name='statements'),
     path('suppliers/', views.suppliers, name='suppliers'),
     path('suppliers/edit/<int:pk>/', views.edit_supplier, name='edit_supplier'),
     path('suppliers/delete/<int:pk>/', views.delete_supplier, name='delete_supplier'),
@@ -48,6 +52,8 @@ urlpatterns = [
     path('purchases/delete/<int:pk>/', views.delete_purchase, name='delete_purchase'),
     path('analytics/', views.analytics, name='analytics'),
     path('history/<str:model_name>/<int:object_id>/', views.model_history, name='model_history'),
+    path('audit/', views.audit_feed, name='audit_feed'),
+    path('audit/events/', views.audit_events, name='audit_events'),
 ]
 urlpatterns += [
     path('api/', include(api_router.urls)),
@@ -59,11 +65,21 @@ urlpatterns += [
     path('customer/invoice/<int:order_id>/', customer_invoice_pdf, name='customer_invoice_pdf'),
     path('order/qrcode/<int:order_id>/', order_qrcode, name='order_qrcode'),
     path('inventory/qrcode/<int:item_id>/', inventory_qrcode, name='inventory_qrcode'),
+    path('labels/<str:kind>/', views.label_sheet, name='label_sheet'),
+    path('thumbs/<int:size>/<str:ext>/<path:name>', views.thumbnail, name='thumbnail'),
     path('orders/calendar/', orders_calendar, name='orders_calendar'),
+    path('orders/calendar/events/', orders_calendar_events, name='orders_calendar_events'),
     path('orders/ical/', orders_ical, name='orders_ical'),
     path('sample/customers.csv', views.sample_customers_csv, name='sample_customers_csv'),
     path('sample/inventory.csv', views.sample_inventory_csv, name='sample_inventory_csv'),
     path('sample/orders.csv', views.sample_orders_csv, name='sample_orders_csv'),
     path('sample/requirements.csv', views.sample_requirements_csv, name='sample_requirements_csv'),
     path('sample/payments.csv', views.sample_payments_csv, name='sample_payments_csv'),
+    path('jobs/<int:pk>/', views.job_status, name='job_status'),
+    path('jobs/<int:pk>/download/', views.job_download, name='job_download'),
+    path('autocomplete/<str:name>/', views.autocomplete, name='autocomplete'),
+    path('metrics', views.metrics, name='metrics'),
+    path('queries/', views.query_report, name='query_report'),
+    path('profiles/', views.profiles, name='profiles'),
+    path('profiles/<str:filename>', views.profile_download, name='profile_download'),
 ]
\ No newline at end of file
@@ -0,0 +1,28 @@
+"""
+Views, by area: pages, crud, exports (imports, exports, jobs, sample CSVs), documents (PDF,
+QR, thumbnails and iCal), portal, ops (monitoring) and api (the DRF router, imported by
+core.urls only). The libraries behind documents and Excel exports are imported when a view
+first needs them.
+"""
+from .crud import (
+    customers, edit_customer, delete_customer, inventory, edit_inventory, delete_inventory,
+    orders, edit_order, delete_order, requirements, edit_requirement, delete_requirement,
+    payments, edit_payment, delete_payment, suppliers, edit_supplier, delete_supplier,
+    purchases, edit_purchase, delete_purchase,
+)
+from .documents import customer_invoice_pdf, statements, order_qrcode, inventory_qrcode, label_sheet, thumbnail, orders_ical
+from .exports import (
+    job_status, job_download,
+    customers_export, customers_export_excel, customers_import,
+    inventory_export, inventory_export_excel, inventory_import,
+    orders_export, orders_export_excel, orders_import,
+    requirements_export, requirements_export_excel, requirements_import,
+    payments_export, payments_export_excel, payments_import,
+    sample_customers_csv, sample_inventory_csv, sample_orders_csv, sample_requirements_csv, sample_payments_csv,
+)
+from .ops import metrics, query_report, profiles, profile_download
+from .pages import (
+    home, autocomplete, meeting_mode, dashboard, analytics, model_history, audit_feed, audit_events, inventory_as_of, inventory_as_of_data, register,
+    notifications, mark_notification_read, orders_calendar, orders_calendar_events, send_order_status_email, schedule_payment_reminder,
+)
+from .portal import CustomerLoginView, customer_dashboard
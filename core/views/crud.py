@@ -0,0 +1,271 @@
+from django.contrib.auth.decorators import login_required, permission_required
+from django.db.models import Q
+from django.shortcuts import render, redirect, get_object_or_404
+
+from ..forms import CustomerForm, InventoryItemForm, OrderForm, RequirementForm, PaymentForm, SupplierForm, PurchaseForm
+from ..models import Customer, InventoryItem, Order, Requirement, Payment, Supplier, Purchase
+from ..pagination import keyset_paginate
+from ..search import search_page
+
+# Customers CRUD
+
+@login_required
+def customers(request):
+    query = request.GET.get('q', '')
+    customers = Customer.objects.all()
+    form = CustomerForm()
+    if request.method == 'POST':
+        form = CustomerForm(request.POST)
+        if form.is_valid():
+            form.save()
+            return redirect('customers')
+    page = search_page(request, customers, query) if query else keyset_paginate(request, customers)
+    return render(request, 'core/customers.html', {'customers': page.object_list, 'page': page, 'form': form, 'query': query})
+
+@login_required
+def edit_customer(request, pk):
+    customer = get_object_or_404(Customer, pk=pk)
+    if request.method == 'POST':
+        form = CustomerForm(request.POST, instance=customer)
+        if form.is_valid():
+            form.save()
+            return redirect('customers')
+    else:
+        form = CustomerForm(instance=customer)
+    return render(request, 'core/edit_customer.html', {'form': form, 'customer': customer})
+
+@permission_required('core.delete_customer', raise_exception=True)
+def delete_customer(request, pk):
+    customer = get_object_or_404(Customer, pk=pk)
+    if request.method == 'POST':
+        customer.delete()
+        return redirect('customers')
+    return render(request, 'core/delete_customer.html', {'customer': customer})
+
+@login_required
+def inventory(request):
+    query = request.GET.get('q', '')
+    items = InventoryItem.objects.all()
+    form = InventoryItemForm()
+    if request.method == 'POST':
+        form = InventoryItemForm(request.POST, request.FILES)
+        if form.is_valid():
+            form.save()
+            return redirect('inventory')
+    page = search_page(request, items, query) if query else keyset_paginate(request, items)
+    return render(request, 'core/inventory.html', {'items': page.object_list, 'page': page, 'form': form, 'query': query})
+
+@login_required
+def edit_inventory(request, pk):
+    item = get_object_or_404(InventoryItem, pk=pk)
+    if request.method == 'POST':
+        form = InventoryItemForm(request.POST, request.FILES, instance=item)
+        if form.is_valid():
+            form.save()
+            return redirect('inventory')
+    else:
+        form = InventoryItemForm(instance=item)
+    return render(request, 'core/edit_inventory.html', {'form': form, 'item': item})
+
+@permission_required('core.delete_inventoryitem', raise_exception=True)
+def delete_inventory(request, pk):
+    item = get_object_or_404(InventoryItem, pk=pk)
+    if request.method == 'POST':
+        item.delete()
+        return redirect('inventory')
+    return render(request, 'core/delete_inventory.html', {'item': item})
+
+@login_required
+def orders(request):
+    query = request.GET.get('q', '')
+    orders = Order.objects.select_related('customer').all()
+    ordering = ('-order_date', '-id')
+    form = OrderForm()
+    if request.method == 'POST':
+        form = OrderForm(request.POST, request.FILES)
+        if form.is_valid():
+            form.save()
+            return redirect('orders')
+    if query:
+        page = search_page(request, orders, query, ordering)
+    else:
+        page = keyset_paginate(request, orders, ordering=ordering)
+    return render(request, 'core/orders.html', {'orders': page.object_list, 'page': page, 'form': form, 'query': query})
+
+@login_required
+def edit_order(request, pk):
+    order = get_object_or_404(Order, pk=pk)
+    if request.method == 'POST':
+        form = OrderForm(request.POST, request.FILES, instance=order)
+        if form.is_valid():
+            form.save()
+            return redirect('orders')
+    else:
+        form = OrderForm(instance=order)
+    return render(request, 'core/edit_order.html', {'form': form, 'order': order})
+
+@permission_required('core.delete_order', raise_exception=True)
+def delete_order(request, pk):
+    order = get_object_or_404(Order, pk=pk)
+    if request.method == 'POST':
+        order.delete()
+        return redirect('orders')
+    return render(request, 'core/delete_order.html', {'order': order})
+
+# Requirements CRUD
+
+@login_required
+def requirements(request):
+    query = request.GET.get('q', '')
+    requirements = Requirement.objects.select_related('order').all()
+    if query:
+        requirements = requirements.filter(
+            Q(description__icontains=query) |
+            Q(order__id__icontains=query) |
+            Q(notes__icontains=query) |
+            Q(is_fulfilled__icontains=query)
+        )
+    form = RequirementForm()
+    if request.method == 'POST':
+        form = RequirementForm(request.POST, request.FILES)
+        if form.is_valid():
+            form.save()
+            return redirect('requirements')
+    page = keyset_paginate(request, requirements)
+    return render(request, 'core/requirements.html', {'requirements': page.object_list, 'page': page, 'form': form, 'query': query})
+
+@login_required
+def edit_requirement(request, pk):
+    requirement = get_object_or_404(Requirement, pk=pk)
+    if request.method == 'POST':
+        form = RequirementForm(request.POST, request.FILES, instance=requirement)
+        if form.is_valid():
+            form.save()
+            return redirect('requirements')
+    else:
+        form = RequirementForm(instance=requirement)
+    return render(request, 'core/edit_requirement.html', {'form': form, 'requirement': requirement})
+
+@permission_required('core.delete_requirement', raise_exception=True)
+def delete_requirement(request, pk):
+    requirement = get_object_or_404(Requirement, pk=pk)
+    if request.method == 'POST':
+        requirement.delete()
+        return redirect('requirements')
+    return render(request, 'core/delete_requirement.html', {'requirement': requirement})
+
+@login_required
+def payments(request):
+    query = request.GET.get('q', '')
+    payments = Payment.objects.select_related('order').all()
+    if query:
+        payments = payments.filter(
+            Q(order__id__icontains=query) |
+            Q(status__icontains=query) |
+            Q(notes__icontains=query) |
+            Q(amount__icontains=query)
+        )
+    form = PaymentForm()
+    if request.method == 'POST':
+        form = PaymentForm(request.POST)
+        if form.is_valid():
+            form.save()
+            return redirect('payments')
+    page = keyset_paginate(request, payments)
+    return render(request, 'core/payments.html', {'payments': page.object_list, 'page': page, 'form': form, 'query': query})
+
+@login_required
+def edit_payment(request, pk):
+    payment = get_object_or_404(Payment, pk=pk)
+    if request.method == 'POST':
+        form = PaymentForm(request.POST, instance=payment)
+        if form.is_valid():
+            form.save()
+            return redirect('payments')
+    else:
+        form = PaymentForm(instance=payment)
+    return render(request, 'core/edit_payment.html', {'form': form, 'payment': payment})
+
+@permission_required('core.delete_payment', raise_exception=True)
+def delete_payment(request, pk):
+    payment = get_object_or_404(Payment, pk=pk)
+    if request.method == 'POST':
+        payment.delete()
+        return redirect('payments')
+    return render(request, 'core/delete_payment.html', {'payment': payment})
+
+@login_required
+def suppliers(request):
+    query = request.GET.get('q', '')
+    suppliers = Supplier.objects.all()
+    if query:
+        suppliers = suppliers.filter(
+            Q(name__icontains=query) |
+            Q(contact__icontains=query) |
+            Q(address__icontains=query) |
+            Q(email__icontains=query) |
+            Q(phone__icontains=query)
+        )
+    form = SupplierForm()
+    if request.method == 'POST':
+        form = SupplierForm(request.POST)
+        if form.is_valid():
+            form.save()
+            return redirect('suppliers')
+    page = keyset_paginate(request, suppliers)
+    return render(request, 'core/suppliers.html', {'suppliers': page.object_list, 'page': page, 'form': form, 'query': query})
+
+@login_required
+def edit_supplier(request, pk):
+    supplier = get_object_or_404(Supplier, pk=pk)
+    if request.method == 'POST':
+        form = SupplierForm(request.POST, instance=supplier)
+        if form.is_valid():
+            form.save()
+            return redirect('suppliers')
+    else:
+        form = SupplierForm(instance=supplier)
+    return render(request, 'core/edit_supplier.html', {'form': form, 'supplier': supplier})
+
+@permission_required('core.delete_supplier', raise_exception=True)
+def delete_supplier(request, pk):
+    supplier = get_object_or_404(Supplier, pk=pk)
+    if request.method == 'POST':
+        supplier.delete()
+        return redirect('suppliers')
+    return render(request, 'core/delete_supplier.html', {'supplier': supplier})
+
+# Purchases CRUD
+
+@login_required
+def purchases(request):
+    query = request.GET.get('q', '')
+    purchases = Purchase.objects.select_related('supplier', 'item').all()
+    form = PurchaseForm()
+    if request.method == 'POST':
+        form = PurchaseForm(request.POST)
+        if form.is_valid():
+            form.save()
+            return redirect('purchases')
+    page = search_page(request, purchases, query) if query else keyset_paginate(request, purchases)
+    return render(request, 'core/purchases.html', {'purchases': page.object_list, 'page': page, 'form': form, 'query': query})
+
+@login_required
+def edit_purchase(request, pk):
+    purchase = get_object_or_404(Purchase, pk=pk)
+    if request.method == 'POST':
+        form = PurchaseForm(request.POST, instance=purchase)
+        if form.is_valid():
+            form.save()
+            return redirect('purchases')
+    else:
+        form = PurchaseForm(instance=purchase)
+    return render(request, 'core/edit_purchase.html', {'form': form, 'purchase': purchase})
+
+@permission_required('core.delete_purchase', raise_exception=True)
+def delete_purchase(request, pk):
+    purchase = get_object_or_404(Purchase, pk=pk)
+    if request.method == 'POST':
+        purchase.delete()
+        return redirect('purchases')
+    return render(request, 'core/delete_purchase.html', {'purchase': purchase})
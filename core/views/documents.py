@@ -0,0 +1,126 @@
+import datetime
+import tempfile
+
+from django.contrib.auth.decorators import login_required
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse, Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from ..calendars import feed_etag, ical_stream, latest_change, parse_day, rolling_start
+from ..invoices import invoice_orders, invoice_pdf, invoice_version, statements_filename, write_statements
+from ..jobs import enqueue
+from ..models import InventoryItem, Order
+from ..qrcodes import LABEL_SHEET_MAX, inventory_payload, label_sheet_pdf, order_payload, qr_response
+from ..thumbnails import FORMATS, IMAGE_DIRS, SIZES, THUMBNAIL_MAX_AGE, generate, is_ready, variant_name
+from .exports import job_queued
+from .pages import parse_month
+
+# reportlab, qrcode and Pillow are imported where they are used (core.invoices, core.qrcodes
+# and core.thumbnails), so only the first PDF, QR code or thumbnail pays for loading them
+
+@login_required
+def customer_invoice_pdf(request, order_id):
+    # Rendered once per version of the order and its payments; a browser that has this
+    # version gets a 304
+    order = get_object_or_404(invoice_orders(), pk=order_id)
+    etag = f'"{invoice_version(order)}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(invoice_pdf(order), content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="invoice_order_{order.id}.pdf"'
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+@login_required
+def statements(request):
+    # Zip of month-end statement PDFs for every customer, for ?month=YYYY-MM (default: last month)
+    month = parse_month(request.GET.get('month')) or (timezone.localdate().replace(day=1) - datetime.timedelta(days=1))
+    month = month.replace(day=1)
+    if request.GET.get('background'):
+        job = enqueue('statements', user=request.user, params={'month': month.isoformat()})
+        return job_queued(request, job, 'payments')
+    tmp = tempfile.TemporaryFile()
+    write_statements(month, tmp)
+    tmp.seek(0)
+    return FileResponse(tmp, as_attachment=True, filename=statements_filename(month), content_type='application/zip')
+
+# Barcode/QR code generation
+@login_required
+def order_qrcode(request, order_id):
+    order = Order.objects.get(pk=order_id)
+    return qr_response(request, order_payload(order))
+
+@login_required
+def inventory_qrcode(request, item_id):
+    item = InventoryItem.objects.get(pk=item_id)
+    return qr_response(request, inventory_payload(item))
+
+# kind -> (queryset, QR payload, caption lines) for label sheets
+LABELS = {
+    'orders': (
+        lambda: Order.objects.select_related('customer'), order_payload,
+        lambda o: [f"Order #{o.id}", o.customer.name, o.get_product_type_display(), f"Due {o.delivery_date or '-'}"],
+    ),
+    'inventory': (
+        lambda: InventoryItem.objects.all(), inventory_payload,
+        lambda i: [i.item_name, i.fabric_type or i.get_item_type_display(), i.color or '', i.size or ''],
+    ),
+}
+
+@login_required
+def label_sheet(request, kind):
+    # PDF of QR labels for ?ids=1,2,3 (or repeated ids=), in the order given
+    if kind not in LABELS:
+        raise Http404
+    ids = []
+    for value in request.GET.getlist('ids'):
+        ids += [int(part) for part in value.split(',') if part.strip().isdigit()]
+    ids = list(dict.fromkeys(ids))[:LABEL_SHEET_MAX]
+    if not ids:
+        raise Http404('No labels selected.')
+    queryset, payload, caption = LABELS[kind]
+    objects = queryset().in_bulk(ids)
+    labels = [(payload(objects[pk]), caption(objects[pk])) for pk in ids if pk in objects]
+    response = HttpResponse(label_sheet_pdf(labels), content_type='application/pdf')
+    response['Content-Disposition'] = f'inline; filename="{kind}_labels.pdf"'
+    return response
+
+# Thumbnails of images uploaded before they were generated on upload: made on first request
+@login_required
+def thumbnail(request, size, ext, name):
+    if size not in SIZES or ext not in FORMATS or not name.startswith(IMAGE_DIRS) or '..' in name.split('/'):
+        raise Http404
+    if not default_storage.exists(name):
+        raise Http404('No such image.')
+    if not is_ready(name):
+        try:
+            generate(name)
+        except OSError:
+            raise Http404('Not a readable image.')
+    response = FileResponse(default_storage.open(variant_name(name, size, ext), 'rb'), content_type=f'image/{"jpeg" if ext == "jpg" else ext}')
+    patch_cache_control(response, private=True, max_age=THUMBNAIL_MAX_AGE)
+    return response
+
+# iCal export for orders
+@login_required
+def orders_ical(request):
+    # Every order by default; ?start=&end= (YYYY-MM-DD) or ?days=N (the last N days) bound it.
+    # Clients polling an unchanged feed get a 304 from one history lookup, without reading any orders.
+    start = parse_day(request.GET.get('start')) or rolling_start(request.GET.get('days'))
+    end = parse_day(request.GET.get('end'))
+    change = latest_change()
+    etag = feed_etag(change, start, end)
+    last_modified = int(change[1].timestamp()) if change else None
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = StreamingHttpResponse(ical_stream(start, end, request.get_host()), content_type='text/calendar')
+        response['Content-Disposition'] = 'attachment; filename="orders.ics"'
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
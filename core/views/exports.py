@@ -0,0 +1,205 @@
+import csv
+
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, HttpResponse, JsonResponse, Http404
+from django.shortcuts import redirect, get_object_or_404
+
+from ..exports import export_response
+from ..imports import CustomerImporter, InventoryImporter, OrderImporter, RequirementImporter, PaymentImporter
+from ..jobs import enqueue, job_payload
+from ..models import Job
+
+# Background jobs
+
+def job_queued(request, job, redirect_to):
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return JsonResponse(job_payload(job), status=202)
+    messages.info(request, f"Job #{job.id} queued. It will run in the background.")
+    return redirect(redirect_to)
+
+def export_or_queue(request, name, fmt):
+    if request.GET.get('background'):
+        job = enqueue('export', user=request.user, params={
+            'name': name,
+            'format': fmt,
+            'q': request.GET.get('q', ''),
+            'columns': request.GET.getlist('columns'),
+        })
+        return job_queued(request, job, name)
+    return export_response(request, name, fmt)
+
+def get_user_job(request, pk):
+    jobs = Job.objects.all() if request.user.is_staff else Job.objects.filter(user=request.user)
+    return get_object_or_404(jobs, pk=pk)
+
+@login_required
+def job_status(request, pk):
+    return JsonResponse(job_payload(get_user_job(request, pk)))
+
+@login_required
+def job_download(request, pk):
+    job = get_user_job(request, pk)
+    if not job.result_file:
+        raise Http404('This job has no result file.')
+    return FileResponse(job.result_file.open('rb'), as_attachment=True, filename=job.result_file.name.rsplit('/', 1)[-1])
+
+@login_required
+def customers_export(request):
+    return export_or_queue(request, 'customers', 'csv')
+
+@login_required
+def customers_import(request):
+    if request.method == 'POST' and request.FILES.get('csv_file'):
+        if request.POST.get('background'):
+            job = enqueue('import', user=request.user, params={'name': 'customers'}, input_file=request.FILES['csv_file'])
+            return job_queued(request, job, 'customers')
+        try:
+            messages.info(request, CustomerImporter().run(request.FILES['csv_file']))
+        except Exception as e:
+            messages.error(request, f'Error importing CSV: {e}')
+        return redirect('customers')
+    messages.error(request, 'No file uploaded.')
+    return redirect('customers')
+
+@login_required
+def customers_export_excel(request):
+    return export_or_queue(request, 'customers', 'xlsx')
+
+@login_required
+def inventory_export(request):
+    return export_or_queue(request, 'inventory', 'csv')
+
+@login_required
+def inventory_import(request):
+    if request.method == 'POST' and request.FILES.get('csv_file'):
+        if request.POST.get('background'):
+            job = enqueue('import', user=request.user, params={'name': 'inventory'}, input_file=request.FILES['csv_file'])
+            return job_queued(request, job, 'inventory')
+        try:
+            messages.info(request, InventoryImporter().run(request.FILES['csv_file']))
+        except Exception as e:
+            messages.error(request, f'Error importing CSV: {e}')
+        return redirect('inventory')
+    messages.error(request, 'No file uploaded.')
+    return redirect('inventory')
+
+@login_required
+def inventory_export_excel(request):
+    return export_or_queue(request, 'inventory', 'xlsx')
+
+@login_required
+def orders_export(request):
+    return export_or_queue(request, 'orders', 'csv')
+
+@login_required
+def orders_export_excel(request):
+    return export_or_queue(request, 'orders', 'xlsx')
+
+@login_required
+def orders_import(request):
+    if request.method == 'POST' and request.FILES.get('csv_file'):
+        if request.POST.get('background'):
+            job = enqueue('import', user=request.user, params={'name': 'orders'}, input_file=request.FILES['csv_file'])
+            return job_queued(request, job, 'orders')
+        try:
+            messages.info(request, OrderImporter().run(request.FILES['csv_file']))
+        except Exception as e:
+            messages.error(request, f'Error importing CSV: {e}')
+        return redirect('orders')
+    messages.error(request, 'No file uploaded.')
+    return redirect('orders')
+
+@login_required
+def requirements_export(request):
+    return export_or_queue(request, 'requirements', 'csv')
+
+@login_required
+def requirements_import(request):
+    if request.method == 'POST' and request.FILES.get('csv_file'):
+        if request.POST.get('background'):
+            job = enqueue('import', user=request.user, params={'name': 'requirements'}, input_file=request.FILES['csv_file'])
+            return job_queued(request, job, 'requirements')
+        try:
+            messages.info(request, RequirementImporter().run(request.FILES['csv_file']))
+        except Exception as e:
+            messages.error(request, f'Error importing CSV: {e}')
+        return redirect('requirements')
+    messages.error(request, 'No file uploaded.')
+    return redirect('requirements')
+
+@login_required
+def requirements_export_excel(request):
+    return export_or_queue(request, 'requirements', 'xlsx')
+
+@login_required
+def payments_export(request):
+    return export_or_queue(request, 'payments', 'csv')
+
+@login_required
+def payments_import(request):
+    if request.method == 'POST' and request.FILES.get('csv_file'):
+        if request.POST.get('background'):
+            job = enqueue('import', user=request.user, params={'name': 'payments'}, input_file=request.FILES['csv_file'])
+            return job_queued(request, job, 'payments')
+        try:
+            messages.info(request, PaymentImporter().run(request.FILES['csv_file']))
+        except Exception as e:
+            messages.error(request, f'Error importing CSV: {e}')
+        return redirect('payments')
+    messages.error(request, 'No file uploaded.')
+    return redirect('payments')
+
+@login_required
+def payments_export_excel(request):
+    return export_or_queue(request, 'payments', 'xlsx')
+
+@login_required
+def sample_customers_csv(request):
+    response = HttpResponse(content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="sample_customers.csv"'
+    writer = csv.writer(response)
+    writer.writerow(['id', 'name', 'contact', 'address'])
+    writer.writerow(['# id: leave blank to create new, or set to update existing'])
+    writer.writerow(['', 'John Doe', '1234567890', '123 Main St'])
+    return response
+
+@login_required
+def sample_inventory_csv(request):
+    response = HttpResponse(content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="sample_inventory.csv"'
+    writer = csv.writer(response)
+    writer.writerow(['id', 'item_name', 'item_type', 'fabric_type', 'cost_per_meter', 'total_meters', 'taxes', 'size', 'color', 'is_printed', 'stock_quantity', 'supplier'])
+    writer.writerow(['# id: leave blank to create new, or set to update existing'])
+    writer.writerow(['', 'Cotton Roll', 'unstitched', 'Cotton', '100', '50', '5', 'L', 'White', 'False', '100', 'ABC Supplier'])
+    return response
+
+@login_required
+def sample_orders_csv(request):
+    response = HttpResponse(content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="sample_orders.csv"'
+    writer = csv.writer(response)
+    writer.writerow(['id', 'customer', 'inventory_item', 'product_type', 'measurements', 'status', 'notes', 'delivery_date'])
+    writer.writerow(['# id: leave blank to create new, or set to update existing'])
+    writer.writerow(['', 'John Doe', 'Cotton Roll', 'stitched', '{"length": 40, "chest": 36}', 'Pending', 'Urgent', '2024-08-01'])
+    return response
+
+@login_required
+def sample_requirements_csv(request):
+    response = HttpResponse(content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="sample_requirements.csv"'
+    writer = csv.writer(response)
+    writer.writerow(['id', 'order', 'description', 'is_fulfilled', 'steps_done', 'steps_not_done', 'notes'])
+    writer.writerow(['# id: leave blank to create new, or set to update existing'])
+    writer.writerow(['', '1', 'Cutting and stitching', 'False', '["Cutting"]', '["Stitching"]', ''])
+    return response
+
+@login_required
+def sample_payments_csv(request):
+    response = HttpResponse(content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="sample_payments.csv"'
+    writer = csv.writer(response)
+    writer.writerow(['id', 'order', 'amount', 'status', 'payment_date', 'notes'])
+    writer.writerow(['# id: leave blank to create new, or set to update existing'])
+    writer.writerow(['', '1', '500', 'Pending', '2024-08-01', 'Advance'])
+    return response
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, HttpResponse, Http404
+from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from .. import querylog
+from ..metrics import PROMETHEUS_CONTENT_TYPE, render_metrics
+from ..profiling import list_profiles, profile_path
+
+# Monitoring pages for staff (and the Prometheus scraper)
+
+def metrics(request):
+    token = settings.METRICS_TOKEN
+    scraper = token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not (scraper or request.user.is_staff):
+        raise PermissionDenied
+    return HttpResponse(render_metrics(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+@login_required
+def query_report(request):
+    if not request.user.is_staff:
+        raise PermissionDenied
+    sort = request.GET.get('sort', 'total')
+    if sort not in ('total', 'count', 'p95', 'mean'):
+        sort = 'total'
+    by_view = request.GET.get('by') == 'view'
+    series, recent = querylog.merged()
+    return render(request, 'core/query_report.html', {
+        'rows': querylog.summarize(series, by_view, sort, limit=50),
+        'recent': recent[:20],
+        'sort': sort,
+        'by_view': by_view,
+        'threshold': settings.SLOW_QUERY_MS,
+        'shared': settings.CACHE_BACKEND != 'locmem',
+    })
+
+@login_required
+def profiles(request):
+    if not request.user.is_staff:
+        raise PermissionDenied
+    return render(request, 'core/profiles.html', {'profiles': list_profiles()})
+
+@login_required
+def profile_download(request, filename):
+    if not request.user.is_staff:
+        raise PermissionDenied
+    path = profile_path(filename)
+    if path is None:
+        raise Http404
+    return FileResponse(path.open('rb'), as_attachment=filename.endswith('.prof'), filename=filename)
@@ -0,0 +1,271 @@
+import datetime
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.forms import UserCreationForm
+from django.core.exceptions import PermissionDenied
+from django.core.mail import send_mail
+from django.db.models import Sum
+from django.http import JsonResponse, Http404
+from django.shortcuts import render, redirect
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .. import rollups
+from ..audit import audit_page, entry_json, feed_models
+from ..autocomplete import AUTOCOMPLETES, autocomplete_page
+from ..caching import cached
+from ..calendars import MAX_WINDOW_DAYS, event_rows, month_bounds, parse_day
+from ..dashboard import LOW_STOCK_THRESHOLD, get_snapshot
+from ..forms import CustomerForm, OrderForm, RequirementForm, PaymentForm
+from ..history import previous_record, record_changes
+from ..jobs import enqueue
+from ..models import Customer, InventoryItem, Order, Payment, Supplier, Purchase, Notification
+from ..models import DashboardSnapshot, MonthlyOrderCount, MonthlyRevenue, CustomerMonthlyOrderCount
+from ..pagination import keyset_paginate
+from ..snapshots import end_of_day, stock_report
+
+# Home view
+
+def home(request):
+    return render(request, 'core/home.html')
+
+@login_required
+def autocomplete(request, name):
+    # JSON options for AutocompleteSelect: ?q= prefix, ?after= cursor for the next page
+    if name not in AUTOCOMPLETES:
+        raise Http404
+    return JsonResponse(autocomplete_page(name, request.GET.get('q', ''), request.GET.get('after')))
+
+# Meeting Mode
+
+@login_required
+def meeting_mode(request):
+    customer_form = CustomerForm(prefix='customer')
+    order_form = OrderForm(prefix='order')
+    requirement_form = RequirementForm(prefix='requirement')
+    payment_form = PaymentForm(prefix='payment')
+    all_forms = [customer_form, order_form, requirement_form, payment_form]
+    success = False
+
+    if request.method == 'POST':
+        customer_form = CustomerForm(request.POST, prefix='customer')
+        order_form = OrderForm(request.POST, request.FILES, prefix='order')
+        requirement_form = RequirementForm(request.POST, prefix='requirement')
+        payment_form = PaymentForm(request.POST, prefix='payment')
+        all_forms = [customer_form, order_form, requirement_form, payment_form]
+
+        if customer_form.is_valid():
+            customer = customer_form.save()
+            if order_form.is_valid():
+                order = order_form.save(commit=False)
+                order.customer = customer
+                order.save()
+                if requirement_form.is_valid():
+                    requirement = requirement_form.save(commit=False)
+                    requirement.order = order
+                    requirement.save()
+                if payment_form.is_valid():
+                    payment = payment_form.save(commit=False)
+                    payment.order = order
+                    payment.save()
+                success = True
+                return redirect('dashboard')
+
+    return render(request, 'core/meeting_mode.html', {
+        'customer_form': customer_form,
+        'order_form': order_form,
+        'requirement_form': requirement_form,
+        'payment_form': payment_form,
+        'all_forms': all_forms,
+        'success': success,
+    })
+
+# Dashboard
+
+# Models each cached page is read from; a write to any of them invalidates the page data
+DASHBOARD_MODELS = [DashboardSnapshot, Customer, Order, Payment, InventoryItem, Supplier, Purchase]
+ANALYTICS_MODELS = [MonthlyOrderCount, MonthlyRevenue, CustomerMonthlyOrderCount, Customer, Order, Payment, InventoryItem]
+
+def dashboard_data():
+    # Counters come from the single DashboardSnapshot row kept current by signal handlers
+    snapshot = get_snapshot()
+    low_stock_items = []
+    if snapshot.low_stock_items > 0:
+        low_stock_items = list(InventoryItem.objects.filter(stock_quantity__lte=LOW_STOCK_THRESHOLD).values('item_name', 'stock_quantity'))
+    return {
+        'total_customers': snapshot.total_customers,
+        'total_orders': snapshot.total_orders,
+        'pending_orders': snapshot.pending_orders,
+        'total_inventory': snapshot.total_inventory,
+        'low_stock_items': low_stock_items,
+        'total_payments': snapshot.total_payments,
+        'outstanding_payments': snapshot.outstanding_payments,
+        'total_suppliers': snapshot.total_suppliers,
+        'total_purchases': snapshot.total_purchases,
+    }
+
+@login_required
+def dashboard(request):
+    return render(request, 'core/dashboard.html', cached('dashboard', DASHBOARD_MODELS, dashboard_data))
+
+def analytics_data(start, end):
+    # Inventory stock by item
+    inventory_stock = (
+        InventoryItem.objects.values('item_name').annotate(stock=Sum('stock_quantity')).order_by('-stock')[:10]
+    )
+    return {
+        'orders_by_month': rollups.orders_by_month(start, end),
+        'revenue_by_month': rollups.revenue_by_month(start, end),
+        'inventory_stock': list(inventory_stock),
+        'top_customers': rollups.top_customers(start, end),
+    }
+
+@login_required
+def analytics(request):
+    # Monthly charts and top customers read only the rollup tables (core.rollups);
+    # ?start=YYYY-MM&end=YYYY-MM narrows them to a range of months
+    start = parse_month(request.GET.get('start'))
+    end = parse_month(request.GET.get('end'))
+    data = cached('analytics', ANALYTICS_MODELS, lambda: analytics_data(start, end), start, end)
+    return render(request, 'core/analytics.html', {**data, 'start': start, 'end': end})
+
+def parse_month(value):
+    # Accepts YYYY-MM (month inputs) or a full YYYY-MM-DD date
+    if not value:
+        return None
+    try:
+        return parse_date(value if value.count('-') == 2 else f'{value}-01')
+    except ValueError:
+        return None
+
+@login_required
+def model_history(request, model_name, object_id):
+    try:
+        model = apps.get_model('core', model_name)
+    except LookupError:
+        raise Http404
+    manager = getattr(model._meta, 'simple_history_manager_attribute', None)
+    if manager is None:
+        raise Http404
+    # Read from the historical table, so deleted objects keep their history page
+    records = getattr(model, manager).model.objects.filter(id=object_id).select_related('history_user')
+    page = keyset_paginate(request, records, ordering=('-history_date', '-history_id'))
+    if page.object_list:
+        last = page.object_list[-1]
+        # Changes are computed once per record and stored; the record before this page is only
+        # needed while the last one on it hasn't been
+        previous = previous_record(last) if last.history_changes is None and last.history_type != '+' else None
+        record_changes(page.object_list, previous)
+    elif not model._default_manager.filter(pk=object_id).exists():
+        raise Http404
+    return render(request, 'core/model_history.html', {
+        'object_id': object_id, 'page': page, 'model_name': model._meta.verbose_name,
+    })
+
+@login_required
+def audit_feed(request):
+    if not request.user.is_staff:
+        raise PermissionDenied
+    return render(request, 'core/audit_feed.html', {
+        'page': audit_page(request),
+        'models': [(name, model._meta.verbose_name) for name, model in feed_models().items()],
+        'selected_models': request.GET.getlist('model'),
+        'user_filter': request.GET.get('user', ''),
+        'start': request.GET.get('start', ''),
+        'end': request.GET.get('end', ''),
+    })
+
+@login_required
+def audit_events(request):
+    # The audit feed as JSON, for scripts and exports; same filters and cursors as the page
+    if not request.user.is_staff:
+        raise PermissionDenied
+    page = audit_page(request)
+    return JsonResponse({
+        'results': [entry_json(entry) for entry in page],
+        'next': page.next_url or None,
+        'previous': page.previous_url or None,
+    })
+
+def as_of_report(request):
+    # ?date= is a day (default today); the report shows stock at its end
+    day = parse_day(request.GET.get('date')) or timezone.localdate()
+    return day, stock_report(end_of_day(day))
+
+@login_required
+def inventory_as_of(request):
+    day, report = as_of_report(request)
+    return render(request, 'core/inventory_as_of.html', dict(report, day=day))
+
+@login_required
+def inventory_as_of_data(request):
+    day, report = as_of_report(request)
+    return JsonResponse({
+        'date': day,
+        'as_of': report['moment'],
+        'checkpoint': report['checkpoint'].taken_at if report['checkpoint'] else None,
+        'exact': report['exact'],
+        'items': report['items'],
+        'total_stock': report['total_stock'],
+        'total_value': report['total_value'],
+    })
+
+def register(request):
+    if request.user.is_authenticated:
+        return redirect('dashboard')
+    if request.method == 'POST':
+        form = UserCreationForm(request.POST)
+        if form.is_valid():
+            form.save()
+            messages.success(request, 'Registration successful. You can now log in.')
+            return redirect('/accounts/login/')
+    else:
+        form = UserCreationForm()
+    return render(request, 'registration/register.html', {'form': form})
+
+# Notification views
+@login_required
+def notifications(request):
+    notes = Notification.objects.filter(user=request.user).order_by('-created_at')
+    return render(request, 'core/notifications.html', {'notifications': notes})
+
+@login_required
+def mark_notification_read(request, pk):
+    note = Notification.objects.get(pk=pk, user=request.user)
+    note.is_read = True
+    note.save()
+    return redirect('notifications')
+
+# Calendar view for orders
+@login_required
+def orders_calendar(request):
+    # Events are fetched per visible range from orders_calendar_events
+    return render(request, 'core/orders_calendar.html')
+
+@login_required
+def orders_calendar_events(request):
+    # JSON events overlapping ?start=&end= (what FullCalendar sends for the visible range);
+    # the current month without them
+    start, end = parse_day(request.GET.get('start')), parse_day(request.GET.get('end'))
+    if not start or not end or end <= start:
+        start, end = month_bounds(timezone.localdate())
+    end = min(end, start + datetime.timedelta(days=MAX_WINDOW_DAYS))
+    events = cached('orders_calendar_events', [Order, Customer], lambda: event_rows(start, end), start, end)
+    return JsonResponse(events, safe=False)
+
+# Email notification utility
+def send_order_status_email(order):
+    send_mail(
+        f"Order #{order.id} Status Update",
+        f"Your order status is now: {order.status}",
+        settings.DEFAULT_FROM_EMAIL,
+        [order.customer.email],
+        fail_silently=True,
+    )
+
+# Payment reminders are sent by the job worker (manage.py run_jobs)
+def schedule_payment_reminder(order_id, run_at=None):
+    return enqueue('payment_reminder', params={'order_id': order_id}, run_at=run_at)
@@ -0,0 +1,17 @@
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import LoginView
+from django.shortcuts import render
+
+from ..models import CustomerUser, Order
+
+# Customer portal views
+class CustomerLoginView(LoginView):
+    template_name = 'core/customer_login.html'
+    def get_success_url(self):
+        return '/customer/dashboard/'
+
+@login_required
+def customer_dashboard(request):
+    cu = CustomerUser.objects.get(user=request.user)
+    orders = Order.objects.filter(customer_id=cu.customer_id)
+    return render(request, 'core/customer_dashboard.html', {'orders': orders})
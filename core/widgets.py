@@ -0,0 +1,38 @@
+from django import forms
+
+from .autocomplete import autocomplete_url
+
+
+class AutocompleteSelect(forms.Select):
+    """
+    A <select> that renders only the empty choice and the current value; the rest of the
+    options are fetched from the JSON autocomplete endpoint as the user types
+    (static/core/js/autocomplete.js). Rendering costs one query however big the table is.
+    """
+    def __init__(self, autocomplete, attrs=None, select_related=()):
+        super().__init__(attrs)
+        self.autocomplete = autocomplete
+        self.select_related = select_related
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['attrs']['data-autocomplete-url'] = autocomplete_url(self.autocomplete)
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        selected = {str(v) for v in value if v not in (None, '')}
+        choices = []
+        field_choices = self.choices
+        if getattr(field_choices.field, 'empty_label', None) is not None:
+            choices.append(('', field_choices.field.empty_label))
+        if selected:
+            queryset = field_choices.queryset.filter(pk__in=selected)
+            if self.select_related:
+                queryset = queryset.select_related(*self.select_related)
+            choices += [field_choices.choice(obj) for obj in queryset]
+        groups = []
+        for index, (option_value, label) in enumerate(choices):
+            groups.append((None, [self.create_option(
+                name, option_value, label, str(option_value) in selected, index, attrs=attrs,
+            )], index))
+        return groups
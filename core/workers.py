@@ -0,0 +1,72 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Below this many items the work is done in the calling process; starting workers costs more
+MIN_PARALLEL = 8
+
+_lock = threading.Lock()
+_state = {'pool': None}
+
+
+def worker_count():
+    return getattr(settings, 'WORKER_PROCESSES', None) or os.cpu_count() or 1
+
+
+def pool():
+    """
+    The process pool shared by every caller, started on first use. Workers come from a fork
+    server (or are spawned), not forked from the web process, so they do not inherit its
+    threads, locks or database connections. Each worker runs django.setup(), so functions from
+    any module can run there, but they must not touch the ORM: pass them plain data.
+    """
+    with _lock:
+        if _state['pool'] is None:
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _state['pool'] = ProcessPoolExecutor(
+                worker_count(), mp_context=multiprocessing.get_context(method), initializer=django.setup)
+        return _state['pool']
+
+
+def reset_pool():
+    with _lock:
+        _state['pool'] = None
+
+
+def log_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error('Background task failed', exc_info=future.exception())
+
+
+def submit(func, *args):
+    """Run func(*args) in the worker pool without waiting for it; returns the Future."""
+    try:
+        future = pool().submit(func, *args)
+    except BrokenProcessPool:
+        reset_pool()
+        future = pool().submit(func, *args)
+    future.add_done_callback(log_failure)
+    return future
+
+
+def parallel_map(func, items, chunksize=None):
+    """[func(item) for item in items], spread over the worker pool when there are enough items."""
+    items = list(items)
+    workers = worker_count()
+    if workers <= 1 or len(items) < MIN_PARALLEL:
+        return [func(item) for item in items]
+    try:
+        return list(pool().map(func, items, chunksize=chunksize or max(1, len(items) // (workers * 4))))
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); start a new pool next time and finish here
+        logger.exception('Worker pool broke; running %s in-process', func.__name__)
+        reset_pool()
+        return [func(item) for item in items]
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,20 +43,23 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',  # first, so its timings cover everything below
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.profiling.ProfileMiddleware',  # ?__profile=cprofile|sample for staff; needs request.user
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.history.HistoryBatchMiddleware',  # history of write requests in bulk
 ]
 
 ROOT_URLCONF = 'stockstitch.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.metrics.TimedDjangoTemplates',  # DjangoTemplates that reports render time to /metrics
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -127,3 +131,43 @@ MEDIA_ROOT = BASE_DIR / 'mediafiles'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_REDIRECT_URL = '/dashboard/'
+
+# Django REST framework: cursor (keyset) pagination for every API list endpoint
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'core.api_pagination.IdCursorPagination',
+    'PAGE_SIZE': 50,
+}
+
+# Cache backend, chosen with CACHE_BACKEND:
+#   file   - files under CACHE_LOCATION, shared by every process on the host (default)
+#   locmem - per-process memory; only for a single process with no separate run_jobs worker
+#   redis  - any Redis-compatible server at CACHE_LOCATION (needs the `redis` package)
+# Cached pages are invalidated by per-model version keys (core.caching), so every process
+# that writes data - including the run_jobs worker - must share the cache with the web server.
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'stockstitch'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / 'cache')),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/0'),
+}
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'file')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': os.environ.get('CACHE_LOCATION', CACHE_BACKENDS[CACHE_BACKEND][1]),
+    }
+}
+
+# /metrics is open to staff users, and to a Prometheus scraper sending
+# "Authorization: Bearer <METRICS_TOKEN>" when the variable is set
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# SQL statements slower than this many milliseconds are logged (logger core.querylog) with
+# their query plan; /queries/ and `manage.py slow_queries` rank statements by fingerprint
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+
+# Request profiles taken with ?__profile= are stored here and listed at /profiles/
+PROFILE_ROOT = Path(os.environ.get('PROFILE_ROOT', BASE_DIR / 'profiles'))
+
+# Processes in the pool that renders QR codes and other CPU-heavy batches (core.workers);
+# defaults to the number of CPUs, 1 renders everything in the requesting process
+WORKER_PROCESSES = int(os.environ.get('WORKER_PROCESSES', 0)) or None